@@ -0,0 +1,129 @@
+# as-of alignment of one series onto another's dates (or of many onto one calendar) and the relative analytics built on it
+# (stock vs composite) - the composite comes from yfinance and the stock from eodhd, so their
+# calendars differ on holidays and timezones and can't be compared index by index
+import numpy as np
+
+# composite values older than this aren't carried forward onto a stock date
+MAX_STALENESS_DAYS = 7
+BETA_WINDOW = 60
+
+RELATIVE_MODES = ["Relative strength", "Rolling beta", "Excess return"]
+
+
+def asof_join(left_dates, right_dates, right_values, max_staleness=MAX_STALENESS_DAYS):
+    # for every left date, the last right value on or before it (nan if none within max_staleness)
+    left_dates = np.asarray(left_dates, dtype="datetime64[D]")
+    right_dates = np.asarray(right_dates, dtype="datetime64[D]")
+    right_values = np.asarray(right_values, dtype=float)
+    if len(right_dates) > 1 and (np.diff(right_dates) < np.timedelta64(0, "D")).any():
+        order = np.argsort(right_dates, kind="stable")
+        right_dates, right_values = right_dates[order], right_values[order]
+
+    out = np.full(len(left_dates), np.nan)
+    if not len(right_dates):
+        return out
+    idx = np.searchsorted(right_dates, left_dates, side="right") - 1
+    found = idx >= 0
+    if max_staleness is not None:
+        found &= left_dates - right_dates[np.maximum(idx, 0)] <= np.timedelta64(max_staleness, "D")
+    out[found] = right_values[idx[found]]
+    return out
+
+
+def align_closes(series):
+    # series maps label -> records, returns (calendar, labels, closes) with closes as a
+    # len(calendar) x len(labels) array, forward filled over days a series didn't trade
+    arrays = {}
+    for label, records in series.items():
+        if records:
+            arrays[label] = (np.array([r['date'] for r in records], dtype="datetime64[D]"),
+                             np.array([r.get('close', r.get('value')) for r in records], dtype=float))
+    return align_arrays(arrays)
+
+
+def align_arrays(series):
+    # same as align_closes for label -> (dates, values) arrays
+    labels = [label for label, (dates, _) in series.items() if len(dates)]
+    if not labels:
+        return np.array([], dtype="datetime64[D]"), [], np.empty((0, 0))
+    calendar = np.unique(np.concatenate([series[label][0] for label in labels]))
+
+    closes = np.full((len(calendar), len(labels)), np.nan)
+    for j, label in enumerate(labels):
+        dates, values = series[label]
+        closes[np.searchsorted(calendar, dates), j] = values
+
+    # forward fill - index of the last valid row in each column, leading gaps stay nan
+    rows = np.where(np.isnan(closes), 0, np.arange(len(calendar))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    closes = closes[rows, np.arange(len(labels))]
+    return calendar, labels, closes
+
+
+def _first_valid(values):
+    valid = np.flatnonzero(np.isfinite(values) & (values != 0))
+    return values[valid[0]] if len(valid) else np.nan
+
+
+def relative_strength(stock, index):
+    # stock / index, rebased to 100 at the first date both exist
+    ratio = np.asarray(stock, dtype=float) / np.asarray(index, dtype=float)
+    return 100.0 * ratio / _first_valid(ratio)
+
+
+def excess_return(stock, index):
+    # cumulative return of the stock minus the index's over the same dates, in percent
+    stock = np.asarray(stock, dtype=float)
+    index = np.asarray(index, dtype=float)
+    both = np.isfinite(stock) & np.isfinite(index)
+    if not both.any():
+        return np.full(len(stock), np.nan)
+    first = np.flatnonzero(both)[0]
+    return 100.0 * (stock / stock[first] - index / index[first])
+
+
+def rolling_beta(stock, index, window=BETA_WINDOW):
+    # beta of the stock's log returns on the index's over a trailing window, from prefix sums
+    # so every window is O(1) - pairs with a missing side are left out of the sums
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = np.diff(np.log(np.asarray(index, dtype=float)))
+        y = np.diff(np.log(np.asarray(stock, dtype=float)))
+    valid = np.isfinite(x) & np.isfinite(y)
+    x = np.where(valid, x, 0.0)
+    y = np.where(valid, y, 0.0)
+
+    def window_sums(values):
+        cumulative = np.concatenate(([0.0], np.cumsum(values)))
+        return cumulative[window:] - cumulative[:-window]
+
+    beta = np.full(len(stock), np.nan)
+    if len(x) < window:
+        return beta
+    n = window_sums(valid.astype(float))
+    sx, sy = window_sums(x), window_sums(y)
+    sxy, sxx = window_sums(x * y), window_sums(x * x)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = sxy - sx * sy / n
+        var = sxx - sx * sx / n
+        values = np.where((n >= window // 2) & (var > 0), cov / var, np.nan)
+    # return i is the move into bar i + 1
+    beta[window:] = values
+    return beta
+
+
+def relative_series(mode, stock, index):
+    if mode == "Relative strength":
+        return relative_strength(stock, index), "Relative Strength (rebased 100)"
+    if mode == "Rolling beta":
+        # short charts (e.g. 1M of daily bars) get a shorter window rather than no line at all
+        window = min(BETA_WINDOW, max(5, len(stock) // 3))
+        return rolling_beta(stock, index, window), f"Beta ({window} bars)"
+    return excess_return(stock, index), "Excess Return (%)"
+
+
+def nearest_index(x_values, x):
+    # index of the point closest to x in a sorted array, O(log n)
+    idx = int(np.searchsorted(x_values, x, side="left"))
+    if idx > 0 and (idx == len(x_values) or abs(x - x_values[idx - 1]) < abs(x - x_values[idx])):
+        idx -= 1
+    return min(idx, len(x_values) - 1)
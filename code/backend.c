@@ -8,6 +8,7 @@
 #include <libxml/xpath.h>
 #include <libxml/xpathInternals.h>
 #include <math.h>
+#include <pthread.h>
 #include "config.h"
 
 struct url_mem {
@@ -48,6 +49,31 @@ void free_memory(void *ptr) {
     free(ptr);
 }
 
+// per-thread request settings - the python scheduler sets these before each attempt
+// so a stalled provider can't hang the caller, and reads back the status to decide on retries
+static __thread long connect_timeout_ms = 5000;
+static __thread long transfer_timeout_ms = 30000;
+static __thread long last_http_status = 0;
+
+void set_request_timeouts(long connect_ms, long total_ms) {
+    connect_timeout_ms = connect_ms;
+    transfer_timeout_ms = total_ms;
+}
+
+// http status of the last request made on this thread, 0 if the transfer itself failed (e.g. timed out)
+long get_last_http_status(void) {
+    return last_http_status;
+}
+
+// curl_global_init/cleanup are not thread safe, so only initialise once per process
+static pthread_once_t curl_once = PTHREAD_ONCE_INIT;
+static void init_curl_global(void) {
+    curl_global_init(CURL_GLOBAL_ALL);
+}
+static void ensure_curl_global(void) {
+    pthread_once(&curl_once, init_curl_global);
+}
+
 // callback function to handle data received from an HTTP request
 static size_t write_memory_callback(void *contents, size_t size, size_t nmemb, void *userp) {
     size_t realsize = size * nmemb; // calc  size of  data received
@@ -69,17 +95,36 @@ CURL* initialize_curl(struct url_mem *chunk, const char *url, struct curl_slist
     curl_easy_setopt(curl_handle, CURLOPT_URL, url); // set url
     curl_easy_setopt(curl_handle, CURLOPT_WRITEFUNCTION, write_memory_callback); //setup callback
     curl_easy_setopt(curl_handle, CURLOPT_WRITEDATA, (void *)chunk); // pass chunk to callback, to store data received
+    curl_easy_setopt(curl_handle, CURLOPT_CONNECTTIMEOUT_MS, connect_timeout_ms);
+    curl_easy_setopt(curl_handle, CURLOPT_TIMEOUT_MS, transfer_timeout_ms);
+    curl_easy_setopt(curl_handle, CURLOPT_NOSIGNAL, 1L); // timeouts must not use signals when called from worker threads
 
     if (headers) {
         curl_easy_setopt(curl_handle, CURLOPT_HTTPHEADER, headers);}
     return curl_handle;
 }
 
+// perform request and record the http status, treating error responses as failures
+CURLcode perform_request(CURL *curl_handle) {
+    last_http_status = 0;
+    CURLcode res = curl_easy_perform(curl_handle);
+    if (res != CURLE_OK) return res;
+    curl_easy_getinfo(curl_handle, CURLINFO_RESPONSE_CODE, &last_http_status);
+    if (last_http_status >= 400) {
+        fprintf(stderr, "request failed with http status %ld\n", last_http_status);
+        return CURLE_HTTP_RETURNED_ERROR;
+    }
+    return CURLE_OK;
+}
+
+// frees the chunk itself too - every chunk passed here comes from allocate_memory
 void cleanup_curl(CURL *curl_handle, struct curl_slist *headers, struct url_mem *chunk) {
-    if (chunk->memory) free(chunk->memory);
+    if (chunk) {
+        free(chunk->memory);
+        free(chunk);
+    }
     if (headers) curl_slist_free_all(headers);
     if (curl_handle) curl_easy_cleanup(curl_handle);
-    curl_global_cleanup();
 }
 
 struct url_mem* allocate_memory() { //allocate memory and check it hasnt failed
@@ -109,7 +154,7 @@ double convert_currency(const char *from_currency, const char *to_currency, doub
     char url[256];
     snprintf(url, sizeof(url), "https://yfapi.net/v6/finance/quote?region=US&lang=en&symbols=%s%s%%3DX", from_currency, to_currency);
 
-    curl_global_init(CURL_GLOBAL_DEFAULT);
+    ensure_curl_global();
 
     // Create the header string using the API key variable
     char header_string[256];
@@ -124,7 +169,7 @@ double convert_currency(const char *from_currency, const char *to_currency, doub
         return -1;
     }
 
-    CURLcode res = curl_easy_perform(curl_handle);
+    CURLcode res = perform_request(curl_handle);
     if (res != CURLE_OK) {
         fprintf(stderr, "curl_easy_perform() failed: %s\n", curl_easy_strerror(res));
         cleanup_curl(curl_handle, headers, chunk);
@@ -163,7 +208,75 @@ double convert_currency(const char *from_currency, const char *to_currency, doub
     return converted_amount;
 }
 
-HistoricalData* fetch_historical_data(const char *from_currency, const char *to_currency, const char *period) {
+// latest price for several symbols in one quote request, prices[i] is NAN if symbols[i] wasn't returned
+// returns how many prices were found, or -1 if the request failed
+int fetch_quotes(const char **symbols, int count, double *prices) {
+    char url[2048];
+    int len = snprintf(url, sizeof(url), "https://yfapi.net/v6/finance/quote?region=US&lang=en&symbols=");
+    for (int i = 0; i < count; i++) {
+        prices[i] = NAN;
+        if (i > 0) len += snprintf(url + len, sizeof(url) - len, "%%2C");
+        for (const char *p = symbols[i]; *p && len < (int)sizeof(url) - 4; p++) { // encode ^ and = (index and fx symbols)
+            if (*p == '^' || *p == '=') len += snprintf(url + len, sizeof(url) - len, "%%%02X", *p);
+            else url[len++] = *p;
+        }
+        url[len] = 0;
+    }
+
+    struct url_mem *chunk = allocate_memory();
+    if (!chunk) return -1;
+    ensure_curl_global();
+
+    char header_string[256];
+    snprintf(header_string, sizeof(header_string), "X-API-KEY: %s", YFAPI_API_KEY);
+    struct curl_slist *headers = curl_slist_append(NULL, header_string);
+
+    CURL *curl_handle = initialize_curl(chunk, url, headers);
+    if (!curl_handle) {
+        cleanup_curl(curl_handle, headers, chunk);
+        return -1;
+    }
+
+    CURLcode res = perform_request(curl_handle);
+    if (res != CURLE_OK) {
+        fprintf(stderr, "curl_easy_perform() failed: %s\n", curl_easy_strerror(res));
+        cleanup_curl(curl_handle, headers, chunk);
+        return -1;
+    }
+
+    cJSON *root = parse_json(chunk->memory);
+    cleanup_curl(curl_handle, headers, chunk);
+    if (!root) return -1;
+
+    cJSON *result = cJSON_GetObjectItem(cJSON_GetObjectItem(root, "quoteResponse"), "result");
+    if (!result || !cJSON_IsArray(result)) {
+        fprintf(stderr, "Error: 'result' is missing or not an array\n");
+        cJSON_Delete(root);
+        return -1;
+    }
+
+    // results aren't guaranteed to come back in request order, so match on symbol
+    int found = 0;
+    cJSON *quote;
+    cJSON_ArrayForEach(quote, result) {
+        cJSON *symbol = cJSON_GetObjectItem(quote, "symbol");
+        cJSON *price = cJSON_GetObjectItem(quote, "regularMarketPrice");
+        if (!cJSON_IsString(symbol) || !cJSON_IsNumber(price)) continue;
+        for (int i = 0; i < count; i++) {
+            if (isnan(prices[i]) && strcmp(symbols[i], symbol->valuestring) == 0) {
+                prices[i] = price->valuedouble;
+                found++;
+                break;
+            }
+        }
+    }
+
+    cJSON_Delete(root);
+    return found;
+}
+
+// resolution is the eod "period" parameter - d (daily), w (weekly) or m (monthly)
+HistoricalData* fetch_historical_data(const char *from_currency, const char *to_currency, const char *period, const char *resolution) {
     struct url_mem *chunk = allocate_memory(); // memory allocation
     if (!chunk) return NULL; 
 
@@ -178,6 +291,8 @@ HistoricalData* fetch_historical_data(const char *from_currency, const char *to_
     else if (!strcmp(period, "3M")) local_time->tm_mon -= 3;
     else if (!strcmp(period, "YTD")) local_time->tm_mon = 0, local_time->tm_mday = 1;
     else if (!strcmp(period, "1Y")) local_time->tm_year -= 1;
+    else if (!strcmp(period, "5Y")) local_time->tm_year -= 5;
+    else if (!strcmp(period, "10Y")) local_time->tm_year -= 10;
     else local_time->tm_mday -= 30;  // use 30 days as default if period not recognized
 
     mktime(local_time); // normalize time
@@ -189,19 +304,19 @@ HistoricalData* fetch_historical_data(const char *from_currency, const char *to_
 
     char url[512];
     snprintf(url, sizeof(url), 
-             "https://eodhd.com/api/eod/%s?from=%s&to=%s&order=d&api_token=%s&fmt=json", 
-            ticker, start_date, end_date, EODHD_API_KEY);
+             "https://eodhd.com/api/eod/%s?from=%s&to=%s&period=%s&order=d&api_token=%s&fmt=json", 
+            ticker, start_date, end_date, resolution, EODHD_API_KEY);
 
     printf("Fetching data from %s to %s\n", start_date, end_date);
     //printf("Constructed url: %s\n", url);
-    curl_global_init(CURL_GLOBAL_DEFAULT); // initialize curl and perform request
+    ensure_curl_global(); // initialize curl and perform request
     CURL *curl_handle = initialize_curl(chunk, url, NULL);
     if (!curl_handle) {
         cleanup_curl(curl_handle, NULL, chunk);
         return NULL;
     }
 
-    CURLcode res = curl_easy_perform(curl_handle);
+    CURLcode res = perform_request(curl_handle);
     if (res != CURLE_OK) {
         fprintf(stderr, "curl_easy_perform() failed: %s\n", curl_easy_strerror(res));
         cleanup_curl(curl_handle, NULL, chunk);
@@ -279,7 +394,8 @@ void free_stock_historical_data(StockHistoricalData* data) {
     free(data);
 }
 
-StockHistoricalData* fetch_stock_historical_data(const char *symbol, const char *period, int *data_count) {
+// resolution is the eod "period" parameter - d (daily), w (weekly) or m (monthly)
+StockHistoricalData* fetch_stock_historical_data(const char *symbol, const char *period, const char *resolution, int *data_count) {
     // mem allocation and get start and end date
     struct url_mem *chunk = allocate_memory();
     if (!chunk) return NULL;
@@ -294,6 +410,8 @@ StockHistoricalData* fetch_stock_historical_data(const char *symbol, const char
     else if (!strcmp(period, "3M")) local_time->tm_mon -= 3;
     else if (!strcmp(period, "YTD")) local_time->tm_mon = 0, local_time->tm_mday = 1;
     else if (!strcmp(period, "1Y")) local_time->tm_year -= 1;
+    else if (!strcmp(period, "5Y")) local_time->tm_year -= 5;
+    else if (!strcmp(period, "10Y")) local_time->tm_year -= 10;
     else local_time->tm_mday -= 30;
     mktime(local_time);
     strftime(start_date, sizeof(start_date), "%Y-%m-%d", local_time);
@@ -301,18 +419,18 @@ StockHistoricalData* fetch_stock_historical_data(const char *symbol, const char
     // url construction
     char url[512];
     snprintf(url, sizeof(url), 
-             "https://eodhistoricaldata.com/api/eod/%s?from=%s&to=%s&api_token=%s&fmt=json", 
-             symbol, start_date, end_date, EODHD_API_KEY);
+             "https://eodhistoricaldata.com/api/eod/%s?from=%s&to=%s&period=%s&api_token=%s&fmt=json", 
+             symbol, start_date, end_date, resolution, EODHD_API_KEY);
 
     // start curl and perform get request
-    curl_global_init(CURL_GLOBAL_DEFAULT);
+    ensure_curl_global();
     CURL *curl_handle = initialize_curl(chunk, url, NULL);
     if (!curl_handle) {
         cleanup_curl(curl_handle, NULL, chunk);
         return NULL;
     }
 
-    CURLcode res = curl_easy_perform(curl_handle);
+    CURLcode res = perform_request(curl_handle);
     if (res != CURLE_OK) {
         printf("Error fetching historical data: %s\n", curl_easy_strerror(res));
         cleanup_curl(curl_handle, NULL, chunk);
@@ -366,7 +484,7 @@ PriceIndexData* get_price_index_data(const char *indicator, const char *country_
              country_code, start_year, end_year);
 
     // start curl and set up headers
-    curl_global_init(CURL_GLOBAL_DEFAULT);
+    ensure_curl_global();
     struct curl_slist *headers = curl_slist_append(NULL, "Accept: application/json");
     CURL *curl_handle = initialize_curl(chunk, url, headers);
     if (!curl_handle) {
@@ -374,7 +492,7 @@ PriceIndexData* get_price_index_data(const char *indicator, const char *country_
         return NULL;
     }
 
-    CURLcode res = curl_easy_perform(curl_handle);
+    CURLcode res = perform_request(curl_handle);
     if (res != CURLE_OK) {
         fprintf(stderr, "curl_easy_perform() failed: %s\n", curl_easy_strerror(res));
         cleanup_curl(curl_handle, headers, chunk);
@@ -474,11 +592,11 @@ EconomicData* get_economic_data(const char *country_code, const char *data_type,
     struct url_mem *chunk = allocate_memory();
     if (!chunk) return NULL;
 
-    curl_global_init(CURL_GLOBAL_ALL);
+    ensure_curl_global();
 
     char *periods = years_between(atoi(start_year), atoi(end_year));
     if (!periods) {
-        curl_global_cleanup();
+        cleanup_curl(NULL, NULL, chunk);
         return NULL;
     }
 
@@ -487,7 +605,7 @@ EconomicData* get_economic_data(const char *country_code, const char *data_type,
     if (!(data_type_mapped || country_code_mapped)) {
         fprintf(stderr, "Invalid data type / country code: %s\n", data_type);
         free(periods);
-        curl_global_cleanup();
+        cleanup_curl(NULL, NULL, chunk);
         return NULL;
     }
 
@@ -505,7 +623,7 @@ EconomicData* get_economic_data(const char *country_code, const char *data_type,
         return NULL;
     }
 
-    CURLcode res = curl_easy_perform(curl_handle);
+    CURLcode res = perform_request(curl_handle);
     if (res != CURLE_OK) {
         fprintf(stderr, "curl_easy_perform() failed: %s\n", curl_easy_strerror(res));
         cleanup_curl(curl_handle, headers, chunk);
@@ -549,11 +667,12 @@ const char* map_series_id(const char *code) {
     return NULL; 
 }
 
-InterestRateData* get_interest_rate_data(const char *series_id, const char *start_date, const char *end_date, int *data_count) {
+// frequency/aggregation are fred's own parameters (e.g. "m" and "avg"), pass "" to get the series' native frequency
+InterestRateData* get_interest_rate_data(const char *series_id, const char *start_date, const char *end_date, const char *frequency, const char *aggregation, int *data_count) {
     struct url_mem *chunk = allocate_memory();
     if (!chunk) return NULL;
 
-    curl_global_init(CURL_GLOBAL_ALL);
+    ensure_curl_global();
 
     const char *series_id_mapped = map_series_id(series_id);
     if (!series_id_mapped) {
@@ -563,9 +682,12 @@ InterestRateData* get_interest_rate_data(const char *series_id, const char *star
     }
 
     char url[512];
-    snprintf(url, sizeof(url), 
+    int written = snprintf(url, sizeof(url), 
         "https://api.stlouisfed.org/fred/series/observations?series_id=%s&api_key=%s&file_type=json&observation_start=%s-01-01&observation_end=%s-06-06",
         series_id_mapped, FRED_API_KEY, start_date, end_date);
+    if (frequency[0] != '\0' && written > 0 && written < (int)sizeof(url)) {
+        snprintf(url + written, sizeof(url) - written, "&frequency=%s&aggregation_method=%s", frequency, aggregation);
+    }
 
     struct curl_slist *headers = curl_slist_append(NULL, "Accept: application/json");
     CURL *curl_handle = initialize_curl(chunk, url, headers);
@@ -574,7 +696,7 @@ InterestRateData* get_interest_rate_data(const char *series_id, const char *star
         return NULL;
     }
 
-    CURLcode res = curl_easy_perform(curl_handle);
+    CURLcode res = perform_request(curl_handle);
     if (res != CURLE_OK) {
         fprintf(stderr, "couldn't start curl: %s\n", curl_easy_strerror(res));
         cleanup_curl(curl_handle, headers, chunk);
@@ -632,20 +754,17 @@ int fetch_data(const char *url, struct url_mem *chunk) {
     chunk->memory = malloc(1);
     chunk->size = 0;
 
-    curl_global_init(CURL_GLOBAL_ALL);
-    curl_handle = curl_easy_init();
+    ensure_curl_global();
+    curl_handle = initialize_curl(chunk, url, NULL);
     if (curl_handle) {
-        curl_easy_setopt(curl_handle, CURLOPT_URL, url);
-        curl_easy_setopt(curl_handle, CURLOPT_WRITEFUNCTION, write_memory_callback);
-        curl_easy_setopt(curl_handle, CURLOPT_WRITEDATA, (void *)chunk);
-        res = curl_easy_perform(curl_handle);
+        res = perform_request(curl_handle);
         if (res != CURLE_OK) {
             fprintf(stderr, "curl_easy_perform() failed: %s\n", curl_easy_strerror(res));
+            curl_easy_cleanup(curl_handle);
             return 1;
         }
         curl_easy_cleanup(curl_handle);
     }
-    curl_global_cleanup();
     return 0;
 }
 
@@ -1,12 +1,12 @@
 from ctypes import *
-import yfinance as yf
-import requests
-from lxml import html
 import os
+import threading
+
+from cache import cached, served, TTL_MACRO, TTL_STATIC
+from scheduler import scheduler
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 lib_path = os.path.join(current_dir, 'backend_library.so')
-lib = cdll.LoadLibrary(lib_path)
 
 #setup c structs
 class PriceIndexData(Structure):
@@ -48,62 +48,126 @@ class InterestRateData(Structure):
                 ("value", c_double)]
 
 #setup c functions
-
-lib.get_price_index_data.argtypes = [c_char_p, c_char_p, c_char_p, c_char_p, POINTER(c_int)]
-lib.get_price_index_data.restype = POINTER(PriceIndexData)
-lib.convert_currency.argtypes = [c_char_p, c_char_p, c_double]
-lib.convert_currency.restype = c_double
-
-lib.get_supported_currencies.argtypes = [c_int]
-lib.get_supported_currencies.restype = c_char_p
-
-lib.get_supported_exchanges.argtypes = []
-lib.get_supported_exchanges.restype = POINTER(c_char_p)
-
-lib.fetch_data.argtypes = [c_char_p, POINTER(url_mem)]
-lib.fetch_data.restype = c_int
-lib.parse_html.argtypes = [c_char_p, c_char_p, POINTER(POINTER(c_char_p)), POINTER(c_int)]
-lib.parse_html.restype = None
-lib.free_tickers.argtypes = [POINTER(c_char_p), c_int]
-lib.free_tickers.restype = None
-lib.free_memory.argtypes = [c_void_p]
-lib.free_memory.restype = None
-
-lib.fetch_stock_historical_data.argtypes = [c_char_p, c_char_p, POINTER(c_int)]
-lib.fetch_stock_historical_data.restype = POINTER(StockHistoricalData)
-
-
-lib.get_economic_data.argtypes = [c_char_p, c_char_p, c_char_p, c_char_p, POINTER(c_int)]
-lib.get_economic_data.restype = POINTER(EconomicData)
-
-lib.get_interest_rate_data.argtypes = [c_char_p, c_char_p, c_char_p, POINTER(c_int)]
-lib.get_interest_rate_data.restype = POINTER(InterestRateData)
-
-
-lib.fetch_historical_data.argtypes = [c_char_p, c_char_p, c_char_p]
-lib.fetch_historical_data.restype = POINTER(HistoricalData)
-
-lib.free_historical_data.argtypes = [POINTER(HistoricalData)]
-lib.free_historical_data.restype = None
-
+def setup_library(lib):
+    lib.get_price_index_data.argtypes = [c_char_p, c_char_p, c_char_p, c_char_p, POINTER(c_int)]
+    lib.get_price_index_data.restype = POINTER(PriceIndexData)
+    lib.convert_currency.argtypes = [c_char_p, c_char_p, c_double]
+    lib.convert_currency.restype = c_double
+
+    lib.get_supported_currencies.argtypes = [c_int]
+    lib.get_supported_currencies.restype = c_char_p
+
+    lib.get_supported_exchanges.argtypes = []
+    lib.get_supported_exchanges.restype = POINTER(c_char_p)
+
+    lib.fetch_data.argtypes = [c_char_p, POINTER(url_mem)]
+    lib.fetch_data.restype = c_int
+    lib.parse_html.argtypes = [c_char_p, c_char_p, POINTER(POINTER(c_char_p)), POINTER(c_int)]
+    lib.parse_html.restype = None
+    lib.free_tickers.argtypes = [POINTER(c_char_p), c_int]
+    lib.free_tickers.restype = None
+    lib.free_memory.argtypes = [c_void_p]
+    lib.free_memory.restype = None
+
+    lib.fetch_stock_historical_data.argtypes = [c_char_p, c_char_p, c_char_p, POINTER(c_int)]
+    lib.fetch_stock_historical_data.restype = POINTER(StockHistoricalData)
+
+
+    lib.get_economic_data.argtypes = [c_char_p, c_char_p, c_char_p, c_char_p, POINTER(c_int)]
+    lib.get_economic_data.restype = POINTER(EconomicData)
+
+    lib.get_interest_rate_data.argtypes = [c_char_p, c_char_p, c_char_p, c_char_p, c_char_p, POINTER(c_int)]
+    lib.get_interest_rate_data.restype = POINTER(InterestRateData)
+
+
+    lib.fetch_historical_data.argtypes = [c_char_p, c_char_p, c_char_p, c_char_p]
+    lib.fetch_historical_data.restype = POINTER(HistoricalData)
+
+    lib.free_historical_data.argtypes = [POINTER(HistoricalData)]
+    lib.free_historical_data.restype = None
+
+    lib.fetch_quotes.argtypes = [POINTER(c_char_p), c_int, POINTER(c_double)]
+    lib.fetch_quotes.restype = c_int
+
+    lib.set_request_timeouts.argtypes = [c_long, c_long]
+    lib.set_request_timeouts.restype = None
+    lib.get_last_http_status.argtypes = []
+    lib.get_last_http_status.restype = c_long
+
+# the shared library is loaded on first use rather than at import, so the window can
+# be shown before anything native (or network related) has been touched
+class LazyLibrary:
+    def __init__(self, path, setup):
+        self._path = path
+        self._setup = setup
+        self._lib = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._lib is None:
+                loaded = cdll.LoadLibrary(self._path)
+                self._setup(loaded)
+                self._lib = loaded
+        return self._lib
+
+    def __getattr__(self, name):
+        return getattr(self._lib or self._load(), name)
+
+lib = LazyLibrary(lib_path, setup_library)
+
+# wrap a C fetcher as a scheduler attempt - timeouts are per thread in the C library,
+# and each attempt (including hedged duplicates) gets its own count out-parameter
+def native_attempt(fn, *args, with_count=True):
+    def attempt(connect_timeout, timeout):
+        lib.set_request_timeouts(int(connect_timeout * 1000), int(timeout * 1000))
+        if with_count:
+            count = c_int()
+            ptr = fn(*args, byref(count))
+            result = (ptr, count.value) if ptr else None
+        else:
+            ptr = fn(*args)
+            result = ptr if ptr else None
+        return result, lib.get_last_http_status()
+    return attempt
+
+def release_native(result):
+    lib.free_memory(result[0])
+
+# copy a native array of structs into a numpy structured array, field for field
+# (numpy's own ctypes conversion gets char arrays followed by doubles wrong)
+def struct_array(ptr, count, struct):
+    import numpy as np
+    dtype = np.dtype({
+        "names": [name for name, _ in struct._fields_],
+        "formats": [f"S{sizeof(ctype)}" if issubclass(ctype, Array) else np.dtype(ctype) for _, ctype in struct._fields_],
+        "offsets": [getattr(struct, name).offset for name, _ in struct._fields_],
+        "itemsize": sizeof(struct)
+    })
+    if not count:
+        return np.empty(0, dtype=dtype)
+    buffer = (c_char * (count * sizeof(struct))).from_address(addressof(ptr.contents))
+    return np.frombuffer(buffer, dtype=dtype).copy()
+
+@cached("imf", lambda indicator, country_code, start_year, end_year: (f"{indicator}.{country_code}", (start_year, end_year), "M"), ttl=TTL_MACRO)
 def get_price_index_data(indicator, country_code, start_year, end_year):
     # setup arguments
     indicator = indicator.encode('utf-8')
     country_code = country_code.encode('utf-8')
     start_year = start_year.encode('utf-8')
     end_year = end_year.encode('utf-8')
-    data_count = c_int()
 
     # get interest rate data
-    data_ptr = lib.get_price_index_data(indicator, country_code, start_year, end_year, byref(data_count))
+    fetched = scheduler.call("imf", native_attempt(lib.get_price_index_data, indicator, country_code, start_year, end_year), release=release_native)
     
-    if not data_ptr:
+    if not fetched:
         print("Error fetching price index data")
         return []
+    data_ptr, data_count = fetched
 
     # convert data to python list
     data_list = []
-    for i in range(data_count.value):
+    for i in range(data_count):
         data = data_ptr[i]
        
         date = data.date.decode('utf-8') + "-01"
@@ -117,110 +181,203 @@ def get_price_index_data(indicator, country_code, start_year, end_year):
 
     return data_list
 
-import yfinance as yf
-from requests.exceptions import HTTPError
+@cached("yfinance", lambda symbol: (symbol, "info", ""), ttl=TTL_STATIC)
+def fetch_stock_name(symbol):
+    import yfinance as yf
+    from requests.exceptions import HTTPError
 
-def get_stock_name(symbol):
-    try:
-        stock = yf.Ticker(symbol)
-        stock_info = stock.info
-        
-        # check  'shortName' is available
-        stock_name = stock_info.get('shortName')
-        
-        if stock_name:
-            return stock_name
-        else:
-            # if not, get fast_info if available
-            fast_info = stock.fast_info
-            return fast_info.get('shortName', 'Unknown Stock')
-    except HTTPError as http_err:
-        if http_err.response.status_code == 401:
-            print(f"Unauthorized access for symbol {symbol}: {http_err}")
-            return 'Unauthorized Access'
-        else:
+    def attempt(connect_timeout, timeout):
+        try:
+            stock = yf.Ticker(symbol)
+            stock_info = stock.info
+            
+            # check  'shortName' is available
+            stock_name = stock_info.get('shortName')
+            
+            if stock_name:
+                return stock_name, 200
+            else:
+                # if not, get fast_info if available
+                fast_info = stock.fast_info
+                return fast_info.get('shortName', 'Unknown Stock'), 200
+        except HTTPError as http_err:
+            status = http_err.response.status_code
+            if status == 401:
+                print(f"Unauthorized access for symbol {symbol}: {http_err}")
+                return 'Unauthorized Access', status
             print(f"HTTP error occurred for symbol {symbol}: {http_err}")
-            return 'Unknown Stock'
-    except Exception as e:
-        print(f"Error fetching stock name for symbol {symbol}: {e}")
+            return None, status
+
+    return scheduler.call("yfinance", attempt)
+
+def get_stock_name(symbol):
+    # failures aren't cached, so the name is retried next time
+    stock_name = fetch_stock_name(symbol)
+    if not stock_name:
+        print(f"Error fetching stock name for symbol {symbol}")
         return 'Unknown Stock'
+    return stock_name
 
-def fetch_stock_data(symbol, period):
-    data_count = c_int()
+# resolution is d/w/m, see resolution.py - each resolution is cached separately
+@cached("eodhd", lambda symbol, period, resolution="d": (symbol, period, resolution))
+def fetch_stock_data(symbol, period, resolution="d"):
     symbol_bytes = symbol.encode('utf-8')
     period_bytes = period.encode('utf-8')
-    data_ptr = lib.fetch_stock_historical_data(symbol_bytes, period_bytes, byref(data_count))
-    if not data_ptr:
+    fetched = scheduler.call("eodhd", native_attempt(lib.fetch_stock_historical_data, symbol_bytes, period_bytes, resolution.encode('utf-8')), release=release_native)
+    if not fetched:
         print("Error fetching historical data")
         return []
+    data_ptr, data_count = fetched
 
     data_list = []
-    for i in range(data_count.value):
-        data = data_ptr[i]
-        try:
-            date = data.date.decode('utf-8', errors='ignore')  # Handle decoding errors
-        except UnicodeDecodeError:
-            print(f"Error decoding date for record {i}")
-            continue
-        
-        data_list.append({
-            "date": date,
-            "open": round(data.open, 4),   
-            "high": round(data.high, 4),   
-            "low": round(data.low, 4),     
-            "close": round(data.close, 4), 
-            "volume": data.volume
-        })
+    try:
+        for i in range(data_count):
+            data = data_ptr[i]
+            try:
+                date = data.date.decode('utf-8', errors='ignore')  # Handle decoding errors
+            except UnicodeDecodeError:
+                print(f"Error decoding date for record {i}")
+                continue
+            
+            data_list.append({
+                "date": date,
+                "open": round(data.open, 4),   
+                "high": round(data.high, 4),   
+                "low": round(data.low, 4),     
+                "close": round(data.close, 4), 
+                "volume": data.volume
+            })
+    finally:
+        lib.free_memory(data_ptr)
 
     return data_list
 
+# same request as fetch_stock_data, returned as a structured array straight from the native
+# buffer - not cached, it's for bulk exports that shouldn't fill the series cache
+def fetch_stock_array(symbol, period, resolution="d"):
+    fetched = scheduler.call("eodhd", native_attempt(lib.fetch_stock_historical_data, symbol.encode('utf-8'), period.encode('utf-8'), resolution.encode('utf-8')), release=release_native)
+    if not fetched:
+        print(f"Error fetching historical data for {symbol}")
+        return None
+    data_ptr, data_count = fetched
+    try:
+        return struct_array(data_ptr, data_count, StockHistoricalData)
+    finally:
+        lib.free_memory(data_ptr)
+
+index_tickers = {
+    "FTSE 100": "^FTSE",
+    "NASDAQ 100": "^NDX",
+    "S&P 500": "^GSPC",
+    "Dow Jones": "^DJI",
+    "DAX": "^GDAXI"
+}
+
 # eod do not offer data on compostite indices, so we will use yfinance  
-def fetch_historical_index_data(index, date_range, interval):
-    index_map = {
-        "FTSE 100": "^FTSE",
-        "NASDAQ 100": "^NDX",
-        "S&P 500": "^GSPC",
-        "Dow Jones": "^DJI",
-        "DAX": "^GDAXI"
-    }
+# the dataframe is converted a column at a time (no per row strftime/round) into lists,
+# which is what goes in the cache - dates stay iso strings only so the shared cache can hold them
+INDEX_COLUMNS = ["open", "high", "low", "close", "volume"]
 
-    index_ticker = index_map.get(index)
+# keyed apart from the old list of dicts entries, which may still be in the shared cache
+@cached("yfinance", lambda index, date_range, interval: ((index, "columns"), date_range, interval))
+def fetch_index_columns(index, date_range, interval):
+    import numpy as np
+    import yfinance as yf
+
+    index_ticker = index_tickers.get(index)
     if not index_ticker:
         print(f"Error: Invalid index name '{index}'")
-        return []
+        return None
 
     valid_periods = ['1d', '5d', '1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'ytd', 'max']
     if date_range not in valid_periods:
         print(f"Error: Invalid period '{date_range}', must be one of {valid_periods}")
-        return []
+        return None
 
-    try:
+    def attempt(connect_timeout, timeout):
         ticker = yf.Ticker(index_ticker)
-        hist = ticker.history(period=date_range, interval=interval)
-    except Exception as e:
-        print(f"Error fetching historical data: {e}")
+        return ticker.history(period=date_range, interval=interval, timeout=timeout), 200
+
+    hist = scheduler.call("yfinance", attempt)
+    if hist is None or hist.empty:
+        print(f"Error fetching historical data for {index_ticker}")
+        return None
+
+    # exchange local dates, the same ones strftime gave
+    index_dates = hist.index.tz_localize(None) if hist.index.tz is not None else hist.index
+    columns = {"dates": index_dates.values.astype("datetime64[D]").astype(str).tolist()}
+    for name in INDEX_COLUMNS:
+        values = hist[name.capitalize()].to_numpy(dtype=float)
+        columns[name] = (values if name == "volume" else np.round(values, 2)).tolist()
+    return columns
+
+def fetch_historical_index_data(index, date_range, interval):
+    # list of dicts like the other fetchers, for callers that want records
+    columns = fetch_index_columns(index, date_range, interval)
+    if not columns:
         return []
+    return [dict(zip(["date"] + INDEX_COLUMNS, row)) for row in zip(columns["dates"], *[columns[name] for name in INDEX_COLUMNS])]
 
-    data_list = []
-    for date, row in hist.iterrows():
-        data_list.append({
-            "date": date.strftime('%Y-%m-%d'),
-            "open": round(row['Open'], 2),
-            "high": round(row['High'], 2),
-            "low": round(row['Low'], 2),
-            "close": round(row['Close'], 2),
-            "volume": row['Volume']
-        })
+# numpy arrays of a composite's history, converted once per fetched value - a session's stock
+# charts are all drawn against the same handful of composites
+MAX_INDEX_ARRAYS = 16
+index_arrays = {}
+index_arrays_lock = threading.Lock()
 
-    return data_list
+def index_history(index, date_range, interval):
+    import numpy as np
+
+    columns = fetch_index_columns(index, date_range, interval)
+    if not columns:
+        return None
+    key = (index, date_range, interval)
+    with index_arrays_lock:
+        memo = index_arrays.get(key)
+        # the cache hands back the same object until the series is refetched
+        if memo is not None and memo[0] is columns:
+            return memo[1]
+    arrays = {"date": np.array(columns["dates"], dtype="datetime64[D]")}
+    for name in INDEX_COLUMNS:
+        arrays[name] = np.array(columns[name], dtype=float)
+    with index_arrays_lock:
+        index_arrays.pop(key, None)
+        index_arrays[key] = (columns, arrays)
+        while len(index_arrays) > MAX_INDEX_ARRAYS:
+            index_arrays.pop(next(iter(index_arrays)))
+    return arrays
+
+# one zoomed in window of a stock/fx series at a finer interval (e.g. 15m) - keyed by the
+# window, so each window is downloaded once. intraday dates are exchange local times
+@cached("yfinance", lambda symbol, start, end, interval: (symbol, (start, end), interval))
+def fetch_window_data(symbol, start, end, interval):
+    import numpy as np
+    import yfinance as yf
+
+    def attempt(connect_timeout, timeout):
+        ticker = yf.Ticker(symbol)
+        return ticker.history(start=start, end=end, interval=interval, timeout=timeout), 200
+
+    hist = scheduler.call("yfinance", attempt)
+    if hist is None:
+        print(f"Error fetching {interval} data for {symbol}")
+        return []
+    if hist.empty:
+        return []
+
+    # converted a column at a time like fetch_index_columns - exchange local times, to the minute
+    index_dates = hist.index.tz_localize(None) if hist.index.tz is not None else hist.index
+    dates = np.datetime_as_string(index_dates.values.astype("datetime64[D]" if interval == '1d' else "datetime64[m]")).tolist()
+    closes = np.round(hist['Close'].to_numpy(dtype=float), 4).tolist()
+    return [{"date": date, "close": close} for date, close in zip(dates, closes)]
 
-def fetch_currency_data(currency_pair, period):
+@cached("eodhd", lambda currency_pair, period, resolution="d": (currency_pair, period, resolution))
+def fetch_currency_data(currency_pair, period, resolution="d"):
     from_currency, to_currency = currency_pair.split('/')
     from_currency = from_currency.encode('utf-8')
     to_currency = to_currency.encode('utf-8')
     period = period.encode('utf-8')
 
-    data_ptr = lib.fetch_historical_data(from_currency, to_currency, period)
+    data_ptr = scheduler.call("eodhd", native_attempt(lib.fetch_historical_data, from_currency, to_currency, period, resolution.encode('utf-8'), with_count=False), release=lib.free_historical_data)
     if not data_ptr:
         result_label.config(text="Error fetching historical currency data")
         return None 
@@ -236,6 +393,41 @@ def fetch_currency_data(currency_pair, period):
 
     return historical_data
 
+def convert_currency(from_currency, to_currency, amount):
+    def attempt(connect_timeout, timeout):
+        lib.set_request_timeouts(int(connect_timeout * 1000), int(timeout * 1000))
+        result = lib.convert_currency(from_currency.encode('utf-8'), to_currency.encode('utf-8'), c_double(amount))
+        return (result if result != -1 else None), lib.get_last_http_status()
+
+    # returns None if the quote couldn't be fetched
+    return scheduler.call("yfapi", attempt)
+
+# yfapi allows up to 10 symbols per quote request
+QUOTE_BATCH_SIZE = 10
+
+@served
+def fetch_quotes(symbols):
+    # latest price for each symbol, batched - symbols that couldn't be quoted are left out
+    quotes = {}
+    for start in range(0, len(symbols), QUOTE_BATCH_SIZE):
+        batch = symbols[start:start + QUOTE_BATCH_SIZE]
+
+        def attempt(connect_timeout, timeout, batch=batch):
+            lib.set_request_timeouts(int(connect_timeout * 1000), int(timeout * 1000))
+            names = (c_char_p * len(batch))(*[symbol.encode('utf-8') for symbol in batch])
+            prices = (c_double * len(batch))()
+            found = lib.fetch_quotes(names, len(batch), prices)
+            return (list(prices) if found > 0 else None), lib.get_last_http_status()
+
+        prices = scheduler.call("yfapi", attempt)
+        if prices is None:
+            print(f"Error fetching quotes for {', '.join(batch)}")
+            continue
+        for symbol, price in zip(batch, prices):
+            if price == price:  # nan if the symbol wasn't in the response
+                quotes[symbol] = price
+    return quotes
+
 def get_supported_exchanges():
     exchanges = []
     exchanges_ptr = lib.get_supported_exchanges()
@@ -257,46 +449,51 @@ def get_supported_currencies():
             break
     return currencies
 
+@cached("imf", lambda country_code, data_type, start_year, end_year: (f"{data_type}.{country_code}", (start_year, end_year), "A"), ttl=TTL_MACRO)
 def get_economic_data(country_code, data_type, start_year, end_year):
-    data_count = c_int()
-    result = lib.get_economic_data(
+    fetched = scheduler.call("imf", native_attempt(
+        lib.get_economic_data,
         country_code.encode('utf-8'),
         data_type.encode('utf-8'),
         start_year.encode('utf-8'),
-        end_year.encode('utf-8'),
-        byref(data_count)
-    )
+        end_year.encode('utf-8')
+    ), release=release_native)
     
-    if not result:
+    if not fetched:
         return None
+    result, data_count = fetched
     
     economic_data = []
-    for i in range(data_count.value):
+    for i in range(data_count):
         economic_data.append({
             'date': result[i].year.decode('utf-8').strip('\x00'),
             'value': result[i].value
         })
     
-    lib.free(result)
+    lib.free_memory(result)
     
     return economic_data
 
-def get_interest_rate_data(series_id, start_date, end_date):
-    data_count = c_int()
-    result = lib.get_interest_rate_data(
+# frequency "" fetches the series' native frequency, otherwise fred aggregates it for us
+@cached("fred", lambda series_id, start_date, end_date, frequency="", aggregation="avg": (series_id, (start_date, end_date), (frequency, aggregation)), ttl=TTL_MACRO)
+def get_interest_rate_data(series_id, start_date, end_date, frequency="", aggregation="avg"):
+    fetched = scheduler.call("fred", native_attempt(
+        lib.get_interest_rate_data,
         series_id.encode('utf-8'),
         start_date.encode('utf-8'),
         end_date.encode('utf-8'),
-        byref(data_count)
-    )
+        frequency.encode('utf-8'),
+        aggregation.encode('utf-8')
+    ), release=release_native)
     
-    if not result:
+    if not fetched:
         print("Error: get_interest_rate_data returned NULL")
         return None
+    result, data_count = fetched
     
     try:
         interest_rate_data = []
-        for i in range(data_count.value):
+        for i in range(data_count):
             interest_rate_data.append({
                 'date': result[i].date.decode('utf-8').strip('\x00'),
                 'value': result[i].value
@@ -312,9 +509,16 @@ def get_interest_rate_data(series_id, start_date, end_date):
 
 # webscraping functions
 def fetch_and_parse(url, xpath):
-    chunk = url_mem()
-    result = lib.fetch_data(url.encode('utf-8'), byref(chunk))
-    if result != 0:
+    def attempt(connect_timeout, timeout):
+        lib.set_request_timeouts(int(connect_timeout * 1000), int(timeout * 1000))
+        chunk = url_mem()
+        if lib.fetch_data(url.encode('utf-8'), byref(chunk)) != 0:
+            lib.free_memory(chunk.memory)
+            return None, lib.get_last_http_status()
+        return chunk, lib.get_last_http_status()
+
+    chunk = scheduler.call("wikipedia", attempt, release=lambda chunk: lib.free_memory(chunk.memory))
+    if chunk is None:
         raise RuntimeError(f'Failed to fetch data from {url}')
     html_data = string_at(chunk.memory, chunk.size)
     count = c_int()
@@ -326,7 +530,17 @@ def fetch_and_parse(url, xpath):
     return tickers_list
 
 def scrape_index(index_info, filter_func=None):
-    response = requests.get(index_info['url'])
+    import requests
+    from lxml import html
+
+    def attempt(connect_timeout, timeout):
+        response = requests.get(index_info['url'], timeout=(connect_timeout, timeout))
+        return (response if response.ok else None), response.status_code
+
+    response = scheduler.call("wikipedia", attempt)
+    if response is None:
+        print(f"Error fetching constituents from {index_info['url']}")
+        return []
     tree = html.fromstring(response.content)
     
     names = tree.xpath(index_info['xpath_name'])
@@ -372,9 +586,28 @@ indices = {
     }
 }
 
+# constituents are scraped on first use (or warmed in the background after startup)
+# instead of at import, so importing backend.py never touches the network
 all_tickers = {}
-for index_name, index_info in indices.items():
-    if index_name == "DAX":
-        all_tickers[index_name] = scrape_index(index_info, dax_filter)
-    else:
-        all_tickers[index_name] = scrape_index(index_info)
+
+# cached like any other series, so other processes reuse the scrape instead of repeating it
+@cached("wikipedia", lambda index_name: (index_name, "constituents", ""), ttl=TTL_STATIC)
+def scrape_constituents(index_name):
+    index_info = indices.get(index_name)
+    if not index_info:
+        print(f"Error: Invalid index name '{index_name}'")
+        return []
+    return scrape_index(index_info, dax_filter if index_name == "DAX" else None)
+
+def get_index_constituents(index_name):
+    if index_name not in all_tickers:
+        companies = scrape_constituents(index_name)
+        if not companies:
+            return []  # don't remember a failed scrape
+        all_tickers[index_name] = [tuple(company) for company in companies]
+    return all_tickers[index_name]
+
+def load_all_tickers():
+    for index_name in indices:
+        get_index_constituents(index_name)
+    return all_tickers
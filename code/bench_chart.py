@@ -0,0 +1,255 @@
+# frame time benchmark for the chart's mouse callbacks - builds stock charts from synthetic series
+# (no network, no display: the figure is drawn with agg through a stand-in for the tk canvas) and
+# replays scripted hover and drag sequences through the handlers create_chart registers, timing
+# each event's handler and the redraw it asks for
+#   python bench_chart.py                     - 1k, 10k and 100k points, with and without the composite
+#   python bench_chart.py 1000 1000000        - chosen lengths
+#   python bench_chart.py --single            - without the composite's twin axis only
+#   python bench_chart.py --script=moves.json - replay [[event, x, y], ...] (axes fractions) instead
+#   python bench_chart.py --max-p95=50        - exit non-zero if any event type's p95 frame is slower
+import datetime
+import json
+import os
+import sys
+import time
+import types
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import numpy as np
+from matplotlib.backend_bases import MouseEvent
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import chart
+import session
+from leak_harness import Value, generated_days, generated_ohlc
+
+LENGTHS = [1000, 10000, 100000]
+SPAN_SECONDS = 5 * 365 * 24 * 3600
+PERCENTILES = [50, 95, 99]
+
+
+def sweep(start, end, steps, y=0.5):
+    return [("motion_notify_event", start + (end - start) * i / (steps - 1), y) for i in range(steps)]
+
+
+# x and y are fractions of the main axes - outside 0..1 is off the plot
+SCRIPTS = {
+    "hover": sweep(0.02, 0.98, 150) + [("motion_notify_event", 1.05, 0.5)],
+    "drag": [("motion_notify_event", 0.2, 0.5), ("button_press_event", 0.2, 0.5)] + sweep(0.2, 0.8, 80) + [("button_release_event", 0.8, 0.5)],
+    "drag-back": [("button_press_event", 0.9, 0.5)] + sweep(0.9, 0.1, 80) + [("button_release_event", 0.1, 0.5)],
+}
+
+
+class HeadlessWidget:
+    # what create_chart and the session call on tk frames/widgets and the root
+    def __init__(self, *args, **kwargs):
+        self.jobs = 0
+        self.alive = True
+
+    def pack(self, *args, **kwargs):
+        pass
+
+    def pack_forget(self):
+        pass
+
+    def destroy(self):
+        self.alive = False
+
+    def winfo_exists(self):
+        return self.alive
+
+    def winfo_width(self):
+        return 1
+
+    def winfo_height(self):
+        return 1
+
+    def winfo_children(self):
+        return []
+
+    def update_idletasks(self):
+        pass
+
+    def protocol(self, *args):
+        pass
+
+    def after(self, ms, fn=None, *args):
+        # nothing scheduled ever runs - debounced zoom fetches etc. aren't part of a frame
+        self.jobs += 1
+        return f"after#{self.jobs}"
+
+    def after_idle(self, fn, *args):
+        return self.after(0, fn, *args)
+
+    def after_cancel(self, job):
+        pass
+
+
+class HeadlessCanvas(FigureCanvasAgg):
+    # draw_idle only marks the canvas dirty, like tk's idle redraw - the bench flushes it after
+    # each event and counts both
+    def __init__(self, figure, master=None, identity=None, version=None):
+        super().__init__(figure)
+        self.widget = HeadlessWidget()
+        self.pending = False
+        self.requests = 0
+        self.draws = 0
+
+    def get_tk_widget(self):
+        return self.widget
+
+    def draw(self):
+        self.draws += 1
+        self.pending = False
+        super().draw()
+
+    def draw_idle(self, *args, **kwargs):
+        self.requests += 1
+        self.pending = True
+
+    def flush(self):
+        if self.pending:
+            self.draw()
+            return True
+        return False
+
+    def fit_to_widget(self):
+        pass
+
+    def on_settled(self, callback):
+        pass
+
+    def cancel_resize(self):
+        pass
+
+    def forget_bitmap(self):
+        pass
+
+
+class HeadlessToolbar:
+    mode = ""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def update(self):
+        pass
+
+    def pack(self, *args, **kwargs):
+        pass
+
+
+def use_headless_canvas():
+    chart.DeferredResizeCanvas = HeadlessCanvas
+    chart.NavigationToolbar2Tk = HeadlessToolbar
+    chart.tk = types.SimpleNamespace(Frame=HeadlessWidget, BOTH="both", BOTTOM="bottom", X="x")
+
+
+def synthetic_series(length, composite, seed=0):
+    # a random walk of length points spread over five years (minutes apart at 1M points), plus
+    # a daily composite when asked for - what handle_stock_data would return for it
+    rng = np.random.default_rng(seed + length)
+    step = max(1, SPAN_SECONDS // length)
+    end = np.datetime64(datetime.date.today(), "s")
+    stamps = end - (np.arange(length)[::-1] * step).astype("timedelta64[s]")
+    dates = stamps.tolist()
+    rates = (100 * np.exp(np.cumsum(rng.normal(0, 0.01, length)))).tolist()
+    if composite:
+        days = np.unique(stamps.astype("datetime64[D]"))
+        comp = {"date": days, "close": 3000 * np.exp(np.cumsum(rng.normal(0, 0.008, len(days))))}
+    else:
+        comp = {"date": np.array([], dtype="datetime64[D]"), "close": np.array([])}
+    # the info panel and indicator engine only need the last year of daily bars
+    records = generated_ohlc("BENCH", generated_days("1Y"))
+    engine = chart.engine_for(("BENCH", length), records)
+    title = f"Stock Data for BENCH ({length:,} points) against {'S&P 500' if composite else 'nothing'}"
+    return dates, rates, comp["date"], comp["close"], title, "Stock Price", records, comp, engine
+
+
+def build(length, composite):
+    data = synthetic_series(length, composite)
+    chart.handle_stock_data = lambda *args, **kwargs: data
+    controls = {name: Value(value) for name, value in [("financial", "Stock"), ("from", "GBP"), ("to", "USD"), ("region", "GB"), ("macro", "Inflation"),
+                                                        ("symbol", "BENCH"), ("composite", "S&P 500"), ("gdp", "Real GDP"), ("gov", "Debt")]}
+    controls["result"] = Value()
+    root = HeadlessWidget()
+    start = time.perf_counter()
+    chart_session = chart.create_chart(root, "5Y", controls["financial"], controls["from"], controls["to"], controls["region"], controls["macro"], controls["result"],
+                                       controls["symbol"], controls["composite"], controls["gdp"], controls["gov"])
+    return chart_session, (time.perf_counter() - start) * 1000
+
+
+def main_axes(figure):
+    return next(ax for ax in figure.axes if ax.get_title(loc="left"))
+
+
+def replay(chart_session, script):
+    # per event: handler time, redraw time, draw_idle calls and whether it redrew
+    canvas = chart_session.canvas
+    ax = main_axes(chart_session.figure)
+    timings = []
+    for name, fx, fy in script:
+        x, y = ax.transAxes.transform((fx, fy))
+        event = MouseEvent(name, canvas, x, y, button=1 if name != "motion_notify_event" else None)
+        requests = canvas.requests
+        start = time.perf_counter()
+        canvas.callbacks.process(name, event)
+        handled = time.perf_counter()
+        drew = canvas.flush()
+        done = time.perf_counter()
+        timings.append((name, (handled - start) * 1000, (done - handled) * 1000, drew, canvas.requests - requests))
+    return timings
+
+
+def summarise(timings):
+    # event type -> counts and percentiles of handler and frame (handler + redraw) time
+    summary = {}
+    for name in sorted(set(t[0] for t in timings)):
+        rows = [t for t in timings if t[0] == name]
+        handler = np.array([t[1] for t in rows])
+        frame = np.array([t[1] + t[2] for t in rows])
+        summary[name] = {"events": len(rows), "draws": sum(t[3] for t in rows), "requests": sum(t[4] for t in rows),
+                         "handler": dict(zip(PERCENTILES, np.percentile(handler, PERCENTILES))),
+                         "frame": dict(zip(PERCENTILES, np.percentile(frame, PERCENTILES))), "max": frame.max()}
+    return summary
+
+
+def load_script(path):
+    with open(path) as f:
+        return [(name, float(x), float(y)) for name, x, y in json.load(f)]
+
+
+def run(lengths=LENGTHS, composites=(False, True), scripts=SCRIPTS, max_p95=None):
+    use_headless_canvas()
+    failures = []
+    print(f"{'points':>9} {'comp':>4} {'script':>9} {'event':>20} {'n':>5} {'idle':>5} {'draws':>5}  {'handler p50/p95/p99 ms':>24}  {'frame p50/p95/p99 ms':>24} {'max':>7}")
+    for length in lengths:
+        for composite in composites:
+            chart_session, build_ms = build(length, composite)
+            if chart_session is None:
+                failures.append(f"{length} points: chart wasn't created")
+                continue
+            print(f"{length:>9,} {'yes' if composite else 'no':>4} built in {build_ms:.0f}ms, first draw included")
+            for script_name, script in scripts.items():
+                for name, stats in summarise(replay(chart_session, script)).items():
+                    handler = "/".join(f"{stats['handler'][p]:.2f}" for p in PERCENTILES)
+                    frame = "/".join(f"{stats['frame'][p]:.2f}" for p in PERCENTILES)
+                    print(f"{length:>9,} {'yes' if composite else 'no':>4} {script_name:>9} {name:>20} {stats['events']:>5} {stats['requests']:>5} {stats['draws']:>5}  {handler:>24}  {frame:>24} {stats['max']:>7.1f}")
+                    if max_p95 is not None and stats["frame"][95] > max_p95:
+                        failures.append(f"{length} points{' with composite' if composite else ''}, {script_name} {name}: p95 frame {stats['frame'][95]:.1f}ms (limit {max_p95}ms)")
+            session.end()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return not failures
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    lengths = [int(arg) for arg in args if arg.isdigit()] or LENGTHS
+    composites = (False,) if "--single" in args else (False, True)
+    option = lambda name: next((arg.split("=", 1)[1] for arg in args if arg.startswith(f"--{name}=")), None)
+    scripts = {os.path.basename(option("script")): load_script(option("script"))} if option("script") else SCRIPTS
+    max_p95 = float(option("max-p95")) if option("max-p95") else None
+    sys.exit(0 if run(lengths, composites, scripts, max_p95) else 1)
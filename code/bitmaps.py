@@ -0,0 +1,146 @@
+# rendered chart bitmaps - switching back to a chart that was just on screen (a stock's 1M
+# and 1Y, GB and US inflation) paints the last rasterisation of it straight away: paint_preview
+# puts it on a plain tk canvas over the chart's frame as soon as the data is in (from cache),
+# before any artist is built, and the chart's first draw restores the same pixels instead of
+# running Agg over the whole figure. the artists are built in between, so hover/drag work on top
+#   key     - (chart identity, canvas width, canvas height, dpi)
+#   version - fingerprint of the plotted data, a different one drops every size of that chart
+#   GFV_BITMAP_CACHE_MB=64  - memory budget, least recently painted bitmaps go first
+import os
+import threading
+from collections import OrderedDict
+
+import tkinter as tk
+
+import numpy as np
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+BITMAP_CACHE_MB = float(os.environ.get("GFV_BITMAP_CACHE_MB", "64"))
+
+
+class BitmapCache:
+    def __init__(self, max_bytes=BITMAP_CACHE_MB * 2**20):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._versions.get(key[0]) != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def latest(self, identity, version):
+        # the most recently painted size of a chart, for painting before its canvas exists
+        with self._lock:
+            if self._versions.get(identity) != version:
+                return None
+            for key in reversed(self._entries):
+                if key[0] == identity:
+                    return self._entries[key][0]
+        return None
+
+    def put(self, key, version, pixels, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            identity = key[0]
+            if self._versions.get(identity, version) != version:
+                self._drop(identity)
+            self._versions[identity] = version
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (pixels, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                evicted_key, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                if not any(k[0] == evicted_key[0] for k in self._entries):
+                    self._versions.pop(evicted_key[0], None)
+
+    def _drop(self, identity):
+        for key in [k for k in self._entries if k[0] == identity]:
+            self.bytes -= self._entries.pop(key)[1]
+        self._versions.pop(identity, None)
+
+    def invalidate(self, identity):
+        with self._lock:
+            self._drop(identity)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.bytes = 0
+
+
+bitmap_cache = BitmapCache()
+
+
+def data_version(*series):
+    # cheap fingerprint of everything plotted - any refetched value changes it
+    return hash(tuple(np.asarray(values, dtype=float).tobytes() for values in series if values is not None))
+
+
+def photo_image(pixels, master=None):
+    # rgba pixels as a tk PhotoImage, through binary ppm (the figure background is opaque)
+    height, width = pixels.shape[:2]
+    header = f"P6 {width} {height} 255 ".encode()
+    return tk.PhotoImage(master=master, width=width, height=height, data=header + np.ascontiguousarray(pixels[..., :3]).tobytes(), format="PPM")
+
+
+def paint_preview(master, identity, version, cache=bitmap_cache):
+    # the chart's last bitmap on a tk canvas placed over master, at the top left like the chart's
+    # own canvas - None if there isn't one. destroy it once the real canvas has drawn
+    pixels = cache.latest(identity, version) if identity is not None else None
+    if pixels is None:
+        return None
+    preview = tk.Canvas(master, borderwidth=0, highlightthickness=0, bg="black")
+    preview.photo = photo_image(pixels, master=preview)
+    preview.create_image(0, 0, anchor="nw", image=preview.photo)
+    preview.place(x=0, y=0, relwidth=1, relheight=1)
+    return preview
+
+
+class BitmapCanvas(FigureCanvasTkAgg):
+    # the first draw at each canvas size (after creation or a resize) is the chart as built, so it
+    # can come from the cache - draws after that follow interaction and always rasterise
+    def __init__(self, figure, master=None, identity=None, version=None, cache=bitmap_cache):
+        super().__init__(figure, master=master)
+        self.identity = identity
+        self.version = version
+        self.cache = cache
+        self._pristine = True
+
+    def forget_bitmap(self):
+        # the view no longer matches the chart as built (e.g. zoomed), stop reading and writing it
+        self.identity = None
+
+    def resize(self, event):
+        self._pristine = True
+        super().resize(event)
+
+    def draw(self):
+        if not self._pristine or self.identity is None:
+            self._pristine = False
+            return super().draw()
+        self._pristine = False
+        width, height = self.get_width_height(physical=True)
+        key = (self.identity, width, height, self.figure.dpi)
+        pixels = self.cache.get(key, self.version)
+        if pixels is not None:
+            np.asarray(self.get_renderer().buffer_rgba())[...] = pixels
+            self.blit()
+            return
+        super().draw()
+        pixels = np.asarray(self.get_renderer().buffer_rgba()).copy()
+        self.cache.put(key, self.version, pixels, pixels.nbytes)
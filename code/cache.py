@@ -0,0 +1,355 @@
+# in-memory cache of fetched series, keyed on the normalised request from coalesce.py
+# so every resolution/range of a series is kept as its own entry. backed by a sqlite file
+# shared by every process on the machine (gui instances, cron scripts importing backend.py)
+#   GFV_CACHE_PATH=/path/cache.sqlite   - where the shared cache lives
+#   GFV_SHARED_CACHE=0                  - in-memory only
+#   GFV_SERVICE_URL=http://host:8765    - fetch through a data service (service.py) instead of the providers
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from coalesce import request_key, single_flight
+
+# seconds - end of day data only changes once a day, macro data far less often
+TTL_MARKET = 15 * 60
+TTL_MACRO = 12 * 60 * 60
+TTL_STATIC = 24 * 60 * 60
+
+
+class SeriesCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, ttl=TTL_MARKET, cold=False):
+        # cold entries (bulk loads) go in as least recently used, so they only take free slots
+        # and never push out what the charts are using
+        with self._lock:
+            fresh = key not in self._entries
+            self._entries[key] = (value, time.time() + ttl)
+            if not cold:
+                self._entries.move_to_end(key)
+            elif fresh:
+                self._entries.move_to_end(key, last=False)
+            # bumped on every update so anything derived from the data can tell it's stale
+            self._versions[key] = self._versions.get(key, 0) + 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def version(self, key):
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def items(self):
+        # snapshot of the live entries, e.g. for exports
+        now = time.time()
+        with self._lock:
+            return [(key, entry[0]) for key, entry in self._entries.items() if entry[1] >= now]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+series_cache = SeriesCache()
+
+
+def _json_default(value):
+    # numpy/pandas scalars from yfinance
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class SharedCache:
+    # sqlite in wal mode - readers never block each other or the writer, writes are single row
+    # transactions (so an entry is either all there or not at all) serialised by sqlite's lock.
+    # least recently read entries are evicted once the values pass max_bytes
+    def __init__(self, path, max_bytes=256 * 2**20, touch_interval=60):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires REAL NOT NULL, accessed REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            conn.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner INTEGER NOT NULL, expires REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def _run(self, fn):
+        # a broken or locked cache file must never break a fetch, just fall back to memory only
+        if not self.enabled:
+            return None
+        try:
+            return fn(self._connect())
+        except sqlite3.OperationalError as e:
+            print(f"Shared cache unavailable: {e}")
+            return None
+        except sqlite3.DatabaseError as e:
+            print(f"Shared cache disabled: {e}")
+            self.enabled = False
+            return None
+
+    def get(self, key):
+        # returns (value, seconds left) or None
+        def read(conn):
+            now = time.time()
+            row = conn.execute("SELECT value, expires, accessed FROM entries WHERE key = ?", (json.dumps(key),)).fetchone()
+            if row is None or row[1] < now:
+                self.misses += 1
+                return None
+            if now - row[2] > self.touch_interval:
+                # recency only needs to be roughly right, so reads don't write every time
+                conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, json.dumps(key)))
+            self.hits += 1
+            return json.loads(row[0]), row[1] - now
+        return self._run(read)
+
+    def put(self, key, value, ttl):
+        def write(conn):
+            now = time.time()
+            data = json.dumps(value, default=_json_default)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", (json.dumps(key), data, now + ttl, now, len(data)))
+                conn.execute("DELETE FROM entries WHERE expires < ?", (now,))
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        self._run(write)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if total - freed <= self.max_bytes:
+                break
+            doomed.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def claim(self, key, lease=30):
+        # cross-process single flight - True if this process should fetch the key, False if
+        # another live process already is (stale leases from crashed processes expire)
+        def write(conn):
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT owner, expires FROM leases WHERE key = ?", (json.dumps(key),)).fetchone()
+                claimed = row is None or row[1] < now or row[0] == os.getpid()
+                if claimed:
+                    conn.execute("INSERT OR REPLACE INTO leases VALUES (?, ?, ?)", (json.dumps(key), os.getpid(), now + lease))
+                conn.execute("COMMIT")
+                return claimed
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        claimed = self._run(write)
+        return True if claimed is None else claimed
+
+    def release(self, key):
+        self._run(lambda conn: conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (json.dumps(key), os.getpid())))
+
+    def wait_for(self, key, timeout=30, poll=0.1):
+        # value stored by the process holding the lease, or None if it gave up or timed out
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            shared = self.get(key)
+            if shared is not None:
+                return shared
+            if self._run(lambda conn: conn.execute("SELECT 1 FROM leases WHERE key = ?", (json.dumps(key),)).fetchone()) is None:
+                return None
+            time.sleep(poll)
+        return None
+
+    def invalidate(self, key):
+        self._run(lambda conn: conn.execute("DELETE FROM entries WHERE key = ?", (json.dumps(key),)))
+
+    def clear(self):
+        self._run(lambda conn: conn.execute("DELETE FROM entries"))
+
+    def stats(self):
+        row = self._run(lambda conn: conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone())
+        entries, size = row or (0, 0)
+        return {"entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+
+def default_shared_path():
+    return os.environ.get("GFV_CACHE_PATH") or os.path.join(os.path.expanduser("~"), ".cache", "gfv", "cache.sqlite")
+
+
+shared_cache = SharedCache(default_shared_path())
+shared_cache.enabled = os.environ.get("GFV_SHARED_CACHE", "1") != "0"
+
+
+def lookup(key, cold=False):
+    # memory first, then the shared file (filling memory from it)
+    value = series_cache.get(key)
+    if value is not None:
+        return value
+    shared = shared_cache.get(key)
+    if shared is None:
+        return None
+    value, remaining = shared
+    series_cache.put(key, value, remaining, cold)
+    return value
+
+
+def store(key, value, ttl, cold=False):
+    series_cache.put(key, value, ttl, cold)
+    shared_cache.put(key, value, ttl)
+
+
+def fetch_shared(key, fn, ttl, *args, cold=False, **kwargs):
+    # one process fetches, the others wait for its result to land in the shared file
+    if not shared_cache.claim(key):
+        shared = shared_cache.wait_for(key)
+        if shared is not None:
+            value, remaining = shared
+            series_cache.put(key, value, remaining, cold)
+            return value
+    try:
+        value = fn(*args, **kwargs)
+        if value:
+            store(key, value, ttl, cold)
+        return value
+    finally:
+        shared_cache.release(key)
+
+
+# client of the data service when GFV_SERVICE_URL is set - misses go to it instead of the provider
+remote = None
+
+
+def use_service(url):
+    global remote
+    if url:
+        from service import ServiceClient
+        remote = ServiceClient(url)
+    else:
+        remote = None
+
+
+use_service(os.environ.get("GFV_SERVICE_URL"))
+
+
+def fetch_remote(name, args, kwargs):
+    # (True, value) from the service, (False, None) if it's unreachable or failed the call (an older
+    # build without the function, an upstream error) and the caller should fetch itself
+    if remote is None or not remote.available():
+        return False, None
+    try:
+        return True, remote.call(name, args, kwargs)
+    except ConnectionError as e:
+        print(f"{e} - fetching directly for now")
+        return False, None
+    except (RuntimeError, KeyError) as e:
+        print(f"Error from data service calling {name}: {e} - fetching directly")
+        return False, None
+
+
+def served(fn):
+    # uncached fetches (live quotes) that still go through the data service when there is one
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        ok, value = fetch_remote(fn.__name__, args, kwargs)
+        return value if ok else fn(*args, **kwargs)
+    return wrapper
+
+
+# called with the key of every cached fetch a caller asked for - prefetch.py counts its hits with it
+use_hooks = []
+
+
+def note_use(key):
+    for hook in use_hooks:
+        hook(key)
+
+
+# called with (provider, key) whenever a cached fetch misses and goes out to the service or the provider
+fetch_hooks = []
+
+
+def cached(provider, key_func, ttl=TTL_MARKET):
+    # cache lookup, then fall through to a coalesced fetch - empty results aren't cached
+    def decorator(fn):
+        def fetch(key, cold, *args, **kwargs):
+            # another process may have stored it while this one waited on the flight
+            value = lookup(key, cold)
+            if value is not None:
+                return value
+            for hook in fetch_hooks:
+                hook(provider, key)
+            ok, value = fetch_remote(fn.__name__, args, kwargs)
+            if ok:
+                # kept locally too, so repeat views don't go back to the service
+                if value:
+                    store(key, value, ttl, cold)
+                return value
+            return fetch_shared(key, fn, ttl, *args, cold=cold, **kwargs)
+
+        def call(cold, args, kwargs):
+            key = request_key(provider, *key_func(*args, **kwargs))
+            if use_hooks:
+                note_use(key)
+            value = lookup(key, cold)
+            if value is not None:
+                return value
+            return single_flight.do(key, fetch, key, cold, *args, **kwargs)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return call(False, args, kwargs)
+
+        # for bulk loads (hundreds of series for one correlation run) - same caching, but the series
+        # only take free memory slots, so the entries the charts use aren't flushed
+        wrapper.cold = lambda *args, **kwargs: call(True, args, kwargs)
+
+        # so a caller can check the cache (or a budget) before fetching
+        wrapper.provider = provider
+        wrapper.cache_key = lambda *args, **kwargs: request_key(provider, *key_func(*args, **kwargs))
+        return wrapper
+    return decorator
@@ -1,21 +1,29 @@
+# imported lazily by gui.py on the first chart request (or warmed after startup),
+# so nothing here should be imported from the startup path
 import numpy as np
 import datetime
+import tkinter as tk
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
+import matplotlib.ticker as ticker
 from matplotlib.dates import DateFormatter
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.backends.backend_tkagg import NavigationToolbar2Tk
+from matplotlib.figure import Figure
+from matplotlib.collections import LineCollection, PolyCollection
 
-from gui import *
 from backend import *
+from resolution import BARS_PER_YEAR, PLOT_WIDTH_FRACTION, chart_pixel_width, eodhd_resolution, yfinance_interval, fred_frequency, get_composite_period, get_date_range
+from indicators import OVERLAYS, IndicatorEngine, SlidingExtrema, engine_for
+import session
+from fx import fetch_cross_rates
+from align import RELATIVE_MODES, asof_join, nearest_index, relative_series
+from zoom import FX_MINUTES, STOCK_MINUTES, WindowDetail
+from rangestats import RangeStats, bars_per_year
+from bitmaps import data_version, paint_preview
+from portfolio import load_holdings, value_portfolio
+from resample import align_mixed, change_over, resample_bars, resample_records, to_days
+from redraw import DeferredResizeCanvas
 
-fig = None
-ax = None
-canvas = None
-vertical_line = None
-last_xdata = None
-mouse_move_cid = None 
-
-chart_frame = None
 
 current_year = datetime.datetime.now().year
 last_month = datetime.datetime.now().replace(day=1) - datetime.timedelta(days=1)
@@ -33,25 +41,32 @@ def format_yaxis(value, tick_number):
     return f'{value:.2f}'
 
 def destroy_chart():
-    if chart_frame:
-        chart_frame.destroy()
+    # releases the figure, canvas, callbacks and streams of the chart on screen
+    session.end()
+
+def on_window_close(root):
+    destroy_chart()
+    root.quit()
+    root.destroy()
 
-def display_stock_info(fig, stock_data):
+def display_stock_info(fig, stock_data, engine):
     info_ax = fig.add_axes([0.125, 0.02, 0.775, 0.15])
     info_ax.axis('off')
     latest_data = stock_data[-1]
+    # true 52 week range from the indicator engine, not just the charted period
+    extrema = engine.add("52W", SlidingExtrema(365))
     info_text = (
         f"Open: {latest_data['open']:.2f}   "
         f"High: {latest_data['high']:.2f}   "
         f"Low: {latest_data['low']:.2f}   "
         f"Close: {latest_data['close']:.2f}\n"
         f"Volume: {latest_data['volume']:,.0f}   "
-        f"52W High: {max(d['high'] for d in stock_data):.2f}   "
-        f"52W Low: {min(d['low'] for d in stock_data):.2f}"
+        f"52W High: {extrema.outputs['high'].values[-1]:.2f}   "
+        f"52W Low: {extrema.outputs['low'].values[-1]:.2f}"
     )
     info_ax.text(0.5, 0.5, info_text, ha='center', va='center', color='#5cc4fc', fontsize=10)
 
-def handle_stock_data(period, stock_symbol_var, stock_composite_combobox, result_label):
+def handle_stock_data(period, stock_symbol_var, stock_composite_combobox, result_label, pixel_width):
     symbol = stock_symbol_var.get()
     comp_symbol = stock_composite_combobox.get()
     
@@ -62,25 +77,36 @@ def handle_stock_data(period, stock_symbol_var, stock_composite_combobox, result
     if comp_symbol == "DAX":
         symbol = symbol.replace(".DE", "") + ".XETRA"
         
-    historical_data = fetch_stock_data(symbol, period)
+    # fetch no more points than the plot area can show
+    resolution = eodhd_resolution(period, pixel_width)
+    historical_data = fetch_stock_data(symbol, period, resolution)
     period_c = get_composite_period(period)
-    historical_comp_data = fetch_historical_index_data(comp_symbol, period_c, "1d")
+    # numpy columns, converted once per fetch and shared by every chart against this composite
+    historical_comp_data = index_history(comp_symbol, period_c, yfinance_interval(period, pixel_width))
     
     if not historical_data or not historical_comp_data:
         handle_data_fetch_error(historical_data, historical_comp_data, comp_symbol)
         return None
 
+    # indicators run over at least a year of bars so the 52W range and long averages
+    # are right on 1M/3M charts too - the engine only appends bars it hasn't seen
+    history = historical_data
+    if resolution == "d" and period != "1Y":
+        history = fetch_stock_data(symbol, "1Y", "d") or historical_data
+    engine = engine_for((symbol, resolution), history, BARS_PER_YEAR[resolution])
+    engine.append_records(historical_data)
+
     dates, rates = process_historical_data(historical_data)
-    dates_c, rates_c = process_historical_data(historical_comp_data)
+    dates_c, rates_c = historical_comp_data["date"], historical_comp_data["close"]
     # remove .xetra from symbol name if dax is selected - api requires .de
     symbol = symbol.replace(".XETRA", "") + ".DE" if comp_symbol == "DAX" else symbol
     symbol_name = get_stock_name(symbol)
     title = f'Stock Data for {symbol_name} against {"DAX" if comp_symbol == "DAX" else comp_symbol}'
     ylabel = "Stock Price"
     
-    return dates, rates, dates_c, rates_c, title, ylabel, historical_data, historical_comp_data
+    return dates, rates, dates_c, rates_c, title, ylabel, historical_data, historical_comp_data, engine
 
-def handle_currency_data(period, from_currency_combobox, to_currency_combobox, results_label):
+def handle_currency_data(period, from_currency_combobox, to_currency_combobox, results_label, pixel_width):
     from_currency = from_currency_combobox.get()
     to_currency = to_currency_combobox.get()
     
@@ -88,8 +114,9 @@ def handle_currency_data(period, from_currency_combobox, to_currency_combobox, r
         result_label.config(text="Please select both currencies")
         return None
 
+    # derived from the cached USD series of each currency rather than fetched per pair
     currency_pair = f"{from_currency}/{to_currency}"
-    historical_data = fetch_currency_data(currency_pair, period)
+    historical_data = fetch_cross_rates(from_currency, to_currency, period, eodhd_resolution(period, pixel_width))
 
     if historical_data is None:
         result_label.config(text="Error fetching historical data")
@@ -101,7 +128,39 @@ def handle_currency_data(period, from_currency_combobox, to_currency_combobox, r
 
     return dates, rates, title, ylabel, historical_data
 
-def handle_macro_data(period, region_combobox, macro_economic_combobox, result_label, gdp_metric_combobox, gov_metric_combobox):
+def handle_portfolio_data(period, portfolio, result_label, pixel_width):
+    # portfolio is {"path": holdings csv, "base": currency}, see portfolio.py
+    if not portfolio or not portfolio.get("path"):
+        result_label.config(text="Please load a holdings file")
+        return None
+    try:
+        holdings = load_holdings(portfolio["path"])
+    except OSError as e:
+        result_label.config(text=f"Error reading holdings: {e}")
+        return None
+    base = portfolio.get("base") or "USD"
+
+    valuation = value_portfolio(holdings, base, period, eodhd_resolution(period, pixel_width))
+    if valuation is None:
+        result_label.config(text="No price data for any holding")
+        return None
+    notes = []
+    if valuation.missing:
+        notes.append(f"No data for {', '.join(valuation.missing[:5])}{'...' if len(valuation.missing) > 5 else ''}")
+    if valuation.late:
+        notes.append(f"Starts {valuation.calendar[0]}, when {', '.join(valuation.late[:3])}{'...' if len(valuation.late) > 3 else ''} begin")
+    stale = valuation.stale_symbols()
+    if stale:
+        notes.append(f"Carried fx rates for {', '.join(stale[:3])}{'...' if len(stale) > 3 else ''}")
+    if notes:
+        result_label.config(text="\n".join(notes))
+
+    dates = valuation.calendar.astype('datetime64[s]').astype(datetime.datetime).tolist()
+    title = f'Portfolio Value ({len(valuation.symbols)} holdings, {base})'
+    ylabel = f"Value ({base})"
+    return dates, valuation.total.tolist(), title, ylabel, valuation
+
+def handle_macro_data(period, region_combobox, macro_economic_combobox, result_label, gdp_metric_combobox, gov_metric_combobox, pixel_width):
     country_code = region_combobox.get()
     region_name = get_region_name(country_code)
     macro_indicator = macro_economic_combobox.get()
@@ -111,11 +170,7 @@ def handle_macro_data(period, region_combobox, macro_economic_combobox, result_l
     elif macro_indicator in ["GDP", "Unemployment Rate", "Government Finances"]:
         return handle_economic_data(period, region_name, macro_indicator, region_combobox, result_label, gdp_metric_combobox, gov_metric_combobox)
     elif macro_indicator == "Interest Rates":
-        return handle_interest_rate_data(period, region_name, region_combobox, result_label)
-
-def get_composite_period(period):
-    period_map = {"1M": "1mo", "3M": "3mo", "YTD": "ytd", "1Y": "1y"}
-    return period_map.get(period, period)
+        return handle_interest_rate_data(period, region_name, region_combobox, result_label, pixel_width)
 
 def handle_data_fetch_error(historical_data, historical_comp_data, comp_symbol):
     if not historical_data:
@@ -199,10 +254,10 @@ def handle_economic_data(period, region_name, indicator, region_combobox, result
     dates, rates = process_economic_data(historical_data)
     return dates, rates, title, ylabel, historical_data
 
-def handle_interest_rate_data(period, region_name, region_combobox, result_label):
+def handle_interest_rate_data(period, region_name, region_combobox, result_label, pixel_width):
     start_year, end_year = get_date_range(period)
     country_code = region_combobox.get()
-    historical_data = get_interest_rate_data(country_code, start_year, end_year)
+    historical_data = get_interest_rate_data(country_code, start_year, end_year, fred_frequency(country_code, period, pixel_width))
     
     if historical_data is None:
         result_label.config(text="Error fetching interest rate data")
@@ -214,25 +269,6 @@ def handle_interest_rate_data(period, region_name, region_combobox, result_label
 
     return dates, rates, title, ylabel, historical_data
 
-def get_date_range(period):
-    current_year = datetime.datetime.now().year
-    last_month = datetime.datetime.now().replace(day=1) - datetime.timedelta(days=1)
-    
-    if period == "5Y":
-        return str(current_year - 5), last_month.strftime('%Y-%m')
-    elif period == "10Y":
-        return str(current_year - 10), str(current_year)
-    elif period == "20Y":
-        return str(current_year - 20), str(current_year)
-    elif period == "30Y":
-        return str(current_year - 30), str(current_year)
-    elif period == "40Y":
-        return str(current_year - 40), str(current_year)
-    elif period == "Max":
-        return str(current_year - 100), str(current_year)
-    else:
-        return str(current_year - 5), str(current_year)  # default to  5Y
-
 def process_economic_data(data):
     dates, rates = [], []
     for item in data:
@@ -257,39 +293,182 @@ def get_gdp_labels(region_name, gdp_metric_combobox):
         return f'{region_name} GDP', "GDP"
 
 
-def create_chart(root, period, financial_data_combobox, from_currency_combobox, to_currency_combobox, region_combobox, macro_economic_combobox, result_label, stock_symbol_var, stock_composite_combobox, gdp_metric_combobox, gov_metric_combobox):
+# strips (volume, oscillators) stack upwards from just above the stock info panel
+STRIP_BOTTOM = 0.24
+STRIP_HEIGHT = 0.1
+STRIP_GAP = 0.02
+
+def strip_rect(index):
+    return [0.125, STRIP_BOTTOM + index * (STRIP_HEIGHT + STRIP_GAP), 0.775, STRIP_HEIGHT]
+
+def style_strip(strip_ax, label, color):
+    strip_ax.set_facecolor('#222222')
+    strip_ax.set_ylabel(label, color=color, fontsize=8)
+    strip_ax.tick_params(axis='x', colors='white')
+    strip_ax.tick_params(axis='y', colors='white', labelsize=7)
+    for side in ('top', 'right'):
+        strip_ax.spines[side].set_visible(False)
+    strip_ax.spines['left'].set_color(color)
+    strip_ax.spines['bottom'].set_color('#5cc4fc')
+
+def format_volume(x, pos):
+    for size, suffix in ((1e9, 'B'), (1e6, 'M'), (1e3, 'K')):
+        if abs(x) >= size:
+            return f'{x / size:.0f}{suffix}'
+    return f'{x:.0f}'
+
+def draw_candlesticks(ax, vol_ax, records):
+    # every body, wick and volume bar goes into one collection each, colours are picked
+    # with a single vectorised comparison - no per bar artists
+    records = sorted(records, key=lambda r: r['date'])
+    x = mdates.date2num(np.array([r['date'] for r in records], dtype='datetime64[D]'))
+    o = np.array([r['open'] for r in records], dtype=float)
+    h = np.array([r['high'] for r in records], dtype=float)
+    l = np.array([r['low'] for r in records], dtype=float)
+    c = np.array([r['close'] for r in records], dtype=float)
+    v = np.array([r.get('volume', 0) for r in records], dtype=float)
+
+    half = 0.35 * (np.median(np.diff(x)) if len(x) > 1 else 1.0)
+    colors = np.where((c >= o)[:, None], np.array([0.15, 0.65, 0.6, 1.0]), np.array([0.94, 0.33, 0.31, 1.0]))
+
+    # doji bodies still get a visible sliver
+    bottom = np.minimum(o, c)
+    top = np.maximum(np.maximum(o, c), bottom + (h.max() - l.min()) * 1e-3)
+    bodies = np.stack([np.column_stack(pair) for pair in ((x - half, bottom), (x - half, top), (x + half, top), (x + half, bottom))], axis=1)
+    wicks = np.stack([np.column_stack((x, l)), np.column_stack((x, h))], axis=1)
+    volume = np.stack([np.column_stack(pair) for pair in ((x - half, np.zeros_like(v)), (x - half, v), (x + half, v), (x + half, np.zeros_like(v)))], axis=1)
+
+    ax.add_collection(LineCollection(wicks, colors=colors, linewidths=1, zorder=3))
+    ax.add_collection(PolyCollection(bodies, facecolors=colors, edgecolors=colors, linewidths=0.5, zorder=4))
+    vol_ax.add_collection(PolyCollection(volume, facecolors=colors, edgecolors='none', alpha=0.7))
+    vol_ax.set_ylim(0, v.max() * 1.1 if v.max() > 0 else 1)
+    vol_ax.yaxis.set_major_formatter(ticker.FuncFormatter(format_volume))
+    vol_ax.yaxis.set_major_locator(ticker.MaxNLocator(3))
+    style_strip(vol_ax, 'Volume', '#5cc4fc')
+    return l.min(), h.max()
+
+def draw_overlay(fig, ax, engine, overlay, start_date, rect):
+    # price overlays go on the main axis, oscillators get their own strip under it
+    indicator = engine.add(overlay, OVERLAYS[overlay]())
+    visible = engine.dates >= np.datetime64(start_date, 'D')
+    x = engine.dates[visible]
+    overlay_color = '#f5a623'
+
+    if indicator.price_overlay:
+        if 'upper' in indicator.outputs:
+            upper = indicator.outputs['upper'].values[visible]
+            lower = indicator.outputs['lower'].values[visible]
+            ax.plot(x, indicator.outputs['mid'].values[visible], color=overlay_color, linewidth=1, linestyle='--', zorder=2)
+            ax.plot(x, upper, color=overlay_color, linewidth=1, zorder=2)
+            ax.plot(x, lower, color=overlay_color, linewidth=1, zorder=2)
+            ax.fill_between(x, lower, upper, color=overlay_color, alpha=0.08, zorder=1)
+        else:
+            ax.plot(x, engine.output(overlay)[visible], color=overlay_color, linewidth=1.5, zorder=2)
+        return None
+
+    osc_ax = fig.add_axes(rect, sharex=ax)
+    osc_ax.plot(x, engine.output(overlay)[visible], color=overlay_color, linewidth=1.2)
+    if overlay.startswith("RSI"):
+        osc_ax.set_ylim(0, 100)
+        for level in (30, 70):
+            osc_ax.axhline(level, color='white', linewidth=0.6, alpha=0.4, linestyle='--')
+    style_strip(osc_ax, indicator.label, overlay_color)
+    return osc_ax
+
+# bars built from the daily records for the chart's own "Bars" choice
+BAR_FREQUENCIES = {"Weekly": "w", "Monthly": "m", "Quarterly": "q"}
+
+def bar_engine(engine, freq):
+    # indicator engine over engine's bars resampled to freq, annualising at the coarser of the two
+    dates, columns = resample_bars(engine.dates, {"close": engine.close, "high": engine.high, "low": engine.low}, freq)
+    resampled = IndicatorEngine(min(engine.periods_per_year, BARS_PER_YEAR[freq]))
+    resampled.append(dates, columns["close"], columns["high"], columns["low"])
+    return resampled
+
+# macro series shown under a stock chart are the composite's country's
+MACRO_OVERLAYS = ["None", "Inflation", "Bond yield", "Inflation + yield"]
+COMPOSITE_COUNTRY = {"FTSE 100": "GB", "NASDAQ 100": "US", "S&P 500": "US", "Dow Jones": "US", "DAX": "DE"}
+MACRO_COLORS = ['#c77dff', '#7bd88f']
+
+def handle_macro_overlay(macro, country_code, start_date, result_label):
+    # label -> (dates, values) in percent at the series' own frequency - monthly cpi index as year
+    # on year inflation, the 10y government bond yield as fred publishes it
+    start_year, end_year = str(start_date.year - 1), str(current_year)
+    series = {}
+    if macro in ("Inflation", "Inflation + yield"):
+        cpi = get_price_index_data("Inflation", country_code, start_year, end_year)
+        if cpi:
+            series[f'{country_code} CPI YoY'] = change_over([r['date'] for r in cpi], [r['value'] for r in cpi])
+    if macro in ("Bond yield", "Inflation + yield"):
+        rates = get_interest_rate_data(country_code, start_year, end_year)
+        if rates:
+            series[f'{country_code} 10Y'] = (to_days([r['date'] for r in rates]), np.array([r['value'] for r in rates], dtype=float))
+    if not series:
+        result_label.config(text=f"No {macro.lower()} data for {country_code}")
+    return series
+
+def draw_macro_strip(fig, ax, series, start_date, rect):
+    # step lines - a monthly print holds until the next one, which is what the hover reads too
+    macro_ax = fig.add_axes(rect, sharex=ax)
+    start = np.datetime64(start_date, 'D')
+    markers = []
+    for (label, (dates, values)), color in zip(series.items(), MACRO_COLORS):
+        # the last print before the chart starts is what's in force on its first day
+        first = max(0, np.searchsorted(dates, start, side='right') - 1)
+        macro_ax.step(dates[first:], values[first:], where='post', color=color, linewidth=1.2, label=label)
+        marker, = macro_ax.plot([], [], 'o', color=color, markersize=5, markeredgecolor='black', markeredgewidth=1)
+        marker.set_visible(False)
+        markers.append(marker)
+    macro_ax.yaxis.set_major_locator(ticker.MaxNLocator(3))
+    macro_ax.legend(loc='upper left', fontsize=7, frameon=False, labelcolor='white', ncol=len(series))
+    style_strip(macro_ax, '%', MACRO_COLORS[0])
+    return macro_ax, markers
+
+def start_live_chart(chart_session, series, decimals):
+    from live import LiveChart
+
+    chart_session.live = LiveChart(chart_session.root, chart_session.canvas, series, decimals)
+    chart_session.own(chart_session.live.stop)
+
+def stop_live_chart():
+    if session.current and session.current.live:
+        session.current.live.stop()
+
+def create_chart(root, period, financial_data_combobox, from_currency_combobox, to_currency_combobox, region_combobox, macro_economic_combobox, result_label, stock_symbol_var, stock_composite_combobox, gdp_metric_combobox, gov_metric_combobox, overlay="None", live=False, chart_type="Line", portfolio=None, macro="None", bars="Auto"):
     stockBool = False
     currencyBool = False
-    global chart_frame, fig, ax, canvas
-    if 'chart_frame' in globals() and chart_frame:
-        for widget in chart_frame.winfo_children():
-            widget.destroy()
-        chart_frame.destroy()
-    
-    if 'fig' in globals():
-        plt.close(fig)
-    destroy_chart()
-    chart_frame = tk.Frame(root, bg='black')
-    chart_frame.pack(pady=8, padx=10, fill=tk.BOTH, expand=True)
+    portfolioBool = False
+    # everything the previous chart held is released before anything new is fetched or drawn
+    chart_session = session.begin(root)
+    chart_session.frame = tk.Frame(root, bg='black')
+    chart_session.frame.pack(pady=8, padx=10, fill=tk.BOTH, expand=True)
     
     selected_financial_data = financial_data_combobox.get()
+    pixel_width = chart_pixel_width(root)
     
     if selected_financial_data == "Stock":
-        data = handle_stock_data(period, stock_symbol_var, stock_composite_combobox, result_label)
+        data = handle_stock_data(period, stock_symbol_var, stock_composite_combobox, result_label, pixel_width)
         if data:
-            dates, rates, dates_c, rates_c, title, ylabel, historical_data, historical_comp_data = data
+            dates, rates, dates_c, rates_c, title, ylabel, historical_data, historical_comp_data, engine = data
             stockBool = True
         else:
             return
     elif selected_financial_data == "Currency":
-        data = handle_currency_data(period, from_currency_combobox, to_currency_combobox, result_label)
+        data = handle_currency_data(period, from_currency_combobox, to_currency_combobox, result_label, pixel_width)
         if data:
             dates, rates, title, ylabel, historical_data = data
             currencyBool = True
         else:
             return
+    elif selected_financial_data == "Portfolio":
+        data = handle_portfolio_data(period, portfolio, result_label, pixel_width)
+        if data:
+            dates, rates, title, ylabel, valuation = data
+            portfolioBool = True
+        else:
+            return
     elif selected_financial_data == "Macro-Economic Indicators":
-        data = handle_macro_data(period, region_combobox, macro_economic_combobox, result_label, gdp_metric_combobox, gov_metric_combobox)
+        data = handle_macro_data(period, region_combobox, macro_economic_combobox, result_label, gdp_metric_combobox, gov_metric_combobox, pixel_width)
         if data:
             dates, rates, title, ylabel, historical_data = data
         else:
@@ -308,22 +487,74 @@ def create_chart(root, period, financial_data_combobox, from_currency_combobox,
     sorted_data = sorted(zip(dates, rates))
     dates, rates = zip(*sorted_data)
 
-    # create new figure and axis
-    fig, ax = plt.subplots(figsize=(10, 6), dpi=100)
+    # weekly/monthly/quarterly bars are built from the daily records (the stock info panel keeps
+    # the daily ones), the composite is joined onto the bars' dates like it is onto days
+    bar_data = historical_data if stockBool else None
+    overlay_engine = engine if stockBool else None
+    if stockBool and bars in BAR_FREQUENCIES:
+        bar_data = resample_records(historical_data, BAR_FREQUENCIES[bars])
+        dates, rates = zip(*sorted(zip(*process_historical_data(bar_data))))
+        if OVERLAYS.get(overlay):
+            # overlays run over the same bars, built from the daily engine's whole history
+            overlay_engine = bar_engine(engine, BAR_FREQUENCIES[bars])
+
+    # composite as-of joined onto the stock's dates once - the relative modes and the hover
+    # readout index into it with the stock's own index
+    comp_aligned = None
+    prices = rates
+    relative_mode = stockBool and chart_type in RELATIVE_MODES
+    if stockBool and len(dates_c):
+        comp_aligned = asof_join(np.array(dates, dtype='datetime64[D]'), dates_c, rates_c)
+    if relative_mode and comp_aligned is None:
+        result_label.config(text="No valid composite data available")
+        relative_mode = False
+    if relative_mode:
+        values, ylabel = relative_series(chart_type, rates, comp_aligned)
+        keep = np.flatnonzero(np.isfinite(values))
+        if not len(keep):
+            result_label.config(text=f"Not enough overlapping data for {chart_type.lower()}")
+            return
+        dates = tuple(dates[i] for i in keep)
+        rates = tuple(values[keep])
+        prices = tuple(prices[i] for i in keep)
+        comp_aligned = comp_aligned[keep]
+        title = f"{chart_type} - {title.replace('Stock Data for ', '')}"
+
+    # macro series under a stock chart are fetched with the rest of the data, so the fingerprint
+    # below covers everything plotted
+    macro_series = None
+    if stockBool and macro in MACRO_OVERLAYS[1:]:
+        country_code = COMPOSITE_COUNTRY.get(stock_composite_combobox.get(), "US")
+        macro_series = handle_macro_overlay(macro, country_code, dates[0], result_label)
+
+    # revisiting a chart with unchanged data paints its cached bitmap now, before the artists are
+    # built, and the first draw restores it instead of rasterising - see bitmaps.py. live charts
+    # change every frame, so they're never cached
+    identity = None if live else (title, period, chart_type, overlay, macro, bars)
+    macro_values = [values for _, values in macro_series.values()] if macro_series else []
+    version = data_version(mdates.date2num(dates), rates, rates_c if stockBool else None, *macro_values)
+    preview = paint_preview(chart_session.frame, identity, version)
+    if preview is not None:
+        root.update_idletasks()
+
+    # create new figure and axis - not through pyplot, so no global figure manager keeps it alive
+    fig = Figure(figsize=(10, 6), dpi=100)
+    ax = fig.subplots()
+    chart_session.figure = fig
     if stockBool:
-        display_stock_info(fig, historical_data)
+        display_stock_info(fig, historical_data, engine)
 
-    plt.subplots_adjust(bottom=0.25)
+    fig.subplots_adjust(bottom=0.25)
 
     line_color = '#5cc4fc'
     fill_color = '#5cc4fc'
     
-    if stockBool:
-        if not dates_c or not rates_c:
+    if stockBool and not relative_mode:
+        if not len(dates_c):
             result_label.config(text="No valid composite data available")
         else:
-            sorted_comp_data = sorted(zip(dates_c, rates_c))
-            dates_c, rates_c = zip(*sorted_comp_data)
+            order = np.argsort(dates_c, kind='stable')
+            dates_c, rates_c = dates_c[order], rates_c[order]
             # create second y-axis and plot data 
             ax2 = ax.twinx()
             comp_line_color = 'red'
@@ -347,6 +578,30 @@ def create_chart(root, period, financial_data_combobox, from_currency_combobox,
     fill_between.set_zorder(2)
     if stockBool and 'comp_line' in locals():
         comp_line.set_zorder(1)
+
+    # candles replace the close line, volume and oscillators stack in strips under the chart
+    strips = []
+    y_limits = None
+    if stockBool and chart_type == "Candlestick":
+        main_line.set_visible(False)
+        fill_between.set_visible(False)
+        vol_ax = fig.add_axes(strip_rect(len(strips)), sharex=ax)
+        y_limits = draw_candlesticks(ax, vol_ax, bar_data)
+        strips.append(vol_ax)
+    if stockBool and not relative_mode and OVERLAYS.get(overlay):
+        osc_ax = draw_overlay(fig, ax, overlay_engine, overlay, min(dates), strip_rect(len(strips)))
+        if osc_ax:
+            strips.append(osc_ax)
+    # macro series at their own frequencies, step filled onto the chart's dates once for the hover
+    macro_markers, macro_labels, macro_aligned = [], [], None
+    if macro_series:
+        macro_ax, macro_markers = draw_macro_strip(fig, ax, macro_series, dates[0], strip_rect(len(strips)))
+        strips.append(macro_ax)
+        macro_labels, macro_aligned = align_mixed(dates, macro_series)
+    # dates are only labelled under the lowest strip
+    bottom_ax = strips[0] if strips else ax
+    for shared_ax in ([ax] + strips[1:] if strips else []):
+        shared_ax.tick_params(axis='x', labelbottom=False)
     # set x-axis labels based on the period
     if period in ["5Y", "10Y", "20Y", "40Y", "Max", "30Y"]:
         ax.xaxis.set_major_formatter(DateFormatter("%Y"))
@@ -355,12 +610,10 @@ def create_chart(root, period, financial_data_combobox, from_currency_combobox,
     else:
         ax.xaxis.set_major_formatter(DateFormatter("%b %d"))
     
-    plt.xticks(rotation=45, ha='right')
-    
-    import matplotlib.ticker as ticker
+    plt.setp(bottom_ax.get_xticklabels(), rotation=45, ha='right')
     
     # format y axis data based on the range
-    y_min, y_max = min(rates), max(rates)
+    y_min, y_max = y_limits or (min(rates), max(rates))
     y_range = y_max - y_min
     
     def custom_formatter(x, pos):
@@ -399,20 +652,34 @@ def create_chart(root, period, financial_data_combobox, from_currency_combobox,
     ax.xaxis.label.set_color('white')
     ax.yaxis.label.set_color(line_color)
     
-    #  add padding at the bottom
-    plt.subplots_adjust(bottom=0.2)
-    
-    canvas = FigureCanvasTkAgg(fig, master=chart_frame)
-    canvas.draw()
+    #  add padding at the bottom (more for each strip under the chart)
+    fig.subplots_adjust(bottom=strip_rect(len(strips))[1] if strips else 0.2)
+    
+    canvas = DeferredResizeCanvas(fig, master=chart_session.frame, identity=identity, version=version)
+    chart_session.canvas = canvas
+    chart_session.own(canvas.cancel_resize)
+    # zoom/pan toolbar under the chart, packed first so the canvas can't squeeze it out
+    toolbar = NavigationToolbar2Tk(canvas, chart_session.frame, pack_toolbar=False)
+    toolbar.update()
+    toolbar.pack(side=tk.BOTTOM, fill=tk.X)
+    chart_session.toolbar = toolbar
     canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+    if preview is not None:
+        # kept over the new canvas until it has drawn, so the blank canvas never shows
+        tk.Misc.tkraise(preview)
+    # lay the frame out first, so the one full draw is at the size the chart is shown at
+    root.update_idletasks()
+    canvas.fit_to_widget()
+    canvas.draw()
+    if preview is not None:
+        preview.destroy()
 
-    # ensure matplotlib closes when user closes the window
-    def on_closing():
-        plt.close(fig)
-        root.quit()
-        root.destroy()
+    # a zoomed or panned view isn't the chart the bitmap was taken of
+    xlim_cid = ax.callbacks.connect('xlim_changed', lambda changed_ax: canvas.forget_bitmap())
+    chart_session.own(ax.callbacks.disconnect, xlim_cid)
 
-    root.protocol("WM_DELETE_WINDOW", on_closing)
+    # ensure the chart is released when user closes the window
+    root.protocol("WM_DELETE_WINDOW", lambda: on_window_close(root))
 
     #  vertical line for mouse hover
     vertical_line = ax.axvline(color=line_color, linewidth=1, linestyle='--', alpha=0.7)
@@ -430,7 +697,9 @@ def create_chart(root, period, financial_data_combobox, from_currency_combobox,
     click_text = ax.text(0, 0, '', color='white', fontweight='bold', ha='center', va='bottom')
     click_text.set_visible(False)
 
-    difference_text = ax.text(0.98, 1.02, '', color='white', fontsize=10, transform=ax.transAxes, va='bottom', ha='right')
+    # inside the plot area - the range statistics make it too tall to sit above the title
+    difference_text = ax.text(0.98, 0.97, '', color='white', fontsize=10, transform=ax.transAxes, va='top', ha='right',
+                              bbox=dict(facecolor='#222222', alpha=0.8, edgecolor='none'), zorder=5)
     difference_text.set_visible(False)
 
     # add rectangle for coloring/highlighting  a given region
@@ -438,9 +707,54 @@ def create_chart(root, period, financial_data_combobox, from_currency_combobox,
     ax.add_patch(highlight_rect)
     highlight_rect.set_visible(False)
 
+    # hover lookups are a binary search on dates converted once, not per mouse event
+    x_nums = mdates.date2num(dates)
+    comp_name = stock_composite_combobox.get() if stockBool else ""
+
+    # drag statistics for any range come from tables built once here, not from rescanning the range
+    range_stats = None
+    if (stockBool or currencyBool or portfolioBool) and not relative_mode:
+        volumes = None
+        if stockBool:
+            volume_by_date = {r['date']: r.get('volume') for r in bar_data}
+            volumes = [volume_by_date.get(d.strftime('%Y-%m-%d'), np.nan) for d in dates]
+        range_stats = RangeStats(rates, volumes, bars_per_year(dates))
+
+    def range_readout(i, j):
+        stats = range_stats.summary(i, j)
+        decimals = 3 if currencyBool else 2
+        text = f"\nHigh: {stats['high']:.{decimals}f}  Low: {stats['low']:.{decimals}f}\nMax drawdown: {stats['drawdown'] * 100:.2f}%"
+        if np.isfinite(stats['volatility']):
+            text += f"\nVolatility: {stats['volatility'] * 100:.1f}% ann."
+        if np.isfinite(stats['volume']):
+            text += f"\nAvg volume: {format_volume(stats['volume'], None)}"
+        return text
+
+    def readout(idx):
+        # stock and composite at the same date
+        if currencyBool:
+            return f'{rates[idx]:.3f}'
+        if portfolioBool:
+            # the biggest holdings' share of the total on that date
+            shares = '  '.join(f'{symbol} {share * 100:.0f}%' for symbol, _, share in valuation.top_contributors(idx))
+            stale = valuation.stale_symbols(idx)
+            return f'{rates[idx]:,.0f} {valuation.base}  |  {shares}' + (f'  (carried fx: {", ".join(stale[:3])})' if stale else '')
+        text = f'{rates[idx]:.2f}'
+        if comp_aligned is not None and np.isfinite(comp_aligned[idx]):
+            if relative_mode:
+                text += f'  ({prices[idx]:.2f} / {comp_aligned[idx]:.2f})'
+            else:
+                text += f'  |  {comp_name} {comp_aligned[idx]:.2f}'
+        if macro_aligned is not None:
+            macro_values = '  '.join(f'{label} {value:.2f}%' for label, value in zip(macro_labels, macro_aligned[idx]) if np.isfinite(value))
+            if macro_values:
+                text += f'  |  {macro_values}'
+        return text
+
     is_clicked = False
     is_dragging = False
     click_x, click_y = None, None
+    click_idx = None
     original_color = line_color
     original_alpha = 0.1
     highlighted_line = None
@@ -475,10 +789,13 @@ def create_chart(root, period, financial_data_combobox, from_currency_combobox,
         if date_text:
             date_text.remove()
     
-        # highlight the selected region for the main stock data
-        selected_dates = [date for date in dates if min(start_date, end_date) <= date <= max(start_date, end_date)]
-        selected_rates = [rates[dates.index(date)] for date in selected_dates]
-        highlighted_line, = ax.plot(selected_dates, selected_rates, color=line_color, linewidth=2, zorder=3)
+        # highlight the selected region for the main stock data - a slice found by binary search,
+        # dates are sorted so the range is contiguous
+        lo, hi = sorted((mdates.date2num(start_date), mdates.date2num(end_date)))
+        i, j = np.searchsorted(x_nums, lo, side='left'), np.searchsorted(x_nums, hi, side='right')
+        selected_dates = dates[i:j]
+        selected_rates = rates[i:j]
+        highlighted_line, = ax.plot(x_nums[i:j], selected_rates, color=line_color, linewidth=2, zorder=3)
     
         # add markers and text for start and end points
         start_value = round(selected_rates[0], 3)
@@ -541,9 +858,7 @@ def create_chart(root, period, financial_data_combobox, from_currency_combobox,
             vertical_line.set_visible(True)
 
             # find closest x value (date) to mouse position
-            idx = np.searchsorted(mdates.date2num(dates), event.xdata, side="left")
-            if idx > 0 and (idx == len(dates) or abs(event.xdata - mdates.date2num(dates[idx-1])) < abs(event.xdata - mdates.date2num(dates[idx]))):
-                idx -= 1
+            idx = nearest_index(x_nums, event.xdata)
 
             x = dates[idx]
             y = rates[idx]
@@ -551,15 +866,15 @@ def create_chart(root, period, financial_data_combobox, from_currency_combobox,
             # update marker position
             marker.set_data([x], [y])
             marker.set_visible(True)
+            # the macro strip's markers follow the same date
+            for j, macro_marker in enumerate(macro_markers):
+                macro_marker.set_data([x], [macro_aligned[idx, j]])
+                macro_marker.set_visible(bool(np.isfinite(macro_aligned[idx, j])))
 
             if not is_dragging:
                 # update text annotation at the top only when not dragging
-                text_annotation.set_position((mdates.date2num(x), ax.get_ylim()[1]))
-                
-                if currencyBool: # set text to 3 decimal places for currency, 2 for others
-                    text_annotation.set_text(f'{y:.3f}')
-                else:
-                    text_annotation.set_text(f'{y:.2f}')
+                text_annotation.set_position((x_nums[idx], ax.get_ylim()[1]))
+                text_annotation.set_text(readout(idx))
                 text_annotation.set_visible(True)
             else:
                 # hide top text  when dragging
@@ -569,7 +884,10 @@ def create_chart(root, period, financial_data_combobox, from_currency_combobox,
                 days_diff = abs((x - click_x).days)
                 value_diff = y - click_y
                 percentage_diff = (y - click_y) / click_y * 100
-                difference_text.set_text(f'Days: {days_diff}\nValue: {value_diff:.2f}\nChange: {percentage_diff:.2f}%')
+                summary = f'Days: {days_diff}\nValue: {value_diff:.2f}\nChange: {percentage_diff:.2f}%'
+                if range_stats is not None:
+                    summary += range_readout(click_idx, idx)
+                difference_text.set_text(summary)
                 difference_text.set_visible(True)
                 update_chart_colors(click_x, x, value_diff > 0)
 
@@ -578,6 +896,8 @@ def create_chart(root, period, financial_data_combobox, from_currency_combobox,
             vertical_line.set_visible(False)
             marker.set_visible(False)
             text_annotation.set_visible(False)
+            for macro_marker in macro_markers:
+                macro_marker.set_visible(False)
             if not is_dragging:
                 click_marker.set_visible(False)
                 click_text.set_visible(False)
@@ -586,15 +906,16 @@ def create_chart(root, period, financial_data_combobox, from_currency_combobox,
             fig.canvas.draw_idle()
                 
     def on_click(event):
-        nonlocal is_clicked, click_x, click_y
+        nonlocal is_clicked, click_x, click_y, click_idx
+        # the drag comparison stays out of the way while the toolbar is zooming or panning
+        if toolbar.mode:
+            return
         main_line.set_alpha(0.3)
         fill_between.set_alpha(0.05)
         if event.inaxes == ax:
             is_clicked = True
-            idx = np.searchsorted(mdates.date2num(dates), event.xdata, side="left")
-            if idx > 0 and (idx == len(dates) or abs(event.xdata - mdates.date2num(dates[idx-1])) < abs(event.xdata - mdates.date2num(dates[idx]))):
-                idx -= 1
-        
+            idx = nearest_index(x_nums, event.xdata)
+            click_idx = idx
             click_x = dates[idx]
             click_y = rates[idx]
 
@@ -613,7 +934,7 @@ def create_chart(root, period, financial_data_combobox, from_currency_combobox,
 
     def on_motion(event):
         nonlocal is_dragging
-        if is_clicked and event.inaxes == ax:
+        if is_clicked and not toolbar.mode and event.inaxes == ax:
             is_dragging = True
 
     def on_release(event):
@@ -625,23 +946,54 @@ def create_chart(root, period, financial_data_combobox, from_currency_combobox,
     
         # show  top text annotation again when user releases mouse
         if event.inaxes == ax:
-            idx = np.searchsorted(mdates.date2num(dates), event.xdata, side="left")
-            if idx > 0 and (idx == len(dates) or abs(event.xdata - mdates.date2num(dates[idx-1])) < abs(event.xdata - mdates.date2num(dates[idx]))):
-                idx -= 1
-            x = dates[idx]
-            y = rates[idx]
-            text_annotation.set_position((mdates.date2num(x), ax.get_ylim()[1]))
-            if currencyBool:
-                text_annotation.set_text(f'{y:.3f}')
-            else:
-                text_annotation.set_text(f'{y:.2f}')
+            idx = nearest_index(x_nums, event.xdata)
+            text_annotation.set_position((x_nums[idx], ax.get_ylim()[1]))
+            text_annotation.set_text(readout(idx))
             text_annotation.set_visible(True)
     
         fig.canvas.draw_idle()
 
-    fig.canvas.mpl_connect('motion_notify_event', on_mouse_move)
-    fig.canvas.mpl_connect('button_press_event', on_click)
-    fig.canvas.mpl_connect('button_release_event', on_release)
-    fig.canvas.mpl_connect('motion_notify_event', on_motion)
+    # registered through the session so they're disconnected when the chart is replaced
+    chart_session.connect('motion_notify_event', on_mouse_move)
+    chart_session.connect('button_press_event', on_click)
+    chart_session.connect('button_release_event', on_release)
+    chart_session.connect('motion_notify_event', on_motion)
+
+    # once a resize settles, a plot area wide (or narrow) enough for another resolution
+    # rebuilds the chart from that resolution's data
+    def level_of_detail(width):
+        if stockBool:
+            return eodhd_resolution(period, width), yfinance_interval(period, width)
+        if currencyBool or portfolioBool:
+            return eodhd_resolution(period, width)
+        return None
+
+    def on_resize_settled(width, height):
+        if chart_session is not session.current or live:
+            return
+        if level_of_detail(int(width * PLOT_WIDTH_FRACTION)) != level_of_detail(pixel_width):
+            root.after_idle(create_chart, root, period, financial_data_combobox, from_currency_combobox, to_currency_combobox, region_combobox, macro_economic_combobox, result_label, stock_symbol_var, stock_composite_combobox, gdp_metric_combobox, gov_metric_combobox, overlay, live, chart_type, portfolio, macro, bars)
+
+    canvas.on_settled(on_resize_settled)
+
+    # stream quotes onto the end of the line (and the composite line for stocks)
+    if live and stockBool and not relative_mode:
+        series = [(stock_symbol_var.get(), ax, main_line, dates, rates)]
+        if 'comp_line' in locals():
+            series.append((index_tickers[stock_composite_combobox.get()], ax2, comp_line, dates_c, rates_c))
+        start_live_chart(chart_session, series, 2)
+    elif live and currencyBool:
+        symbol = f"{from_currency_combobox.get()}{to_currency_combobox.get()}=X"
+        start_live_chart(chart_session, [(symbol, ax, main_line, dates, rates)], 3)
+    elif chart_type == "Line" and not relative_mode and not (stockBool and bars in BAR_FREQUENCIES) and (stockBool or currencyBool):
+        # zooming in far enough swaps finer bars into the line for the visible window
+        if stockBool:
+            detail = WindowDetail(chart_session, ax, main_line, stock_symbol_var.get(), dates, rates, STOCK_MINUTES, pixel_width)
+        else:
+            symbol = f"{from_currency_combobox.get()}{to_currency_combobox.get()}=X"
+            detail = WindowDetail(chart_session, ax, main_line, symbol, dates, rates, FX_MINUTES, pixel_width)
+        canvas.on_settled(lambda width, height: detail.set_pixel_width(int(width * PLOT_WIDTH_FRACTION)))
+
 
 
+    return chart_session
@@ -0,0 +1,100 @@
+# single-flight request coalescing
+# identical requests that arrive while one is already running attach to it and
+# receive the same result instead of opening another connection
+import functools
+import threading
+
+
+def request_key(provider, series, date_range="", interval=""):
+    # normalise so 'aapl', ' AAPL ' etc map to the same in-flight request
+    def norm(value):
+        if isinstance(value, (tuple, list)):
+            return tuple(norm(v) for v in value)
+        return str(value).strip().upper()
+    return (str(provider).strip().lower(), norm(series), norm(date_range), norm(interval))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {}
+
+    def _count(self, provider, field):
+        stats = self._stats.setdefault(provider, {"requests": 0, "coalesced": 0})
+        stats[field] += 1
+
+    def do(self, key, fn, *args, **kwargs):
+        provider = key[0]
+        with self._lock:
+            self._count(provider, "requests")
+            call = self._calls.get(key)
+            if call is not None:
+                # duplicate request - wait on the in-flight call
+                self._count(provider, "coalesced")
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        # per provider totals plus how many upstream fetches coalescing saved
+        with self._lock:
+            report = {provider: dict(counts) for provider, counts in self._stats.items()}
+        for counts in report.values():
+            counts["hit_rate"] = counts["coalesced"] / counts["requests"] if counts["requests"] else 0.0
+        return report
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+
+single_flight = SingleFlight()
+
+
+def coalesced(provider, key_func):
+    # decorator - key_func maps the call arguments to (series, range, interval)
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = request_key(provider, *key_func(*args, **kwargs))
+            return single_flight.do(key, fn, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def format_stats():
+    lines = []
+    for provider, counts in sorted(single_flight.stats().items()):
+        lines.append(f"{provider}: {counts['requests']} requests, {counts['coalesced']} coalesced ({counts['hit_rate']:.0%})")
+    return "\n".join(lines)
@@ -0,0 +1,206 @@
+# return correlation across a composite's constituents (and the index itself)
+# closes are aligned onto one calendar as a dates x series array, the correlation
+# matrix is built in blocks so temporaries stay block sized, then drawn as a heatmap
+# imported lazily from gui.py, like chart.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tkinter as tk
+import ttkbootstrap as ttk
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+from backend import fetch_stock_data, fetch_historical_index_data, get_index_constituents
+from resolution import get_composite_period
+from align import align_closes
+
+# pairs with fewer overlapping returns than this are left blank
+MIN_OVERLAP = 20
+BLOCK_SIZE = 128
+# concurrent constituent fetches - the eodhd scheduler still enforces its rate limit
+FETCH_WORKERS = 8
+
+SORT_ORDERS = ["Clustered", "Ticker", "Correlation to index"]
+
+
+def log_returns(closes):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(np.log(closes), axis=0)
+    returns[~np.isfinite(returns)] = np.nan
+    return returns
+
+
+def correlation_matrix(returns, block=BLOCK_SIZE, min_overlap=MIN_OVERLAP):
+    # pearson correlation of every pair over the days both have a return (pairwise complete).
+    # missing returns are zeroed and a 0/1 mask kept, so for a block of pairs the overlap count
+    # and the sums of x, y, x^2 and xy over the overlap are each one block sized matrix product
+    n_series = returns.shape[1]
+    valid = ~np.isnan(returns)
+    # shifting each column by its own mean doesn't change a correlation, but keeps the sums small
+    with np.errstate(invalid="ignore"):
+        mean = np.nanmean(np.where(valid.any(axis=0), returns, 0.0), axis=0)
+    x = np.where(valid, returns - mean, 0.0)
+    x2 = x * x
+    mask = valid.astype(float)
+
+    corr = np.full((n_series, n_series), np.nan)
+    for i in range(0, n_series, block):
+        xi, x2i, mi = x[:, i:i + block], x2[:, i:i + block], mask[:, i:i + block]
+        for j in range(i, n_series, block):
+            xj, x2j, mj = x[:, j:j + block], x2[:, j:j + block], mask[:, j:j + block]
+            overlap = mi.T @ mj
+            sum_x, sum_y = xi.T @ mj, mi.T @ xj
+            with np.errstate(invalid="ignore", divide="ignore"):
+                cov = xi.T @ xj - sum_x * sum_y / overlap
+                var_x = x2i.T @ mj - sum_x * sum_x / overlap
+                var_y = mi.T @ x2j - sum_y * sum_y / overlap
+                values = cov / np.sqrt(var_x * var_y)
+            # flat over the overlap (no variance) has no correlation either
+            values[(overlap < min_overlap) | ~(var_x > 0) | ~(var_y > 0)] = np.nan
+            corr[i:i + block, j:j + block] = values
+            corr[j:j + block, i:i + block] = values.T
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+
+def cluster_order(corr):
+    # spectral seriation - sort by the fiedler vector of the graph laplacian with (1 + corr) / 2
+    # as edge weights, which puts strongly correlated series next to each other
+    if len(corr) < 3:
+        return np.arange(len(corr))
+    affinity = np.nan_to_num((1.0 + corr) / 2.0, nan=0.0)
+    laplacian = np.diag(affinity.sum(axis=1)) - affinity
+    _, vectors = np.linalg.eigh(laplacian)
+    return np.argsort(vectors[:, 1], kind="stable")
+
+
+def sort_order(corr, labels, how):
+    if how == "Ticker":
+        return np.array(sorted(range(len(labels)), key=lambda i: (i != 0, labels[i])))
+    if how == "Correlation to index":
+        # the index is column 0
+        return np.argsort(-np.nan_to_num(corr[0], nan=-2.0), kind="stable")
+    return cluster_order(corr)
+
+
+def constituent_symbol(index_name, ticker):
+    if index_name == "DAX":
+        return ticker.replace(".DE", "") + ".XETRA"
+    return ticker
+
+
+def fetch_composite_series(index_name, period, progress=None):
+    # index first, then every constituent - fetches share the backend cache, so a repeat is instant.
+    # constituents are loaded cold so hundreds of them don't flush the series the charts are using
+    series = {index_name: fetch_historical_index_data(index_name, get_composite_period(period), "1d")}
+    tickers = [ticker for _, ticker in get_index_constituents(index_name)]
+    done = [0]
+    lock = threading.Lock()
+
+    def fetch(ticker):
+        records = fetch_stock_data.cold(constituent_symbol(index_name, ticker), period, "d")
+        with lock:
+            done[0] += 1
+            if progress:
+                progress(done[0], len(tickers))
+        return records
+
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        for ticker, records in zip(tickers, pool.map(fetch, tickers)):
+            series[ticker] = records
+    return series
+
+
+def composite_correlation(index_name, period, progress=None):
+    calendar, labels, closes = align_closes(fetch_composite_series(index_name, period, progress))
+    if len(labels) < 2 or labels[0] != index_name:
+        return labels, None
+    return labels, correlation_matrix(log_returns(closes))
+
+
+def show_correlation_window(root, index_name, period="5Y"):
+    window = tk.Toplevel(root)
+    window.title(f"{index_name} correlation - {period}")
+    window.configure(bg='black')
+    window.geometry("760x720")
+
+    controls = tk.Frame(window, bg='black')
+    controls.pack(fill='x', pady=4)
+    tk.Label(controls, text="Sort", bg='black', fg='white').pack(side='left', padx=6)
+    sort_combobox = ttk.Combobox(controls, values=SORT_ORDERS, width=20, style='TCombobox', state='readonly')
+    sort_combobox.current(0)
+    sort_combobox.pack(side='left')
+    status_label = tk.Label(controls, text="Fetching constituents...", bg='black', fg='white', anchor='w')
+    status_label.pack(side='left', padx=10, fill='x', expand=True)
+
+    fig, ax = plt.subplots(figsize=(7.5, 6.5))
+    fig.patch.set_facecolor('#222222')
+    ax.set_facecolor('#222222')
+    canvas = FigureCanvasTkAgg(fig, master=window)
+    canvas.get_tk_widget().pack(fill='both', expand=True)
+    state = {"progress": (0, 0), "result": None, "order": None, "image": None}
+
+    def work():
+        try:
+            state["result"] = composite_correlation(index_name, period, lambda done, total: state.__setitem__("progress", (done, total)))
+        except Exception as e:
+            print(f"Error computing correlation for {index_name}: {e}")
+            state["result"] = ([], None)
+
+    def draw(event=None):
+        labels, corr = state["result"]
+        order = sort_order(corr, labels, sort_combobox.get())
+        state["order"] = order
+        ordered = corr[np.ix_(order, order)]
+        if state["image"] is None:
+            state["image"] = ax.imshow(ordered, cmap='RdBu_r', vmin=-1, vmax=1, interpolation='nearest')
+            colorbar = fig.colorbar(state["image"], ax=ax, fraction=0.046, pad=0.04)
+            colorbar.ax.tick_params(colors='white')
+        else:
+            state["image"].set_data(ordered)
+        # tick labels only while they're readable
+        if len(labels) <= 60:
+            ticks = [labels[i] for i in order]
+            ax.set_xticks(range(len(ticks)), ticks, rotation=90, fontsize=6, color='white')
+            ax.set_yticks(range(len(ticks)), ticks, fontsize=6, color='white')
+        else:
+            ax.set_xticks([])
+            ax.set_yticks([])
+        canvas.draw_idle()
+
+    def on_motion(event):
+        if event.inaxes != ax or state["order"] is None:
+            return
+        labels, corr = state["result"]
+        row, col = int(round(event.ydata)), int(round(event.xdata))
+        if 0 <= row < len(labels) and 0 <= col < len(labels):
+            i, j = state["order"][row], state["order"][col]
+            status_label.config(text=f"{labels[i]} / {labels[j]}: {corr[i, j]:.2f}")
+
+    def poll():
+        # fetching runs off the tk thread, the window just polls for progress
+        if not window.winfo_exists():
+            return
+        if state["result"] is None:
+            done, total = state["progress"]
+            status_label.config(text=f"Fetching constituents... {done}/{total}" if total else "Fetching constituents...")
+            window.after(200, poll)
+            return
+        labels, corr = state["result"]
+        if corr is None:
+            status_label.config(text=f"Error: not enough data for {index_name}")
+            return
+        status_label.config(text=f"{len(labels) - 1} constituents + index")
+        draw()
+        sort_combobox.bind("<<ComboboxSelected>>", draw)
+        canvas.mpl_connect('motion_notify_event', on_motion)
+
+    def on_close():
+        plt.close(fig)
+        window.destroy()
+
+    window.protocol("WM_DELETE_WINDOW", on_close)
+    threading.Thread(target=work, name="gfv-correlation", daemon=True).start()
+    window.after(200, poll)
+    return window
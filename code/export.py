@@ -0,0 +1,145 @@
+# bulk export of series to csv or a columnar .npz (one .npy per column, loadable with np.load)
+# tables are (symbol, structured array) pairs and are written a chunk at a time, so a whole
+# composite's history streams through with memory bounded by one symbol's array
+#   python export.py "S&P 500" sp500.npz [period]   - every constituent plus the index
+#   python export.py cache out.csv                 - everything currently cached
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+
+import numpy as np
+
+from backend import fetch_stock_array, fetch_index_columns, get_index_constituents, index_tickers
+from cache import series_cache
+from resolution import get_composite_period
+
+COLUMNS = ["open", "high", "low", "close", "volume"]
+CHUNK_ROWS = 65536
+SYMBOL_DTYPE = np.dtype("S24")
+
+
+def table_columns(table):
+    # date and value columns of a table, missing ones as nan
+    dates = table["date"]
+    if dates.dtype.kind == "S":
+        dates = dates.astype("datetime64[D]")
+    values = [table[name] if name in table.dtype.names else np.full(len(table), np.nan) for name in COLUMNS]
+    return dates, values
+
+
+def records_table(records):
+    # cached series are kept as the backend returns them - a list of dicts or dates/rates lists
+    if isinstance(records, dict) and "dates" in records:
+        # fx rates, or an index history kept as columns
+        columns = {name: records[name] for name in COLUMNS if name in records} or {"close": records["rates"]}
+        table = np.empty(len(records["dates"]), dtype=[("date", "datetime64[D]")] + [(name, "f8") for name in columns])
+        table["date"] = records["dates"]
+        for name, values in columns.items():
+            table[name] = values
+        return table
+    names = [name for name in COLUMNS if name in records[0]] or ["close"]
+    table = np.empty(len(records), dtype=[("date", "datetime64[D]")] + [(name, "f8") for name in names])
+    table["date"] = [r["date"] for r in records]
+    for name in names:
+        table[name] = [r.get(name, r.get("value")) for r in records]
+    return table
+
+
+def cached_tables():
+    for key, value in series_cache.items():
+        if not value or not isinstance(value, (list, dict)):
+            continue
+        try:
+            table = records_table(value)
+        except (KeyError, TypeError, ValueError):
+            continue  # not a dated series (e.g. a stock name)
+        provider, series = key[0], key[1]
+        if isinstance(series, tuple):  # e.g. (index, "COLUMNS")
+            series = series[0]
+        yield f"{provider}:{series}:{key[2]}:{key[3]}".replace(",", ";"), table
+
+
+def composite_tables(index_name, period="10Y"):
+    # the index first, then every constituent fetched straight into arrays
+    index_columns = fetch_index_columns(index_name, get_composite_period(period), "1d")
+    if index_columns:
+        yield index_tickers[index_name], records_table(index_columns)
+    for _, ticker in get_index_constituents(index_name):
+        symbol = ticker.replace(".DE", "") + ".XETRA" if index_name == "DAX" else ticker
+        table = fetch_stock_array(symbol, period, "d")
+        if table is not None and len(table):
+            yield ticker, table
+
+
+def write_csv(path, tables):
+    rows = 0
+    with open(path, "w", newline="") as f:
+        f.write("symbol,date," + ",".join(COLUMNS) + "\n")
+        for symbol, table in tables:
+            dates, values = table_columns(table)
+            line = symbol + ",%s" + ",%.10g" * len(COLUMNS) + "\n"
+            for start in range(0, len(table), CHUNK_ROWS):
+                end = start + CHUNK_ROWS
+                chunk = zip(dates[start:end].astype(str).tolist(), *[column[start:end].tolist() for column in values])
+                f.write("".join(line % row for row in chunk))
+            rows += len(table)
+    return rows
+
+
+def write_npz(path, tables):
+    # each column streams to its own temporary file, then gets an .npy header and is copied
+    # into the zip - nothing is held in memory beyond the current table
+    columns = [("symbol", SYMBOL_DTYPE), ("date", np.dtype("datetime64[D]"))] + [(name, np.dtype("f8")) for name in COLUMNS]
+    rows = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        spools = {name: open(os.path.join(tmp, name), "w+b") for name, _ in columns}
+        try:
+            for symbol, table in tables:
+                dates, values = table_columns(table)
+                for start in range(0, len(table), CHUNK_ROWS):
+                    end = min(start + CHUNK_ROWS, len(table))
+                    spools["symbol"].write(np.full(end - start, symbol.encode("utf-8")[:SYMBOL_DTYPE.itemsize], dtype=SYMBOL_DTYPE).tobytes())
+                    spools["date"].write(np.ascontiguousarray(dates[start:end], dtype="datetime64[D]").tobytes())
+                    for name, column in zip(COLUMNS, values):
+                        spools[name].write(np.ascontiguousarray(column[start:end], dtype="f8").tobytes())
+                rows += len(table)
+
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+                for name, dtype in columns:
+                    spool = spools[name]
+                    spool.seek(0)
+                    with archive.open(f"{name}.npy", "w", force_zip64=True) as member:
+                        np.lib.format.write_array_header_1_0(member, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (rows,)})
+                        shutil.copyfileobj(spool, member, 1 << 20)
+        finally:
+            for spool in spools.values():
+                spool.close()
+    return rows
+
+
+def export(path, tables):
+    # format from the extension, returns the number of rows written
+    if path.lower().endswith(".npz"):
+        return write_npz(path, tables)
+    return write_csv(path, tables)
+
+
+def export_cached(path):
+    return export(path, cached_tables())
+
+
+def export_composite(path, index_name, period="10Y"):
+    return export(path, composite_tables(index_name, period))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print('usage: python export.py <index name|cache> <out.csv|out.npz> [period]')
+        sys.exit(1)
+    source, out = sys.argv[1], sys.argv[2]
+    if source == "cache":
+        print(f"{export_cached(out)} rows written to {out}")
+    else:
+        print(f"{export_composite(out, source, sys.argv[3] if len(sys.argv) > 3 else '10Y')} rows written to {out}")
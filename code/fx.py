@@ -0,0 +1,48 @@
+# historical fx through a pivot currency - each currency is fetched once against USD
+# (and cached like any other series), every pair and its inverse is derived by dividing
+# the two pivot series on their common dates. n currencies cost n - 1 downloads, not n * (n - 1)
+import numpy as np
+
+from backend import fetch_currency_data
+
+PIVOT = "USD"
+
+
+def pivot_series(currency, period, resolution="d"):
+    # pivot currency units per one unit of `currency` as (dates, values) arrays
+    if currency == PIVOT:
+        return None
+    data = fetch_currency_data(f"{currency}/{PIVOT}", period, resolution)
+    if not data or not data["dates"]:
+        return None
+    dates = np.array(data["dates"], dtype="datetime64[D]")
+    values = np.array(data["rates"], dtype=float)
+    order = np.argsort(dates, kind="stable")
+    dates, values = dates[order], values[order]
+    valid = np.isfinite(values) & (values > 0)
+    return dates[valid], values[valid]
+
+
+def cross_series(from_currency, to_currency, period, resolution="d"):
+    # to_currency units per one from_currency, as (dates, values) arrays, or None
+    if from_currency == to_currency:
+        return None
+    base = pivot_series(from_currency, period, resolution)
+    quote = pivot_series(to_currency, period, resolution)
+    if (from_currency != PIVOT and base is None) or (to_currency != PIVOT and quote is None):
+        return None
+    if quote is None:  # X/USD is the pivot series itself
+        return base
+    if base is None:  # USD/X is the inverse
+        return quote[0], 1.0 / quote[1]
+    dates, base_idx, quote_idx = np.intersect1d(base[0], quote[0], assume_unique=True, return_indices=True)
+    return dates, base[1][base_idx] / quote[1][quote_idx]
+
+
+def fetch_cross_rates(from_currency, to_currency, period, resolution="d"):
+    # same shape as backend.fetch_currency_data, so charts can use either
+    series = cross_series(from_currency, to_currency, period, resolution)
+    if series is None:
+        return None
+    dates, values = series
+    return {"dates": dates.astype(str).tolist(), "rates": values.tolist()}
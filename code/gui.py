@@ -1,11 +1,20 @@
 
 # imports
+import os
+import sys
+import threading
 import tkinter as tk
 import ttkbootstrap as ttk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
+import prefetch
+import session
+import startup
+import watchdog
 from backend import *
-from chart import *
+from coalesce import format_stats
+from resolution import chart_pixel_width
+from scheduler import format_latency_report
+from virtuallist import VirtualList
 
 
 class GlobalFinanceVisualizerGUI:
@@ -14,8 +23,9 @@ class GlobalFinanceVisualizerGUI:
         self.root.title("GFV - v1")
         self.root.geometry("750x700")
         self.root.configure(bg='black')
-        self.size_flag = True
         self.stock_symbol_var = tk.StringVar()
+        self.live_var = tk.BooleanVar(value=False)
+        self.last_period = None
         self.setup_style()
         self.create_title()
         self.create_main_input_frame()
@@ -50,11 +60,14 @@ class GlobalFinanceVisualizerGUI:
         self.create_gov_metric_frame()
         self.create_stock_composite_frame()
         self.create_stock_search_frame()
+        self.create_overlay_frame()
+        self.create_chart_type_frame()
+        self.create_portfolio_frame()
 
     def create_financial_data_frame(self):
         financial_data_frame = tk.Frame(self.main_input_frame, bg='black')
         financial_data_label = tk.Label(master=financial_data_frame, text="Financial Data", bg='black', fg='white', anchor='w')
-        self.financial_data_combobox = ttk.Combobox(master=financial_data_frame, values=["Currency", "Stock", "Macro-Economic Indicators"], style='TCombobox', state='readonly')
+        self.financial_data_combobox = ttk.Combobox(master=financial_data_frame, values=["Currency", "Stock", "Portfolio", "Macro-Economic Indicators"], style='TCombobox', state='readonly')
         self.financial_data_combobox.current(0)
         financial_data_label.pack(side='top', pady=4, anchor='w')
         self.financial_data_combobox.pack(side='top', pady=4)
@@ -80,6 +93,7 @@ class GlobalFinanceVisualizerGUI:
         self.region_combobox.current(0)
         region_label.pack(side='top', pady=4, anchor='w')
         self.region_combobox.pack(side='top', pady=4)
+        self.region_combobox.bind("<<ComboboxSelected>>", lambda e: self.prefetch_chart("region", self.likely_period()))
 
     def create_gdp_metric_frame(self):
         self.gdp_metric_frame = tk.Frame(self.main_input_frame, bg='black')
@@ -102,7 +116,7 @@ class GlobalFinanceVisualizerGUI:
     def create_stock_composite_frame(self):
         self.stock_composite_frame = tk.Frame(self.main_input_frame, bg='black')
         stock_composite_label = tk.Label(self.stock_composite_frame, text="Stock Composite", bg='black', fg='white', anchor='w')
-        self.stock_composite_combobox = ttk.Combobox(self.stock_composite_frame, values=list(all_tickers.keys()), style='TCombobox', state='readonly')
+        self.stock_composite_combobox = ttk.Combobox(self.stock_composite_frame, values=list(indices.keys()), style='TCombobox', state='readonly')
         self.stock_composite_combobox.current(0)
         stock_composite_label.pack(side='top', pady=4, anchor='w')
         self.stock_composite_combobox.pack(side='top', pady=4)
@@ -115,15 +129,73 @@ class GlobalFinanceVisualizerGUI:
         stock_search_label = tk.Label(self.stock_search_frame, text="Search Stock Symbol", bg='black', fg='white', anchor='w')
         self.stock_search_var = tk.StringVar()
         self.stock_search_entry = ttk.Entry(self.stock_search_frame, textvariable=self.stock_search_var, style='TEntry')
-        self.stock_search_results = ttk.Combobox(self.stock_search_frame, style='TCombobox', state='readonly')
+        # only the rows on screen are in tk, so big composites don't rebuild a 500 row popdown
+        self.stock_search_results = VirtualList(self.stock_search_frame, rows=5, width=28, on_select=self.update_stock_symbol)
         stock_search_label.pack(side='top', pady=4, anchor='w')
         self.stock_search_entry.pack(side='top', pady=4)
         self.stock_search_results.pack(side='top', pady=4)
         self.stock_search_frame.pack(side='left', padx=10)
 
         self.stock_search_entry.bind('<KeyRelease>', self.search_stock_symbols)
-        self.stock_search_results.bind("<<ComboboxSelected>>", self.update_stock_symbol)
+        # arrow down from the search box moves into the results
+        self.stock_search_entry.bind('<Down>', lambda event: (self.stock_search_results.listbox.focus_set(), self.stock_search_results.move(1)))
         self.stock_symbol_var = tk.StringVar()
+        self.stock_entries = []
+        self.last_search = None
+
+    def create_overlay_frame(self):
+        self.overlay_frame = tk.Frame(self.main_input_frame, bg='black')
+        overlay_label = tk.Label(self.overlay_frame, text="Indicator", bg='black', fg='white', anchor='w')
+        self.overlay_combobox = ttk.Combobox(self.overlay_frame, values=["None", "SMA 20", "SMA 50", "EMA 20", "Bollinger 20", "RSI 14", "Volatility 20"], width=12, style='TCombobox', state='readonly')
+        self.overlay_combobox.current(0)
+        overlay_label.pack(side='top', pady=4, anchor='w')
+        self.overlay_combobox.pack(side='top', pady=4)
+        # the composite's country's inflation / bond yield in a strip under the chart
+        macro_label = tk.Label(self.overlay_frame, text="Macro", bg='black', fg='white', anchor='w')
+        self.macro_overlay_combobox = ttk.Combobox(self.overlay_frame, values=["None", "Inflation", "Bond yield", "Inflation + yield"], width=12, style='TCombobox', state='readonly')
+        self.macro_overlay_combobox.current(0)
+        macro_label.pack(side='top', pady=4, anchor='w')
+        self.macro_overlay_combobox.pack(side='top', pady=4)
+        self.overlay_frame.pack(side='left', padx=10)
+
+    def create_chart_type_frame(self):
+        self.chart_type_frame = tk.Frame(self.main_input_frame, bg='black')
+        chart_type_label = tk.Label(self.chart_type_frame, text="Chart", bg='black', fg='white', anchor='w')
+        self.chart_type_combobox = ttk.Combobox(self.chart_type_frame, values=["Line", "Candlestick", "Relative strength", "Rolling beta", "Excess return"], width=15, style='TCombobox', state='readonly')
+        self.chart_type_combobox.current(0)
+        chart_type_label.pack(side='top', pady=4, anchor='w')
+        self.chart_type_combobox.pack(side='top', pady=4)
+        bars_label = tk.Label(self.chart_type_frame, text="Bars", bg='black', fg='white', anchor='w')
+        self.bars_combobox = ttk.Combobox(self.chart_type_frame, values=["Auto", "Weekly", "Monthly", "Quarterly"], width=15, style='TCombobox', state='readonly')
+        self.bars_combobox.current(0)
+        bars_label.pack(side='top', pady=4, anchor='w')
+        self.bars_combobox.pack(side='top', pady=4)
+        self.chart_type_frame.pack(side='left', padx=10)
+
+    def create_portfolio_frame(self):
+        # holdings csv (symbol,quantity,currency) valued in the base currency, see portfolio.py
+        self.portfolio_frame = tk.Frame(self.main_input_frame, bg='black')
+        self.portfolio_path = None
+        holdings_label = tk.Label(self.portfolio_frame, text="Holdings", bg='black', fg='white', anchor='w')
+        self.holdings_button = ttk.Button(self.portfolio_frame, text="Load CSV", command=self.load_holdings, style='TButton')
+        base_frame = tk.Frame(self.portfolio_frame, bg='black')
+        base_label = tk.Label(base_frame, text="Base Currency", bg='black', fg='white', anchor='w')
+        self.base_currency_combobox = ttk.Combobox(base_frame, values=["USD", "EUR", "GBP", "JPY", "CAD"], width=8, style='TCombobox', state='readonly')
+        self.base_currency_combobox.current(2)
+        holdings_label.pack(side='top', pady=4, anchor='w')
+        self.holdings_button.pack(side='top', pady=4)
+        base_label.pack(side='top', pady=4, anchor='w')
+        self.base_currency_combobox.pack(side='top', pady=4)
+        base_frame.pack(side='left', padx=10)
+        self.portfolio_frame.pack(side='left', padx=10)
+
+    def load_holdings(self):
+        from tkinter import filedialog
+
+        path = filedialog.askopenfilename(parent=self.root, filetypes=[("CSV", "*.csv")])
+        if path:
+            self.portfolio_path = path
+            self.holdings_button.config(text=os.path.basename(path)[:18])
 
     def create_currency_input_frame(self):
         self.currency_input_frame = tk.Frame(self.root, bg='black', pady=4)
@@ -162,7 +234,8 @@ class GlobalFinanceVisualizerGUI:
         self.to_currency_combobox.bind("<<ComboboxSelected>>", lambda event: [self.update_placeholder(), self.update_result()])
         self.amount_entry.bind("<KeyRelease>", lambda event: self.update_result())
     
-        self.update_placeholder()
+        # the live rate is filled in after first paint, see run_gui
+        self.update_placeholder(fetch_rate=False)
     def create_result_label(self):
         self.result_label = tk.Label(self.root, text="", bg='black', fg='white')
         self.result_label.pack(pady=3)
@@ -173,12 +246,10 @@ class GlobalFinanceVisualizerGUI:
         self.update_period_buttons()
 
     def on_button_click(self, period):
-        self.destroy_chart() 
-        if self.size_flag:
-            self.root.geometry("751x703")
-        else:
-            self.root.geometry("752x702")
+        # matplotlib is only imported once the first chart is requested
+        from chart import create_chart
 
+        self.destroy_chart() 
         create_chart(
             self.root,
             period,
@@ -191,16 +262,18 @@ class GlobalFinanceVisualizerGUI:
             self.stock_symbol_var,
             self.stock_composite_combobox,
             self.gdp_metric_combobox,
-            self.gov_metric_combobox
+            self.gov_metric_combobox,
+            overlay=self.overlay_combobox.get(),
+            live=self.live_var.get(),
+            chart_type=self.chart_type_combobox.get(),
+            portfolio={"path": self.portfolio_path, "base": self.base_currency_combobox.get()},
+            macro=self.macro_overlay_combobox.get(),
+            bars=self.bars_combobox.get()
         )  
+        self.last_period = period
 
-        self.size_flag = not self.size_flag
-
-    def update_period_buttons(self):
-        for widget in self.button_frame.winfo_children():
-            widget.destroy()
-
-        periods = ["1M", "3M", "YTD", "1Y"]
+    def current_periods(self):
+        periods = ["1M", "3M", "YTD", "1Y", "5Y"]
         if self.financial_data_combobox.get() == "Macro-Economic Indicators":
             periods = ["5Y", "10Y", "20Y", "40Y"]
 
@@ -210,10 +283,98 @@ class GlobalFinanceVisualizerGUI:
                 periods = ["5Y", "10Y", "20Y", "Max"]
             elif self.macro_economic_combobox.get() == "Government Finances":
                 periods = ["5Y", "10Y", "20Y", "30Y"]
+        return periods
+
+    def likely_period(self):
+        # the period the next chart will probably be drawn for - the last one used if it applies
+        periods = self.current_periods()
+        if self.last_period in periods:
+            return self.last_period
+        return "1Y" if "1Y" in periods else periods[0]
+
+    def prefetch_chart(self, kind, period):
+        # fetch what a chart of the current selection at period needs before it's asked for,
+        # see prefetch.py - widget values are read here, on the tk thread
+        selected = self.financial_data_combobox.get()
+        pixel_width = chart_pixel_width(self.root)
+        if selected == "Stock" and self.stock_symbol_var.get():
+            prefetch.intend(kind, prefetch.stock_plan, self.stock_symbol_var.get(), self.stock_composite_combobox.get(), period, pixel_width)
+        elif selected == "Currency":
+            prefetch.intend(kind, prefetch.currency_plan, self.from_currency_combobox.get(), self.to_currency_combobox.get(), period, pixel_width)
+        elif selected == "Macro-Economic Indicators":
+            prefetch.intend(kind, prefetch.macro_plan, self.macro_economic_combobox.get(), self.region_combobox.get(), period,
+                            self.gdp_metric_combobox.get(), self.gov_metric_combobox.get(), pixel_width)
+
+    def update_period_buttons(self):
+        for widget in self.button_frame.winfo_children():
+            widget.destroy()
 
-        for period in periods:
+        for period in self.current_periods():
             button = ttk.Button(self.button_frame, text=period, command=lambda p=period: self.on_button_click(p), style='TButton')
             button.pack(side='left', padx=5)
+            # resting the pointer on a period is a good hint it's the next chart
+            button.bind('<Enter>', lambda event, p=period: self.prefetch_chart("period", p))
+            button.bind('<Leave>', lambda event: prefetch.cancel("period"))
+
+        # live quotes for stock and currency charts
+        if self.financial_data_combobox.get() in ["Stock", "Currency"]:
+            live_button = ttk.Checkbutton(self.button_frame, text="Live", variable=self.live_var, command=self.toggle_live)
+            live_button.pack(side='left', padx=5)
+
+        # constituent correlation heatmap for the selected composite
+        if self.financial_data_combobox.get() == "Stock":
+            button = ttk.Button(self.button_frame, text="Correlation", command=self.open_correlation, style='TButton')
+            button.pack(side='left', padx=5)
+            button = ttk.Button(self.button_frame, text="Export composite", command=lambda: self.export_data(composite=True), style='TButton')
+            button.pack(side='left', padx=5)
+
+        # everything fetched so far (including the chart on screen)
+        button = ttk.Button(self.button_frame, text="Export", command=self.export_data, style='TButton')
+        button.pack(side='left', padx=5)
+
+    def toggle_live(self):
+        # redraw the current chart with or without the stream
+        if self.live_var.get():
+            if self.last_period and session.active():
+                self.on_button_click(self.last_period)
+        elif 'chart' in sys.modules:
+            sys.modules['chart'].stop_live_chart()
+
+    def export_data(self, composite=False):
+        from tkinter import filedialog
+
+        path = filedialog.asksaveasfilename(parent=self.root, defaultextension=".csv", filetypes=[("CSV", "*.csv"), ("NumPy columns", "*.npz")])
+        if not path:
+            return
+        index_name = self.stock_composite_combobox.get() if composite else None
+        state = {"rows": None}
+
+        def work():
+            import export
+            try:
+                state["rows"] = export.export_composite(path, index_name) if index_name else export.export_cached(path)
+            except Exception as e:
+                print(f"Error exporting to {path}: {e}")
+                state["rows"] = -1
+
+        def poll():
+            if state["rows"] is None:
+                self.root.after(250, poll)
+            elif state["rows"] < 0:
+                self.result_label.config(text="Export failed")
+            else:
+                self.result_label.config(text=f"Exported {state['rows']} rows to {path}")
+
+        self.result_label.config(text="Exporting...")
+        threading.Thread(target=work, name="gfv-export", daemon=True).start()
+        self.root.after(250, poll)
+
+    def open_correlation(self):
+        from correlation import show_correlation_window
+
+        composite = self.stock_composite_combobox.get()
+        if composite in indices:
+            show_correlation_window(self.root, composite, "5Y")
 
     def update_ui(self, event=None):
         selected_financial_data = self.financial_data_combobox.get()
@@ -226,6 +387,9 @@ class GlobalFinanceVisualizerGUI:
         self.currency_input_frame.pack_forget()
         self.stock_composite_frame.pack_forget()
         self.stock_search_frame.pack_forget()
+        self.overlay_frame.pack_forget()
+        self.chart_type_frame.pack_forget()
+        self.portfolio_frame.pack_forget()
         self.macro_economic_frame.pack_forget()
         self.region_frame.pack_forget()
         self.gdp_metric_frame.pack_forget()
@@ -238,8 +402,12 @@ class GlobalFinanceVisualizerGUI:
         elif selected_financial_data == "Stock":
             self.stock_composite_frame.pack(side='left', padx=10, in_=self.main_input_frame)
             self.stock_search_frame.pack(side='left', padx=10, in_=self.main_input_frame)
+            self.overlay_frame.pack(side='left', padx=10, in_=self.main_input_frame)
+            self.chart_type_frame.pack(side='left', padx=10, in_=self.main_input_frame)
             self.stock_composite_combobox.set("S&P 500")
             self.update_stock_search_dropdown(None)
+        elif selected_financial_data == "Portfolio":
+            self.portfolio_frame.pack(side='left', padx=10, in_=self.main_input_frame)
         elif selected_financial_data == "Macro-Economic Indicators":
             self.macro_economic_frame.pack(side='left', padx=10, in_=self.main_input_frame)
             self.region_frame.pack(side='left', padx=10, in_=self.main_input_frame)
@@ -253,39 +421,27 @@ class GlobalFinanceVisualizerGUI:
 
 
     def destroy_chart(self):
-        if hasattr(self, 'chart_frame') and self.chart_frame:
-            for widget in self.chart_frame.winfo_children():
-                widget.destroy()
-            self.chart_frame = None
+        session.end()
 
     def update_stock_search_dropdown(self, event=None):
         selected_composite = self.stock_composite_combobox.get()
-        if selected_composite in all_tickers:
-            tickers_with_names = [f"{ticker} - {company_name}" for ticker, company_name in all_tickers[selected_composite]]
-            self.stock_search_results['values'] = tickers_with_names
-            if tickers_with_names:
-                self.stock_search_results.current(0)  
-                selected_item = self.stock_search_results.get()
-                if selected_item:
-                    symbol = selected_item.split(' - ')[1].strip()
-                    self.stock_symbol_var.set(symbol)
+        if event is not None and selected_composite in indices:
+            prefetch.intend("composite", prefetch.composite_plan, selected_composite, self.likely_period(), chart_pixel_width(self.root))
+        # labels and their lowercase search text are built once per composite, not per keystroke
+        if selected_composite in indices:
+            self.stock_entries = [(f"{ticker} - {company_name}", ticker.lower(), company_name.lower()) for ticker, company_name in get_index_constituents(selected_composite)]
         else:
-            self.stock_search_results['values'] = []
+            self.stock_entries = []
+        self.last_search = None
+        self.search_stock_symbols(None)
 
     def search_stock_symbols(self, event): 
         search_term = self.stock_search_entry.get().lower()  
-        selected_composite = self.stock_composite_combobox.get()  
-        if selected_composite in all_tickers:
-            matching_tickers = [f"{ticker} - {company_name}" for ticker, company_name in all_tickers[selected_composite] if search_term in ticker.lower() or search_term in company_name.lower()]
-            self.stock_search_results['values'] = matching_tickers  
-            if matching_tickers:
-                self.stock_search_results.current(0)  
-                selected_item = self.stock_search_results.get()  
-                if selected_item:
-                    symbol = selected_item.split(' - ')[1].strip()
-                    self.stock_symbol_var.set(symbol)  
-        else:
-            self.stock_search_results['values'] = []  
+        if search_term == self.last_search:
+            return  # e.g. arrow keys, nothing to filter
+        self.last_search = search_term
+        matching_tickers = [label for label, ticker, company_name in self.stock_entries if search_term in ticker or search_term in company_name]
+        self.stock_search_results.set_items(matching_tickers)
 
     # currency conversions in ui
     def update_result(self):
@@ -296,27 +452,32 @@ class GlobalFinanceVisualizerGUI:
                 return
             
             amount = float(amount_str)
-            from_currency = self.from_currency_combobox.get().encode('utf-8')
-            to_currency = self.to_currency_combobox.get().encode('utf-8')
-            result = lib.convert_currency(from_currency, to_currency, c_double(amount))
-            self.result_label.config(text=f"Result: {result:.2f} {to_currency.decode('utf-8')}")
+            from_currency = self.from_currency_combobox.get()
+            to_currency = self.to_currency_combobox.get()
+            result = convert_currency(from_currency, to_currency, amount)
+            if result is None:
+                self.result_label.config(text="Error fetching exchange rate")
+                return
+            self.result_label.config(text=f"Result: {result:.2f} {to_currency}")
         except Exception as e:
             self.result_label.config(text=f"Error: {e}")
 
     def clear_result_label(self):
         self.result_label.config(text="")
 
-    def update_placeholder(self, event=None):
+    def update_placeholder(self, event=None, fetch_rate=True):
         from_currency = self.from_currency_combobox.get()
         to_currency = self.to_currency_combobox.get()
-        try:
-            from_currency_encoded = from_currency.encode('utf-8')
-            to_currency_encoded = to_currency.encode('utf-8')
-            conversion_rate = lib.convert_currency(from_currency_encoded, to_currency_encoded, c_double(1))
-            placeholder_text = f"1 {from_currency} = {conversion_rate:.2f} {to_currency}"
-        except Exception as e:
-            placeholder_text = f"{from_currency} to {to_currency}"
-        
+        placeholder_text = f"{from_currency} to {to_currency}"
+        if fetch_rate:
+            try:
+                conversion_rate = convert_currency(from_currency, to_currency, 1)
+            except Exception as e:
+                print(f"Error fetching {from_currency}/{to_currency} rate: {e}")
+                conversion_rate = None
+            if conversion_rate is not None:
+                placeholder_text = f"1 {from_currency} = {conversion_rate:.2f} {to_currency}"
+
         if self.amount_var.get() == "" or self.amount_entry.placeholder:
             self.amount_var.set(placeholder_text)
             self.amount_entry.config(foreground='gray')
@@ -335,19 +496,50 @@ class GlobalFinanceVisualizerGUI:
             self.amount_entry.config(foreground='white')
             self.amount_entry.placeholder = False
 
-    def update_stock_symbol(self, *args):  
-        selected_item = self.stock_search_results.get()  
+    def update_stock_symbol(self, index=None, selected_item=""):  
         if selected_item:
             # split string and get the second part 
             symbol = selected_item.split(' - ')[1].strip()
             self.stock_symbol_var.set(symbol)  
+            # the highlighted stock is likely the next chart
+            self.prefetch_chart("stock", self.likely_period())
         else:
             self.stock_symbol_var.set('')
 
 def run_gui():
     root = tk.Tk()
+    # optional main loop stall monitor, see watchdog.py
+    if watchdog.ENABLED:
+        watchdog.start(root)
     app = GlobalFinanceVisualizerGUI(root)
     root.protocol("WM_DELETE_WINDOW", root.quit)  
     app.update_ui()
-    app.update_placeholder() 
+
+    # paint the window before anything slow happens, then fetch the live rate
+    # and warm the heavy modules / constituent lists in the background
+    root.update()
+    startup.mark("first paint")
+    startup.check_budget()
+    root.after(0, app.update_placeholder)
+    startup.warm_up_in_background()
+    prefetch.start()
     root.mainloop()
+
+    # report how many upstream fetches request coalescing saved, and provider tail latency
+    stats = format_stats()
+    if stats:
+        print(stats)
+    latency = format_latency_report()
+    if latency:
+        print(latency)
+    # how many prefetches were used, to tune the dwell and budget
+    prefetched = prefetch.stop()
+    if prefetched:
+        if prefetch.format_report(prefetched):
+            print(prefetch.format_report(prefetched))
+        prefetch.save_report(prefetched)
+    # which callbacks blocked the ui, and for how long
+    stalls = watchdog.stop()
+    if stalls and stalls["stalls"]:
+        print(watchdog.format_report(stalls))
+        watchdog.save_report(stalls)
@@ -0,0 +1,353 @@
+# technical indicators on numpy arrays
+# every indicator keeps enough state to extend its output when new bars are appended
+# (e.g. a refreshed cache entry with a newer last bar) instead of recomputing everything
+import math
+from collections import OrderedDict, deque
+
+import numpy as np
+
+
+class _Buffer:
+    # growable float/datetime array with amortised O(1) appends
+    def __init__(self, dtype=float, capacity=256):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)
+        needed = self._size + len(values)
+        if needed > len(self._data):
+            grown = np.empty(max(needed, 2 * len(self._data)), dtype=self._data.dtype)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size:needed] = values
+        self._size = needed
+
+    @property
+    def values(self):
+        return self._data[:self._size]
+
+    def __len__(self):
+        return self._size
+
+
+def _ema_block(x, alpha, prev):
+    # y[i] = (1 - alpha) * y[i - 1] + alpha * x[i], vectorised by scaling with decay powers.
+    # blocks are sized so decay ** -block can't overflow, prev=nan seeds with x[0]
+    x = np.asarray(x, dtype=float)
+    out = np.empty_like(x)
+    if not len(x):
+        return out
+    if math.isnan(prev):
+        prev = x[0]
+    decay = 1.0 - alpha
+    if decay <= 0:
+        out[:] = x
+        return out
+    block = int(min(4096, max(1, 600 / -math.log(decay))))
+    for start in range(0, len(x), block):
+        chunk = x[start:start + block]
+        k = np.arange(1, len(chunk) + 1)
+        powers = decay ** k
+        out[start:start + len(chunk)] = powers * (prev + alpha * np.cumsum(chunk / powers))
+        prev = out[start + len(chunk) - 1]
+    return out
+
+
+def _rolling_mean_std(x, window, start):
+    # rolling mean and population std for positions start..len(x)-1, using
+    # prefix sums of the values shifted by the first value to limit cancellation
+    n = len(x)
+    lo = max(0, start - window + 1)
+    seg = x[lo:] - x[lo] if n > lo else x[lo:]
+    c1 = np.concatenate(([0.0], np.cumsum(seg)))
+    c2 = np.concatenate(([0.0], np.cumsum(seg * seg)))
+    end = np.arange(start, n) - lo + 1
+    begin = end - window
+    valid = begin >= 0
+    mean = np.full(n - start, np.nan)
+    std = np.full(n - start, np.nan)
+    s1 = c1[end[valid]] - c1[begin[valid]]
+    s2 = c2[end[valid]] - c2[begin[valid]]
+    m = s1 / window
+    mean[valid] = m + (x[lo] if n > lo else 0.0)
+    std[valid] = np.sqrt(np.maximum(s2 / window - m * m, 0.0))
+    return mean, std
+
+
+class Indicator:
+    # outputs maps output name -> _Buffer, filled by update(engine, start)
+    label = ""
+    price_overlay = True
+
+    def __init__(self):
+        self.outputs = {}
+
+    def _output(self, name):
+        if name not in self.outputs:
+            self.outputs[name] = _Buffer()
+        return self.outputs[name]
+
+    def update(self, engine, start):
+        raise NotImplementedError
+
+
+class SMA(Indicator):
+    def __init__(self, window):
+        super().__init__()
+        self.window = window
+        self.label = f"SMA {window}"
+
+    def update(self, engine, start):
+        mean, _ = _rolling_mean_std(engine.close, self.window, start)
+        self._output("sma").extend(mean)
+
+
+class EMA(Indicator):
+    def __init__(self, span):
+        super().__init__()
+        self.alpha = 2.0 / (span + 1)
+        self.last = float("nan")
+        self.label = f"EMA {span}"
+
+    def update(self, engine, start):
+        values = _ema_block(engine.close[start:], self.alpha, self.last)
+        if len(values):
+            self.last = values[-1]
+        self._output("ema").extend(values)
+
+
+class Bollinger(Indicator):
+    def __init__(self, window, width=2.0):
+        super().__init__()
+        self.window = window
+        self.width = width
+        self.label = f"Bollinger {window}"
+
+    def update(self, engine, start):
+        mean, std = _rolling_mean_std(engine.close, self.window, start)
+        self._output("mid").extend(mean)
+        self._output("upper").extend(mean + self.width * std)
+        self._output("lower").extend(mean - self.width * std)
+
+
+class RSI(Indicator):
+    # wilder's rsi - simple average of the first `period` moves, then smoothing with alpha = 1 / period
+    price_overlay = False
+
+    def __init__(self, period=14):
+        super().__init__()
+        self.period = period
+        self.avg_gain = float("nan")
+        self.avg_loss = float("nan")
+        self.label = f"RSI {period}"
+
+    def update(self, engine, start):
+        close = engine.close
+        n = len(close)
+        out = np.full(n - start, np.nan)
+        alpha = 1.0 / self.period
+        if math.isnan(self.avg_gain):
+            # still warming up - the first value needs `period` moves
+            if n <= self.period:
+                self._output("rsi").extend(out)
+                return
+            moves = np.diff(close[:self.period + 1])
+            self.avg_gain = np.maximum(moves, 0.0).mean()
+            self.avg_loss = np.maximum(-moves, 0.0).mean()
+            out[self.period - start] = self._rsi(self.avg_gain, self.avg_loss)
+            tail = self.period + 1
+        else:
+            tail = start
+
+        moves = close[tail:] - close[tail - 1:n - 1]
+        avg_gain = _ema_block(np.maximum(moves, 0.0), alpha, self.avg_gain)
+        avg_loss = _ema_block(np.maximum(-moves, 0.0), alpha, self.avg_loss)
+        if len(moves):
+            self.avg_gain, self.avg_loss = avg_gain[-1], avg_loss[-1]
+            out[tail - start:] = self._rsi(avg_gain, avg_loss)
+        self._output("rsi").extend(out)
+
+    @staticmethod
+    def _rsi(avg_gain, avg_loss):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + np.asarray(avg_gain) / np.asarray(avg_loss)))
+
+
+class Volatility(Indicator):
+    # annualised rolling standard deviation of log returns
+    price_overlay = False
+
+    def __init__(self, window=20, periods_per_year=None):
+        super().__init__()
+        self.window = window
+        # None annualises at the engine's bar frequency, so weekly and monthly bars aren't scaled as days
+        self.periods_per_year = periods_per_year
+        self.returns = _Buffer()
+        self.label = f"Volatility {window}"
+
+    def update(self, engine, start):
+        close = engine.close
+        output = self._output("volatility")
+        if len(close) == start:
+            return
+        # returns[i] is the move into bar i, there's none for the first bar
+        if start == 0:
+            self.returns.extend([np.nan])
+        first = max(start, 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.returns.extend(np.log(close[first:] / close[first - 1:-1]))
+        # skip the leading nan so it doesn't poison the prefix sums
+        _, std = _rolling_mean_std(self.returns.values[1:], self.window, max(start - 1, 0))
+        if start == 0:
+            std = np.concatenate(([np.nan], std))
+        output.extend(std * math.sqrt(self.periods_per_year or engine.periods_per_year))
+
+
+class SlidingExtrema(Indicator):
+    # rolling high/low over a calendar window (e.g. 365 days for 52 week high/low)
+    # using monotonic deques - each bar is pushed and popped at most once, so O(n) overall
+    def __init__(self, window_days=365):
+        super().__init__()
+        self.window = np.timedelta64(window_days, "D")
+        self.max_q = deque()
+        self.min_q = deque()
+        self.label = f"{window_days}D High/Low"
+
+    def update(self, engine, start):
+        dates, high, low = engine.dates, engine.high, engine.low
+        n = len(dates)
+        highs = np.empty(n - start)
+        lows = np.empty(n - start)
+        max_q, min_q = self.max_q, self.min_q
+        for i in range(start, n):
+            while max_q and high[max_q[-1]] <= high[i]:
+                max_q.pop()
+            max_q.append(i)
+            while min_q and low[min_q[-1]] >= low[i]:
+                min_q.pop()
+            min_q.append(i)
+            cutoff = dates[i] - self.window
+            while dates[max_q[0]] <= cutoff:
+                max_q.popleft()
+            while dates[min_q[0]] <= cutoff:
+                min_q.popleft()
+            highs[i - start] = high[max_q[0]]
+            lows[i - start] = low[min_q[0]]
+        self._output("high").extend(highs)
+        self._output("low").extend(lows)
+
+
+class IndicatorEngine:
+    def __init__(self, periods_per_year=252):
+        self.periods_per_year = periods_per_year
+        self._dates = _Buffer(dtype="datetime64[D]")
+        self._close = _Buffer()
+        self._high = _Buffer()
+        self._low = _Buffer()
+        self.indicators = {}
+
+    @classmethod
+    def from_records(cls, records, periods_per_year=252):
+        engine = cls(periods_per_year)
+        engine.append_records(records)
+        return engine
+
+    @property
+    def dates(self):
+        return self._dates.values
+
+    @property
+    def close(self):
+        return self._close.values
+
+    @property
+    def high(self):
+        return self._high.values
+
+    @property
+    def low(self):
+        return self._low.values
+
+    def __len__(self):
+        return len(self._close)
+
+    def add(self, name, indicator):
+        if name not in self.indicators:
+            self.indicators[name] = indicator
+            indicator.update(self, 0)
+        return self.indicators[name]
+
+    def append(self, dates, close, high=None, low=None):
+        # only bars newer than the last one are taken, so overlapping refreshes are safe
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        close = np.asarray(close, dtype=float)
+        high = close if high is None else np.asarray(high, dtype=float)
+        low = close if low is None else np.asarray(low, dtype=float)
+        if len(self._dates):
+            newer = dates > self.dates[-1]
+            dates, close, high, low = dates[newer], close[newer], high[newer], low[newer]
+        if not len(dates):
+            return 0
+
+        start = len(self)
+        self._dates.extend(dates)
+        self._close.extend(close)
+        self._high.extend(high)
+        self._low.extend(low)
+        for indicator in self.indicators.values():
+            indicator.update(self, start)
+        return len(dates)
+
+    def append_records(self, records):
+        # records are the list of dicts returned by the backend fetchers, oldest first or not
+        if not records:
+            return 0
+        dates = np.array([r['date'] for r in records], dtype="datetime64[D]")
+        order = np.argsort(dates, kind="stable")
+        close = np.array([r.get('close', r.get('value')) for r in records], dtype=float)[order]
+        high = np.array([r.get('high', r.get('close', r.get('value'))) for r in records], dtype=float)[order]
+        low = np.array([r.get('low', r.get('close', r.get('value'))) for r in records], dtype=float)[order]
+        return self.append(dates[order], close, high, low)
+
+    def output(self, name, field=None):
+        outputs = self.indicators[name].outputs
+        if field is None:
+            field = next(iter(outputs))
+        return outputs[field].values
+
+
+# overlay presets offered on the stock chart
+OVERLAYS = {
+    "None": None,
+    "SMA 20": lambda: SMA(20),
+    "SMA 50": lambda: SMA(50),
+    "EMA 20": lambda: EMA(20),
+    "Bollinger 20": lambda: Bollinger(20),
+    "RSI 14": lambda: RSI(14),
+    "Volatility 20": lambda: Volatility(20),
+}
+
+# one engine per series, so refreshed data only appends the new bars - least recently
+# charted series are dropped past MAX_ENGINES so a long session doesn't keep every history
+MAX_ENGINES = 32
+_engines = OrderedDict()
+
+
+def engine_for(key, records, periods_per_year=252):
+    # the bar frequency is part of the key so daily and weekly bars of a series never share an engine
+    key = (key, periods_per_year)
+    engine = _engines.get(key)
+    if engine is not None and len(engine) and records:
+        first = np.datetime64(min(records[0]['date'], records[-1]['date']), "D")
+        # a different window further back than we hold means a rebuild, otherwise extend
+        if first >= engine.dates[0]:
+            engine.append_records(records)
+            _engines.move_to_end(key)
+            return engine
+    engine = IndicatorEngine.from_records(records, periods_per_year)
+    _engines[key] = engine
+    _engines.move_to_end(key)
+    while len(_engines) > MAX_ENGINES:
+        _engines.popitem(last=False)
+    return engine
@@ -0,0 +1,175 @@
+# leak regression harness - switches charts over and over in a hidden tk window and checks
+# that rss, python object counts and live figures stop growing once the caches are warm
+#   python leak_harness.py                  - 1200 switches on generated data (no network)
+#   python leak_harness.py 3000 --network   - real fetches (served from the cache after the first round)
+# exits non-zero if anything keeps growing, so it can be run after changes to chart.py/backend.py
+import datetime
+import gc
+import os
+import random
+import resource
+import sys
+import time
+
+os.environ.setdefault("GFV_QUOTE_SOURCE", "sim")
+
+import numpy as np
+import tkinter as tk
+import matplotlib.figure
+
+import chart
+import fx
+import session
+
+SWITCHES = 1200
+WARMUP = 150
+# allowed growth between the end of warm up and the last switch
+MAX_RSS_GROWTH_MB = 25
+MAX_OBJECT_GROWTH = 5000
+
+PERIODS = ["1M", "3M", "YTD", "1Y", "5Y"]
+SYMBOLS = ["AAPL", "MSFT", "NVDA", "AMZN", "JPM", "XOM"]
+OVERLAY_NAMES = ["None", "SMA 20", "Bollinger 20", "RSI 14", "Volatility 20"]
+CHART_TYPES = ["Line", "Candlestick", "Relative strength", "Rolling beta", "Excess return", "Line", "Candlestick"]
+MACRO_NAMES = ["None", "Inflation + yield", "None", "Bond yield", "Inflation"]
+# only on 5Y - weekly bars over a month are too few for the rolling beta
+BAR_NAMES = ["Auto", "Weekly"]
+
+
+class Value:
+    # stands in for the gui's comboboxes and result label
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+    def config(self, **kwargs):
+        pass
+
+
+def generated_days(period, resolution="d"):
+    step = {"d": 1, "w": 7, "m": 30}.get(resolution, 1)
+    days = {"1M": 31, "3M": 92, "YTD": 200, "1Y": 366, "5Y": 1827, "1mo": 31, "3mo": 92, "ytd": 200, "1y": 366, "5y": 1827}.get(period, 366)
+    today = datetime.date.today()
+    return [today - datetime.timedelta(days=d) for d in range(days, 0, -step)]
+
+
+def generated_ohlc(seed, days):
+    rng = random.Random(seed)
+    price, records = 100.0, []
+    for day in days:
+        open_ = price
+        price *= 1 + rng.gauss(0, 0.01)
+        records.append({"date": day.isoformat(), "open": open_, "high": max(open_, price) * 1.005,
+                        "low": min(open_, price) * 0.995, "close": price, "volume": rng.randint(10**5, 10**7)})
+    return records
+
+
+def generated_arrays(records):
+    # the column arrays backend.index_history returns
+    arrays = {"date": np.array([r["date"] for r in records], dtype="datetime64[D]")}
+    for name in ["open", "high", "low", "close", "volume"]:
+        arrays[name] = np.array([r[name] for r in records], dtype=float)
+    return arrays
+
+
+def use_generated_data():
+    # swap the fetchers chart.py calls for generated series of the right shape
+    chart.fetch_stock_data = lambda symbol, period, resolution="d": generated_ohlc(symbol, generated_days(period, resolution))
+    chart.index_history = lambda index, date_range, interval: generated_arrays(generated_ohlc(index, generated_days(date_range)))
+    fx.fetch_currency_data = lambda pair, period, resolution="d": {
+        "dates": [r["date"] for r in generated_ohlc(pair, generated_days(period, resolution))],
+        "rates": [r["close"] / 100 for r in generated_ohlc(pair, generated_days(period, resolution))]
+    }
+    chart.get_stock_name = lambda symbol: symbol
+    # monthly cpi index and fred yields at their own (coarser) frequencies
+    chart.get_price_index_data = lambda indicator, country_code, start_year, end_year: [
+        {"date": r["date"][:8] + "01", "value": r["close"]} for r in generated_ohlc(country_code, generated_days("5Y", "m"))]
+    chart.get_interest_rate_data = lambda series_id, start_date, end_date, frequency="", aggregation="avg": [
+        {"date": r["date"], "value": r["close"] / 25} for r in generated_ohlc(series_id, generated_days("5Y", "m"))]
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # peak rather than current on platforms without /proc, still catches steady growth
+        scale = 2**20 if sys.platform == "darwin" else 2**10
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def sample(root):
+    gc.collect()
+    figures = sum(1 for obj in gc.get_objects() if isinstance(obj, matplotlib.figure.Figure))
+    return {"rss": rss_mb(), "objects": len(gc.get_objects()), "figures": figures, "widgets": len(root.winfo_children())}
+
+
+def switch(root, i, controls):
+    # cycles stock/currency, periods, chart types (including the relative modes), overlays, macro strips, bars and live mode
+    kind = "Currency" if i % 3 == 2 else "Stock"
+    controls["financial"].set(kind)
+    controls["symbol"].set(SYMBOLS[i % len(SYMBOLS)])
+    return chart.create_chart(
+        root, PERIODS[i % len(PERIODS)], controls["financial"], controls["from"], controls["to"], controls["region"],
+        controls["macro"], controls["result"], controls["symbol"], controls["composite"], controls["gdp"], controls["gov"],
+        overlay=OVERLAY_NAMES[i % len(OVERLAY_NAMES)], live=(i % 4 == 0), chart_type=CHART_TYPES[i % len(CHART_TYPES)],
+        macro=MACRO_NAMES[i % len(MACRO_NAMES)], bars=BAR_NAMES[i // len(PERIODS) % len(BAR_NAMES)] if PERIODS[i % len(PERIODS)] == "5Y" else "Auto"
+    )
+
+
+def run(switches=SWITCHES, network=False):
+    if not network:
+        use_generated_data()
+    root = tk.Tk()
+    root.withdraw()
+    controls = {
+        "financial": Value("Stock"), "from": Value("GBP"), "to": Value("USD"), "region": Value("GB"),
+        "macro": Value("Inflation"), "result": Value(), "symbol": Value("AAPL"), "composite": Value("S&P 500"),
+        "gdp": Value("Real GDP"), "gov": Value("Debt"),
+    }
+
+    start = time.perf_counter()
+    baseline = None
+    for i in range(switches):
+        if switch(root, i, controls) is None:
+            print(f"switch {i}: chart wasn't created")
+        root.update()
+        if i + 1 == WARMUP:
+            baseline = sample(root)
+        if (i + 1) % 100 == 0:
+            now = sample(root)
+            print(f"{i + 1:5d} switches  rss {now['rss']:7.1f}MB  objects {now['objects']:8d}  figures {now['figures']}  widgets {now['widgets']}")
+
+    session.end()
+    root.update()
+    final = sample(root)
+    elapsed = time.perf_counter() - start
+    root.destroy()
+
+    failures = []
+    if baseline is not None:
+        if final["rss"] - baseline["rss"] > MAX_RSS_GROWTH_MB:
+            failures.append(f"rss grew {final['rss'] - baseline['rss']:.1f}MB after warm up (limit {MAX_RSS_GROWTH_MB}MB)")
+        if final["objects"] - baseline["objects"] > MAX_OBJECT_GROWTH:
+            failures.append(f"python objects grew by {final['objects'] - baseline['objects']} after warm up (limit {MAX_OBJECT_GROWTH})")
+    if final["figures"]:
+        failures.append(f"{final['figures']} figures still alive after the last chart was closed")
+    if final["widgets"]:
+        failures.append(f"{final['widgets']} widgets left on the root window")
+
+    print(f"{switches} switches in {elapsed:.1f}s ({elapsed / switches * 1000:.1f}ms each)")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK: memory bounded")
+    return not failures
+
+
+if __name__ == "__main__":
+    count = next((int(arg) for arg in sys.argv[1:] if arg.isdigit()), SWITCHES)
+    sys.exit(0 if run(count, network="--network" in sys.argv) else 1)
@@ -0,0 +1,232 @@
+# live quote mode - a background poller batches quote requests for every symbol on screen
+# and appends ticks to fixed size ring buffers, while the chart redraws at most max_fps times
+# a second and only touches line data and the last value label. memory and per frame work are
+# bounded by the buffer capacity, so cpu stays flat however long the stream runs
+#   GFV_QUOTE_SOURCE=sim   - random walk quotes instead of yfapi (no network, no api key)
+#   GFV_LIVE_INTERVAL=2    - seconds between quote polls
+import os
+import random
+import threading
+import time
+
+import numpy as np
+import matplotlib.dates as mdates
+from matplotlib.transforms import blended_transform_factory
+
+# seconds between polls - yfapi quotes count against a daily limit so the default is gentle
+LIVE_INTERVAL = float(os.environ.get("GFV_LIVE_INTERVAL", "15"))
+SIM_INTERVAL = 1.0
+MAX_FPS = 10
+TICK_CAPACITY = 2048
+
+# matplotlib date number of the unix epoch, ticks are stored as unix seconds
+_EPOCH_DATENUM = mdates.date2num(np.datetime64("1970-01-01T00:00:00"))
+
+
+class TickBuffer:
+    # fixed capacity ring buffer of (unix time, price), oldest ticks are overwritten
+    def __init__(self, capacity=TICK_CAPACITY):
+        self.times = np.empty(capacity)
+        self.prices = np.empty(capacity)
+        self.capacity = capacity
+        self.count = 0
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def append(self, timestamp, price):
+        with self._lock:
+            i = self.count % self.capacity
+            self.times[i] = timestamp
+            self.prices[i] = price
+            self.count += 1
+            self.version += 1
+
+    def snapshot(self):
+        # oldest first copies, at most capacity long
+        with self._lock:
+            size = min(self.count, self.capacity)
+            start = self.count % self.capacity if self.count > self.capacity else 0
+            order = (np.arange(size) + start) % self.capacity
+            return self.times[order], self.prices[order], self.version
+
+    def last(self):
+        with self._lock:
+            if not self.count:
+                return None
+            return self.prices[(self.count - 1) % self.capacity]
+
+
+class BackendQuoteSource:
+    def fetch(self, symbols):
+        from backend import fetch_quotes
+        return fetch_quotes(symbols)
+
+    def seed(self, symbol, price):
+        pass
+
+
+class SimulatedQuoteSource:
+    # local stand-in for the quote api - a random walk from the last close of each series
+    def __init__(self, volatility=0.0005, seed=None):
+        self.volatility = volatility
+        self.prices = {}
+        self._random = random.Random(seed)
+
+    def seed(self, symbol, price):
+        self.prices.setdefault(symbol, price)
+
+    def fetch(self, symbols):
+        quotes = {}
+        for symbol in symbols:
+            price = self.prices.get(symbol, 100.0)
+            price *= 1 + self._random.gauss(0, self.volatility)
+            self.prices[symbol] = price
+            quotes[symbol] = price
+        return quotes
+
+
+def default_source():
+    if os.environ.get("GFV_QUOTE_SOURCE") == "sim":
+        return SimulatedQuoteSource(), SIM_INTERVAL
+    return BackendQuoteSource(), LIVE_INTERVAL
+
+
+class QuotePoller:
+    # one thread polls every subscribed symbol in a single batch per interval
+    def __init__(self, source, interval):
+        self.source = source
+        self.interval = interval
+        self.buffers = {}
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.polls = 0
+
+    def subscribe(self, symbol, last_price=None):
+        with self._lock:
+            self._subscribers[symbol] = self._subscribers.get(symbol, 0) + 1
+            buffer = self.buffers.setdefault(symbol, TickBuffer())
+            if last_price is not None:
+                self.source.seed(symbol, last_price)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="gfv-quotes", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return buffer
+
+    def unsubscribe(self, symbol):
+        with self._lock:
+            remaining = self._subscribers.get(symbol, 0) - 1
+            if remaining > 0:
+                self._subscribers[symbol] = remaining
+            else:
+                self._subscribers.pop(symbol, None)
+                self.buffers.pop(symbol, None)
+
+    def symbols(self):
+        with self._lock:
+            return list(self._subscribers)
+
+    def _run(self):
+        while True:
+            symbols = self.symbols()
+            if not symbols:
+                # the thread exits once nothing is live, subscribe() starts a new one
+                with self._lock:
+                    if not self._subscribers:
+                        self._thread = None
+                        return
+                continue
+            try:
+                quotes = self.source.fetch(symbols)
+            except Exception as e:
+                print(f"Error polling quotes: {e}")
+                quotes = {}
+            now = time.time()
+            self.polls += 1
+            with self._lock:
+                for symbol, price in quotes.items():
+                    buffer = self.buffers.get(symbol)
+                    if buffer is not None:
+                        buffer.append(now, price)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+_poller = None
+
+
+def get_poller():
+    global _poller
+    if _poller is None:
+        _poller = QuotePoller(*default_source())
+    return _poller
+
+
+class LiveChart:
+    # series is a list of (symbol, axis, line, dates, values) for every line to keep live
+    def __init__(self, root, canvas, series, decimals=2, max_fps=MAX_FPS, poller=None):
+        self.root = root
+        self.canvas = canvas
+        self.decimals = decimals
+        self.frame_ms = max(1, int(1000 / max_fps))
+        self.poller = poller or get_poller()
+        self.frames = 0
+        self.series = []
+        for symbol, axis, line, dates, values in series:
+            base_x = mdates.date2num(list(dates))
+            base_y = np.asarray(values, dtype=float)
+            buffer = self.poller.subscribe(symbol, base_y[-1] if len(base_y) else None)
+            label = axis.text(1.0, base_y[-1] if len(base_y) else 0, '', transform=blended_transform_factory(axis.transAxes, axis.transData),
+                              color='black', backgroundcolor=line.get_color(), fontsize=8, ha='left', va='center', visible=False)
+            self.series.append({"symbol": symbol, "axis": axis, "line": line, "base_x": base_x, "base_y": base_y,
+                                "buffer": buffer, "seen": 0, "label": label})
+        self.running = True
+        self._job = root.after(self.frame_ms, self._frame)
+
+    def _frame(self):
+        # redraws are coalesced - however many ticks arrived since the last frame, there's one draw
+        if not self.running:
+            return
+        if not self.canvas.get_tk_widget().winfo_exists():
+            self.stop()
+            return
+        changed = False
+        for s in self.series:
+            times, prices, version = s["buffer"].snapshot()
+            if version == s["seen"]:
+                continue
+            s["seen"] = version
+            changed = True
+            tick_x = _EPOCH_DATENUM + times / 86400.0
+            s["line"].set_data(np.concatenate((s["base_x"], tick_x)), np.concatenate((s["base_y"], prices)))
+            last = prices[-1]
+            s["label"].set_position((1.0, last))
+            s["label"].set_text(f"{last:.{self.decimals}f}")
+            s["label"].set_visible(True)
+            self._extend_limits(s["axis"], tick_x[-1], prices)
+        if changed:
+            self.frames += 1
+            self.canvas.draw_idle()
+        self._job = self.root.after(self.frame_ms, self._frame)
+
+    def _extend_limits(self, axis, last_x, prices):
+        x_min, x_max = axis.get_xlim()
+        if last_x > x_max:
+            axis.set_xlim(x_min, last_x)
+        y_min, y_max = axis.get_ylim()
+        low, high = prices.min(), prices.max()
+        if low < y_min or high > y_max:
+            axis.set_ylim(min(y_min, low), max(y_max, high))
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        try:
+            self.root.after_cancel(self._job)
+        except Exception:
+            pass
+        for s in self.series:
+            self.poller.unsubscribe(s["symbol"])
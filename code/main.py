@@ -1,4 +1,4 @@
-from backend import *
-from gui import *
-from chart import *
-run_gui()
\ No newline at end of file
+import startup
+from gui import run_gui
+startup.mark("imports done")
+run_gui()
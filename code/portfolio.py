@@ -0,0 +1,143 @@
+# portfolio valuation - holdings of (symbol, quantity, currency) valued in one base currency.
+# every price history and fx series is fetched concurrently (each cached like any other series),
+# prices are aligned onto one calendar and converted with a single prices x fx . quantities
+# product, so revaluing a 100 position book over 5 years is a few array operations once cached
+#   holdings csv - symbol,quantity,currency with eodhd symbols, e.g.
+#       AAPL,100,USD
+#       SAP.XETRA,40,EUR
+#       VOD.LSE,1000,GBP
+import csv
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from backend import fetch_stock_data
+from align import align_arrays, asof_join
+from fx import cross_series
+
+FETCH_WORKERS = 8
+# fx rates older than this on a price date are still carried, but flagged as stale
+FX_STALENESS_DAYS = 7
+MAX_SERIES_ARRAYS = 512
+
+# (dates, closes) arrays per fetched price series - the cache hands back the same records
+# object until a series is refetched, so a revaluation converts nothing it converted before
+series_arrays = OrderedDict()
+series_arrays_lock = threading.Lock()
+
+
+def load_holdings(path):
+    # (symbol, quantity, currency) rows - repeated symbols are summed, bad rows skipped
+    quantities = {}
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 3 or not row[0].strip() or row[0].strip().lower() == "symbol":
+                continue
+            try:
+                quantity = float(row[1])
+            except ValueError:
+                print(f"Error: invalid quantity '{row[1]}' for {row[0]}")
+                continue
+            key = (row[0].strip().upper(), row[2].strip().upper())
+            quantities[key] = quantities.get(key, 0.0) + quantity
+    return [(symbol, quantity, currency) for (symbol, currency), quantity in quantities.items()]
+
+
+class Valuation:
+    # calendar (dates), symbols, quantities and the dates x holdings arrays behind the total. the
+    # calendar starts on the first date every holding has a price and an fx rate, so the total never
+    # counts a holding as worth nothing - late is the holdings that pushed the start back, stale the
+    # dates x holdings whose fx rate was carried more than FX_STALENESS_DAYS
+    def __init__(self, calendar, symbols, quantities, prices, fx, base, missing, late=(), stale=None):
+        self.calendar = calendar
+        self.symbols = symbols
+        self.quantities = quantities
+        self.prices = prices
+        self.fx = fx
+        self.base = base
+        self.missing = missing
+        self.late = list(late)
+        self.stale = np.zeros(prices.shape, dtype=bool) if stale is None else stale
+        self.base_prices = prices * fx
+        self.total = self.base_prices @ quantities
+
+    def stale_symbols(self, idx=None):
+        # holdings valued with a carried fx rate on a date (or on any date)
+        stale = self.stale.any(axis=0) if idx is None else self.stale[idx]
+        return [symbol for symbol, flag in zip(self.symbols, stale) if flag]
+
+    def contributions(self, idx):
+        # each holding's value in the base currency on one date
+        return self.base_prices[idx] * self.quantities
+
+    def top_contributors(self, idx, count=3):
+        values = self.contributions(idx)
+        total = values.sum()
+        order = np.argsort(values)[::-1][:count]
+        return [(self.symbols[i], values[i], values[i] / total if total else np.nan) for i in order if values[i]]
+
+
+def price_arrays(key, records):
+    with series_arrays_lock:
+        memo = series_arrays.get(key)
+        if memo is not None and memo[0] is records:
+            series_arrays.move_to_end(key)
+            return memo[1]
+    arrays = (np.array([r['date'] for r in records], dtype="datetime64[D]"), np.array([r['close'] for r in records], dtype=float))
+    with series_arrays_lock:
+        series_arrays[key] = (records, arrays)
+        while len(series_arrays) > MAX_SERIES_ARRAYS:
+            series_arrays.popitem(last=False)
+    return arrays
+
+
+def fetch_inputs(holdings, base, period, resolution="d"):
+    # price records per symbol and (dates, base per unit) per currency, all in one pool
+    symbols = sorted({symbol for symbol, _, _ in holdings})
+    currencies = sorted({currency for _, _, currency in holdings if currency != base})
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        price_jobs = {symbol: pool.submit(fetch_stock_data, symbol, period, resolution) for symbol in symbols}
+        fx_jobs = {currency: pool.submit(cross_series, currency, base, period, resolution) for currency in currencies}
+        prices = {symbol: job.result() for symbol, job in price_jobs.items()}
+        rates = {currency: job.result() for currency, job in fx_jobs.items()}
+    return prices, rates
+
+
+def value_portfolio(holdings, base, period, resolution="d"):
+    prices, rates = fetch_inputs(holdings, base, period, resolution)
+    calendar, labels, closes = align_arrays({symbol: price_arrays((symbol, period, resolution), records) for symbol, records in prices.items() if records})
+    column = {label: j for j, label in enumerate(labels)}
+    held = [(symbol, quantity, currency) for symbol, quantity, currency in holdings
+            if symbol in column and (currency == base or rates.get(currency) is not None)]
+    missing = [symbol for symbol, _, currency in holdings if (symbol, currency) not in {(s, c) for s, _, c in held}]
+    if not held:
+        return None
+
+    # one as-of joined fx column per currency, then gathered out to one column per holding. the
+    # last rate is carried over gaps of any length, marking the dates it's older than FX_STALENESS_DAYS
+    currencies = sorted({currency for _, _, currency in held})
+    fx_columns = np.ones((len(calendar), len(currencies)))
+    fx_stale = np.zeros((len(calendar), len(currencies)), dtype=bool)
+    for k, currency in enumerate(currencies):
+        if currency != base:
+            dates, values = rates[currency]
+            fx_columns[:, k] = asof_join(calendar, dates, values, None)
+            fx_stale[:, k] = np.isfinite(fx_columns[:, k]) & np.isnan(asof_join(calendar, dates, values, FX_STALENESS_DAYS))
+    currency_index = {currency: k for k, currency in enumerate(currencies)}
+
+    holding_prices = closes[:, [column[symbol] for symbol, _, _ in held]]
+    fx_index = [currency_index[currency] for _, _, currency in held]
+    holding_fx = fx_columns[:, fx_index]
+    quantities = np.array([quantity for _, quantity, _ in held], dtype=float)
+
+    # prices are forward filled and fx carried, so once every holding has both nothing is missing
+    # again - start there rather than count the holdings that haven't started yet as zero
+    complete = np.isfinite(holding_prices * holding_fx).all(axis=1)
+    if not complete.any():
+        return None
+    start = int(np.argmax(complete))
+    late = [symbol for j, (symbol, _, _) in enumerate(held) if start and not np.isfinite(holding_prices[start - 1, j] * holding_fx[start - 1, j])]
+    return Valuation(calendar[start:], [symbol for symbol, _, _ in held], quantities, holding_prices[start:], holding_fx[start:], base, missing,
+                     late, fx_stale[start:, fx_index])
@@ -0,0 +1,322 @@
+# speculative prefetch - the gui reports what the user is probably about to ask for (the stock
+# highlighted in the search results, the composite just picked, the period button under the
+# pointer, the region just chosen) and a background thread fetches it into the cache first.
+# prefetches wait until the intent has settled, give way to real requests, and are budgeted against
+# the quota: per provider at most a share of the real upstream fetches made over the last hour, and
+# no more than a daily cap in all, so they can't eat the calls real charts need. off unless asked for
+#   GFV_PREFETCH=1              - on
+#   GFV_PREFETCH_SHARE=0.2      - prefetches allowed per real upstream fetch, per provider
+#   GFV_PREFETCH_DAILY=200      - most prefetches in any 24 hours
+#   GFV_PREFETCH_REPORT=path    - hit rate report file, one json line per session
+#   python prefetch.py [path]   - hit rate over the sessions in a report file
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+import cache
+from coalesce import single_flight
+from scheduler import scheduler
+from resolution import eodhd_resolution, fred_frequency, get_composite_period, get_date_range, yfinance_interval
+
+ENABLED = os.environ.get("GFV_PREFETCH", "0") != "0"
+SHARE = float(os.environ.get("GFV_PREFETCH_SHARE", "0.2"))
+DAILY_CAP = int(os.environ.get("GFV_PREFETCH_DAILY", "200"))
+REPORT_PATH = os.environ.get("GFV_PREFETCH_REPORT", os.path.join(os.path.expanduser("~"), ".cache", "gfv", "prefetch.jsonl"))
+# an intent has to hold this long (pointer resting on a button, a highlighted row) before it's fetched
+DWELL_MS = 300
+# how often a waiting prefetch rechecks for real requests in flight
+YIELD_MS = 50
+# prefetches only go out while the provider's own bucket keeps this much of its burst for real requests
+RESERVE = 0.5
+# seconds of real fetches the share is taken of
+WINDOW = 60 * 60
+DAY = 24 * 60 * 60
+# a prefetched series nobody asked for within this long counts as wasted
+UNUSED_AFTER = 15 * 60
+MAX_OUTSTANDING = 256
+
+
+class Prefetcher:
+    def __init__(self, share=SHARE, dwell_ms=DWELL_MS, daily_cap=DAILY_CAP, window=WINDOW):
+        self.share = share
+        self.dwell = dwell_ms / 1000
+        self.daily_cap = daily_cap
+        self.window = window
+        # kind ("stock", "period", ...) -> (time, plan, args), a newer intent of a kind replaces the older one
+        self.intents = OrderedDict()
+        self.generation = {}
+        # provider -> times of real upstream fetches and of prefetches in the window, plus every
+        # prefetch of the last day for the cap
+        self.real = {}
+        self.spent = {}
+        self.today = deque()
+        # cache key -> time, prefetched and not asked for yet
+        self.outstanding = OrderedDict()
+        self.counts = {"intents": 0, "real": 0, "fetched": 0, "cached": 0, "over_budget": 0, "superseded": 0, "failed": 0, "hits": 0, "wasted": 0}
+        self.started = time.time()
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._running = False
+
+    def start(self):
+        self._running = True
+        cache.use_hooks.append(self.note_use)
+        cache.fetch_hooks.append(self.note_fetch)
+        threading.Thread(target=self._run, name="gfv-prefetch", daemon=True).start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self.intents.clear()
+            self._cond.notify()
+        if self.note_use in cache.use_hooks:
+            cache.use_hooks.remove(self.note_use)
+        if self.note_fetch in cache.fetch_hooks:
+            cache.fetch_hooks.remove(self.note_fetch)
+
+    def intend(self, kind, plan, *args):
+        # plan(*args) -> [(cached fetcher, args), ...] runs on the prefetch thread, so args should be
+        # plain values read from the widgets on the tk thread
+        with self._cond:
+            self.intents.pop(kind, None)
+            self.intents[kind] = (time.monotonic(), plan, args)
+            self.generation[kind] = self.generation.get(kind, 0) + 1
+            self.counts["intents"] += 1
+            self._cond.notify()
+
+    def cancel(self, kind):
+        # e.g. the pointer left the period button before the intent settled
+        with self._cond:
+            self.intents.pop(kind, None)
+            self.generation[kind] = self.generation.get(kind, 0) + 1
+
+    def _next(self):
+        # oldest intent that has settled, waiting for one if there isn't
+        with self._cond:
+            while self._running:
+                now = time.monotonic()
+                settled = [(at, kind) for kind, (at, _, _) in self.intents.items() if now - at >= self.dwell]
+                if settled:
+                    _, kind = min(settled)
+                    _, plan, args = self.intents.pop(kind)
+                    return kind, self.generation[kind], plan, args
+                waits = [self.dwell - (now - at) for at, _, _ in self.intents.values()]
+                self._cond.wait(min(waits) if waits else None)
+        return None
+
+    def _allowed(self, provider):
+        # spends one prefetch from the provider's budget if there's one left
+        available, burst = scheduler.headroom(provider)
+        if available < burst * RESERVE:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            real = self.real.setdefault(provider, deque())
+            spent = self.spent.setdefault(provider, deque())
+            for times, age in ((real, self.window), (spent, self.window), (self.today, DAY)):
+                while times and now - times[0] > age:
+                    times.popleft()
+            if len(spent) + 1 > self.share * len(real) or len(self.today) >= self.daily_cap:
+                return False
+            spent.append(now)
+            self.today.append(now)
+            return True
+
+    def _wait_for_real_requests(self, kind, generation):
+        # anything in flight now is a real request (ours run one at a time, from this thread) -
+        # False if the intent was replaced meanwhile
+        while single_flight.in_flight() and self._running:
+            time.sleep(YIELD_MS / 1000)
+        return self._running and self.generation.get(kind) == generation
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            kind, generation, plan, args = item
+            try:
+                requests = plan(*args)
+            except Exception as e:
+                print(f"Error planning prefetch for {kind}: {e}")
+                continue
+            for fetcher, fetch_args in requests:
+                if not self._wait_for_real_requests(kind, generation):
+                    self._count("superseded")
+                    break
+                self._fetch(fetcher, fetch_args)
+
+    def _fetch(self, fetcher, args):
+        key = fetcher.cache_key(*args)
+        if cache.lookup(key) is not None:
+            self._count("cached")
+            return
+        if not self._allowed(fetcher.provider):
+            self._count("over_budget")
+            return
+        # marked before fetching, so a real request that joins the fetch in flight is a hit too
+        with self._lock:
+            self.outstanding[key] = time.time()
+        self._local.active = True
+        try:
+            value = fetcher(*args)
+        except Exception as e:
+            print(f"Error prefetching {key}: {e}")
+            value = None
+        finally:
+            self._local.active = False
+        if value:
+            self._count("fetched")
+        else:
+            self._count("failed")
+            with self._lock:
+                self.outstanding.pop(key, None)
+        self._expire()
+
+    def note_fetch(self, provider, key):
+        # a real request went upstream - what the prefetch budget is a share of
+        if getattr(self._local, "active", False):
+            return
+        with self._lock:
+            self.real.setdefault(provider, deque()).append(time.monotonic())
+            self.counts["real"] += 1
+
+    def note_use(self, key):
+        if getattr(self._local, "active", False):
+            return
+        with self._lock:
+            if self.outstanding.pop(key, None) is not None:
+                self.counts["hits"] += 1
+
+    def _expire(self):
+        cutoff = time.time() - UNUSED_AFTER
+        with self._lock:
+            while self.outstanding and (len(self.outstanding) > MAX_OUTSTANDING or next(iter(self.outstanding.values())) < cutoff):
+                self.outstanding.popitem(last=False)
+                self.counts["wasted"] += 1
+
+    def _count(self, field):
+        with self._lock:
+            self.counts[field] += 1
+
+    def report(self):
+        self._expire()
+        with self._lock:
+            counts = dict(self.counts)
+            pending = len(self.outstanding)
+        return {"started": self.started, "seconds": round(time.time() - self.started, 1), "share": self.share, "daily_cap": self.daily_cap, "pending": pending, **counts,
+                "hit_rate": round(counts["hits"] / counts["fetched"], 3) if counts["fetched"] else 0.0}
+
+
+# plans - the fetches the chart will make for a selection, mirroring chart.handle_* so the keys match
+
+def stock_plan(symbol, composite, period, pixel_width):
+    from backend import fetch_index_columns, fetch_stock_data, fetch_stock_name
+
+    if composite == "DAX":
+        symbol = symbol.replace(".DE", "") + ".XETRA"
+    resolution = eodhd_resolution(period, pixel_width)
+    requests = [(fetch_stock_data, (symbol, period, resolution))]
+    if resolution == "d" and period != "1Y":
+        requests.append((fetch_stock_data, (symbol, "1Y", "d")))
+    requests.append((fetch_index_columns, (composite, get_composite_period(period), yfinance_interval(period, pixel_width))))
+    name = symbol.replace(".XETRA", "") + ".DE" if composite == "DAX" else symbol
+    requests.append((fetch_stock_name, (name,)))
+    return requests
+
+
+def composite_plan(composite, period, pixel_width):
+    from backend import fetch_index_columns
+
+    return [(fetch_index_columns, (composite, get_composite_period(period), yfinance_interval(period, pixel_width)))]
+
+
+def currency_plan(from_currency, to_currency, period, pixel_width):
+    # the pivot series fx.fetch_cross_rates divides
+    from backend import fetch_currency_data
+    from fx import PIVOT
+
+    resolution = eodhd_resolution(period, pixel_width)
+    return [(fetch_currency_data, (f"{currency}/{PIVOT}", period, resolution)) for currency in dict.fromkeys((from_currency, to_currency)) if currency != PIVOT]
+
+
+def macro_plan(indicator, region, period, gdp_metric, gov_metric, pixel_width):
+    from backend import get_economic_data, get_interest_rate_data, get_price_index_data
+
+    start_year, end_year = get_date_range(period)
+    if indicator == "Inflation":
+        return [(get_price_index_data, ("Inflation", region, start_year, end_year))]
+    if indicator == "Interest Rates":
+        return [(get_interest_rate_data, (region, start_year, end_year, fred_frequency(region, period, pixel_width)))]
+    data_type = {"GDP": gdp_metric, "Unemployment Rate": indicator, "Government Finances": gov_metric}.get(indicator)
+    return [(get_economic_data, (region, data_type, start_year, end_year))] if data_type else []
+
+
+def format_report(report):
+    if not report.get("intents"):
+        return ""
+    return (f"prefetch: {report['fetched']} fetched for {report.get('real', 0)} real fetches, {report['hits']} used ({report['hit_rate']:.0%}), {report['wasted']} wasted, "
+            f"{report['cached']} already cached, {report['over_budget']} over budget, {report['superseded']} superseded - {report['intents']} intents")
+
+
+def save_report(report, path=REPORT_PATH):
+    if not report.get("fetched"):
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a") as f:
+            f.write(json.dumps(report) + "\n")
+    except OSError as e:
+        print(f"Error saving prefetch report: {e}")
+
+
+current = None
+
+
+def start():
+    global current
+    if current is None and ENABLED:
+        current = Prefetcher().start()
+    return current
+
+
+def intend(kind, plan, *args):
+    if current is not None:
+        current.intend(kind, plan, *args)
+
+
+def cancel(kind):
+    if current is not None:
+        current.cancel(kind)
+
+
+def stop():
+    # stops prefetching, returns the session's report (None if it wasn't running)
+    global current
+    if current is None:
+        return None
+    current.stop()
+    report = current.report()
+    current = None
+    return report
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else REPORT_PATH
+    totals = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    for field, value in json.loads(line).items():
+                        if field in ("intents", "real", "fetched", "cached", "over_budget", "superseded", "failed", "hits", "wasted"):
+                            totals[field] = totals.get(field, 0) + value
+    except (OSError, ValueError) as e:
+        print(f"Error reading {path}: {e}")
+    totals["hit_rate"] = totals.get("hits", 0) / totals["fetched"] if totals.get("fetched") else 0.0
+    print(format_report(totals) or "no prefetches recorded")
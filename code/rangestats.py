@@ -0,0 +1,109 @@
+# statistics over any range of a chart's bars without rescanning it - built once per chart,
+# so the drag readout can update on every mouse event however long the series is
+#   prefix sums of log returns, their squares and volume  -> volatility, average volume in O(1)
+#   sparse table of mins/maxes                            -> high/low in O(1)
+#   power of two blocks of (max, min, drawdown)           -> max drawdown in O(log n)
+import numpy as np
+
+
+def _prefix(values):
+    return np.concatenate(([0.0], np.cumsum(values)))
+
+
+class RangeStats:
+    # i and j are inclusive bar indexes, in either order
+    def __init__(self, values, volumes=None, bars_per_year=252):
+        values = np.asarray(values, dtype=float)
+        self.n = len(values)
+        self.bars_per_year = bars_per_year
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.diff(np.log(values))
+        valid = np.isfinite(returns)
+        returns = np.where(valid, returns, 0.0)
+        self.return_sum = _prefix(returns)
+        self.return_sq_sum = _prefix(returns * returns)
+        self.return_count = _prefix(valid)
+
+        self.volume_sum = self.volume_count = None
+        if volumes is not None:
+            volumes = np.asarray(volumes, dtype=float)
+            has_volume = np.isfinite(volumes)
+            self.volume_sum = _prefix(np.where(has_volume, volumes, 0.0))
+            self.volume_count = _prefix(has_volume)
+
+        # level k holds [i, i + 2**k) for every i - missing values can't be a high or low
+        self.highs = [np.where(np.isfinite(values), values, -np.inf)]
+        self.lows = [np.where(np.isfinite(values), values, np.inf)]
+        self.drawdowns = [np.zeros(self.n)]
+        k = 1
+        while 1 << k <= self.n:
+            half = 1 << (k - 1)
+            hi, lo, dd = self.highs[-1], self.lows[-1], self.drawdowns[-1]
+            size = self.n - (1 << k) + 1
+            left, right = slice(0, size), slice(half, half + size)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cross = np.where(hi[left] > 0, 1 - lo[right] / hi[left], 0.0)
+            self.highs.append(np.maximum(hi[left], hi[right]))
+            self.lows.append(np.minimum(lo[left], lo[right]))
+            self.drawdowns.append(np.maximum(np.maximum(dd[left], dd[right]), cross))
+            k += 1
+
+    def _bounds(self, i, j):
+        i, j = (int(i), int(j)) if i <= j else (int(j), int(i))
+        return max(0, i), min(self.n - 1, j)
+
+    def high(self, i, j):
+        i, j = self._bounds(i, j)
+        k = (j - i + 1).bit_length() - 1
+        return max(self.highs[k][i], self.highs[k][j - (1 << k) + 1])
+
+    def low(self, i, j):
+        i, j = self._bounds(i, j)
+        k = (j - i + 1).bit_length() - 1
+        return min(self.lows[k][i], self.lows[k][j - (1 << k) + 1])
+
+    def max_drawdown(self, i, j):
+        # largest peak to later trough fall, as a fraction of the peak - drawdowns aren't
+        # idempotent like min/max, so the range is walked as disjoint blocks left to right
+        i, j = self._bounds(i, j)
+        peak, drawdown = -np.inf, 0.0
+        while i <= j:
+            k = (j - i + 1).bit_length() - 1
+            low = self.lows[k][i]
+            if peak > 0:
+                drawdown = max(drawdown, 1 - low / peak)
+            drawdown = max(drawdown, self.drawdowns[k][i])
+            peak = max(peak, self.highs[k][i])
+            i += 1 << k
+        return drawdown
+
+    def volatility(self, i, j):
+        # annualised standard deviation of the log returns between the two bars
+        i, j = self._bounds(i, j)
+        count = self.return_count[j] - self.return_count[i]
+        if count < 2:
+            return np.nan
+        total = self.return_sum[j] - self.return_sum[i]
+        squares = self.return_sq_sum[j] - self.return_sq_sum[i]
+        variance = max(0.0, (squares - total * total / count) / (count - 1))
+        return np.sqrt(variance * self.bars_per_year)
+
+    def average_volume(self, i, j):
+        if self.volume_sum is None:
+            return np.nan
+        i, j = self._bounds(i, j)
+        count = self.volume_count[j + 1] - self.volume_count[i]
+        return (self.volume_sum[j + 1] - self.volume_sum[i]) / count if count else np.nan
+
+    def summary(self, i, j):
+        return {"high": self.high(i, j), "low": self.low(i, j), "drawdown": self.max_drawdown(i, j),
+                "volatility": self.volatility(i, j), "volume": self.average_volume(i, j)}
+
+
+def bars_per_year(dates):
+    # from the chart's own spacing, so weekly/monthly bars and fx's 7 day weeks annualise right
+    if len(dates) < 2:
+        return 252
+    years = (dates[-1] - dates[0]).days / 365.25
+    return (len(dates) - 1) / years if years > 0 else 252
@@ -0,0 +1,109 @@
+# resize aware redraws - tk sends a configure event for every pixel the window edge moves, and
+# the stock canvas rasterises the whole figure for each one. here configure events only
+# stretch the last frame into the new size (a nearest neighbour preview, no matplotlib work)
+# and the real draw happens once the size has stopped changing for RESIZE_SETTLE_MS. callbacks
+# registered with on_settled (level of detail - resolution, zoom detail) run once per settled size.
+# the preview goes through tk backend internals matplotlib doesn't promise to keep, so they're
+# checked for when the canvas is made - without them resizes redraw the stock way, every event
+import numpy as np
+
+from bitmaps import BitmapCanvas
+
+try:
+    from matplotlib.backends import _backend_tk
+except ImportError:
+    _backend_tk = None
+
+RESIZE_SETTLE_MS = 150
+# what the preview and the deferred resize use of FigureCanvasTk (checked against matplotlib 3.11)
+PRIVATE_ATTRIBUTES = ["_tkcanvas", "_tkphoto", "_tkcanvas_image_region", "_resize_figure_for_canvas_size"]
+
+
+def scale_nearest(image, width, height):
+    # stretch an rgba frame to width x height by repeating/dropping rows and columns
+    rows = np.arange(height) * image.shape[0] // height
+    cols = np.arange(width) * image.shape[1] // width
+    return np.ascontiguousarray(image[rows[:, None], cols])
+
+
+class DeferredResizeCanvas(BitmapCanvas):
+    def __init__(self, figure, master=None, **kwargs):
+        super().__init__(figure, master=master, **kwargs)
+        self._settle_job = None
+        self._pending_size = None
+        self._preview_source = None
+        self._settled = []
+        self.previews = callable(getattr(_backend_tk, "blit", None)) and all(hasattr(self, name) for name in PRIVATE_ATTRIBUTES)
+
+    def on_settled(self, callback):
+        # callback(width, height) after the figure has been resized and redrawn
+        self._settled.append(callback)
+
+    def fit_to_widget(self):
+        # size the figure to the space the widget was given before the first draw, so the
+        # chart isn't rasterised at the default figure size and then again at the real one
+        widget = self.get_tk_widget()
+        width, height = widget.winfo_width(), widget.winfo_height()
+        if width > 1 and height > 1 and self.previews:
+            # configure events from the layout so far are already accounted for
+            if self._settle_job is not None:
+                widget.after_cancel(self._settle_job)
+            self._settle_job = self._pending_size = None
+            self.figure.set_size_inches(width / self.figure.dpi, height / self.figure.dpi, forward=False)
+            self._show_image(width, height)
+
+    def _show_image(self, width, height):
+        self._tkcanvas.delete(self._tkcanvas_image_region)
+        self._tkphoto.configure(width=int(width), height=int(height))
+        self._tkcanvas_image_region = self._tkcanvas.create_image(int(width / 2), int(height / 2), image=self._tkphoto)
+
+    def resize(self, event):
+        if event.width <= 1 or event.height <= 1:
+            return
+        widget = self.get_tk_widget()
+        if not self.previews:
+            # stock resize and redraw, only the level of detail callbacks wait for the size to settle
+            super().resize(event)
+            self._pending_size = (event.width, event.height)
+            if self._settle_job is not None:
+                widget.after_cancel(self._settle_job)
+            self._settle_job = widget.after(RESIZE_SETTLE_MS, self._settle)
+            return
+        if (event.width, event.height) == self.get_width_height(physical=True) and self._settle_job is None:
+            return  # e.g. the configure after fit_to_widget - nothing to redraw
+        if self._preview_source is None and getattr(self, "renderer", None) is not None:
+            # the last full frame, everything until the size settles is stretched from it
+            self._preview_source = np.asarray(self.renderer.buffer_rgba()).copy()
+        self._pending_size = (event.width, event.height)
+        if self._preview_source is not None:
+            self._show_image(event.width, event.height)
+            _backend_tk.blit(self._tkphoto, scale_nearest(self._preview_source, event.width, event.height), (0, 1, 2, 3))
+        if self._settle_job is not None:
+            widget.after_cancel(self._settle_job)
+        self._settle_job = widget.after(RESIZE_SETTLE_MS, self._settle)
+
+    def _settle(self):
+        self._settle_job = None
+        self._preview_source = None
+        if self._pending_size is None or not self.get_tk_widget().winfo_exists():
+            return
+        width, height = self._pending_size
+        self._pending_size = None
+        if self.previews:
+            self._pristine = True
+            self._resize_figure_for_canvas_size(width, height)
+        for callback in list(self._settled):
+            try:
+                callback(width, height)
+            except Exception as e:
+                print(f"Error updating chart for the new size: {e}")
+
+    def cancel_resize(self):
+        if self._settle_job is not None:
+            try:
+                self.get_tk_widget().after_cancel(self._settle_job)
+            except Exception:
+                pass
+        self._settle_job = None
+        self._preview_source = None
+        self._settled.clear()
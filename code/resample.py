@@ -0,0 +1,155 @@
+# calendar resampling and mixed frequency alignment - macro series arrive monthly (imf cpi),
+# quarterly or monthly (fred rates) or yearly (imf datamapper) while prices are daily. everything
+# here works on whole arrays: dates are bucketed with datetime64 casts and each bucket is
+# reduced with ufunc.reduceat, so resampling 10k days is a handful of numpy calls
+#   resample(dates, values, "m", "last")       - monthly closes
+#   resample(dates, closes, "w", "ohlc")       - weekly bars from daily closes
+#   step_fill(dates, values, chart_dates)      - a monthly series held until its next release
+#   align_mixed(chart_dates, {label: (dates, values)}) - several of them on one calendar for a shared hover
+import numpy as np
+
+from align import asof_join
+
+# same codes as resolution.RESOLUTIONS
+FREQUENCIES = ["d", "w", "m", "q", "a"]
+HOW = ["last", "first", "mean", "sum", "max", "min", "ohlc"]
+
+
+def to_days(dates):
+    # iso strings ("2024", "2024-05", "2024-05-17"), datetimes or datetime64 -> datetime64[D]
+    return np.asarray(dates, dtype="datetime64[D]")
+
+
+def period_start(days, freq):
+    # first day of the week (monday), month, quarter or year each day falls in
+    days = to_days(days)
+    if freq == "d":
+        return days
+    if freq == "w":
+        # 1970-01-01 was a thursday
+        return days - ((days.astype(np.int64) + 3) % 7).astype("timedelta64[D]")
+    if freq == "m":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    if freq == "q":
+        months = days.astype("datetime64[M]").astype(np.int64)
+        return (months - months % 3).astype("datetime64[M]").astype("datetime64[D]")
+    if freq == "a":
+        return days.astype("datetime64[Y]").astype("datetime64[D]")
+    raise ValueError(f"unknown frequency {freq!r}, expected one of {FREQUENCIES}")
+
+
+def _sorted_valid(dates, values):
+    days = to_days(dates)
+    values = np.asarray(values, dtype=float)
+    keep = np.isfinite(values)
+    days, values = days[keep], values[keep]
+    if len(days) > 1 and (np.diff(days) < np.timedelta64(0, "D")).any():
+        order = np.argsort(days, kind="stable")
+        days, values = days[order], values[order]
+    return days, values
+
+
+def buckets(days, freq):
+    # (starts, ends, labels) for sorted days - row ranges [start, end) of every non empty period
+    periods = period_start(days, freq)
+    if not len(periods):
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), periods
+    starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+    ends = np.r_[starts[1:], len(periods)]
+    return starts, ends, periods[starts]
+
+
+def resample(dates, values, freq, how="last", label="last"):
+    # returns (dates, values) with one row per period that had data - for "ohlc" values is a dict
+    # of open/high/low/close arrays. label "last" dates each row by its last observation (so a
+    # monthly close isn't plotted at the start of the month it closed), "start" by its period
+    if how not in HOW:
+        raise ValueError(f"unknown aggregation {how!r}, expected one of {HOW}")
+    days, values = _sorted_valid(dates, values)
+    starts, ends, periods = buckets(days, freq)
+    labels = days[ends - 1] if label == "last" else periods
+    if not len(starts):
+        return labels, ({key: values for key in ("open", "high", "low", "close")} if how == "ohlc" else values)
+
+    if how == "ohlc":
+        return labels, {"open": values[starts], "high": np.maximum.reduceat(values, starts), "low": np.minimum.reduceat(values, starts), "close": values[ends - 1]}
+    if how == "last":
+        return labels, values[ends - 1]
+    if how == "first":
+        return labels, values[starts]
+    if how == "max":
+        return labels, np.maximum.reduceat(values, starts)
+    if how == "min":
+        return labels, np.minimum.reduceat(values, starts)
+    sums = np.add.reduceat(values, starts)
+    return labels, sums if how == "sum" else sums / (ends - starts)
+
+
+def resample_bars(dates, columns, freq):
+    # daily open/high/low/close(/volume) columns -> bars of freq, dated by each bar's last day
+    days = to_days(dates)
+    if len(days) > 1 and (np.diff(days) < np.timedelta64(0, "D")).any():
+        order = np.argsort(days, kind="stable")
+        days = days[order]
+        columns = {key: np.asarray(column, dtype=float)[order] for key, column in columns.items()}
+    starts, ends, _ = buckets(days, freq)
+    if not len(starts):
+        return days, {key: np.asarray(column, dtype=float) for key, column in columns.items()}
+    reducers = {"open": lambda c: c[starts], "high": lambda c: np.fmax.reduceat(c, starts), "low": lambda c: np.fmin.reduceat(c, starts),
+                "close": lambda c: c[ends - 1], "volume": lambda c: np.add.reduceat(np.nan_to_num(c), starts)}
+    return days[ends - 1], {key: reducers.get(key, reducers["close"])(np.asarray(column, dtype=float)) for key, column in columns.items()}
+
+
+def resample_records(records, freq, keys=("open", "high", "low", "close", "volume")):
+    # same as resample_bars for the backend's record lists, returns records again (iso dates)
+    if not records:
+        return []
+    keys = [key for key in keys if key in records[0]]
+    dates, columns = resample_bars([r['date'] for r in records], {key: [r.get(key, np.nan) for r in records] for key in keys}, freq)
+    labels = np.datetime_as_string(dates, unit="D").tolist()
+    rows = zip(*(columns[key].tolist() for key in keys))
+    return [dict(zip(keys, row), date=day) for day, row in zip(labels, rows)]
+
+
+def native_spacing(dates):
+    # typical gap between observations in days - 1 daily, ~30 monthly, ~91 quarterly, ~365 yearly
+    days = np.unique(to_days(dates))
+    if len(days) < 2:
+        return 365
+    return float(np.median(np.diff(days).astype(np.int64)))
+
+
+def step_fill(dates, values, target_dates, max_staleness=None):
+    # each target date gets the latest value released on or before it. by default a value is
+    # held for 1.5x the series' own spacing, so a monthly series stops ~45 days after its last print
+    days, values = _sorted_valid(dates, values)
+    if max_staleness is None:
+        max_staleness = int(np.ceil(native_spacing(days) * 1.5))
+    return asof_join(target_dates, days, values, max_staleness=max_staleness)
+
+
+def change_over(dates, values, days_back=365, tolerance=20):
+    # percentage change against the value ~days_back earlier (year on year by default) - the
+    # earlier value is found with an as-of lookup, so gaps and irregular releases are fine
+    days, values = _sorted_valid(dates, values)
+    earlier = asof_join(days - np.timedelta64(days_back, "D"), days, values, max_staleness=tolerance)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = (values / earlier - 1) * 100
+    keep = np.isfinite(change)
+    return days[keep], change[keep]
+
+
+def align_mixed(calendar, series, how="step"):
+    # series maps label -> (dates, values) at any frequency, returns (labels, matrix) with matrix
+    # len(calendar) x len(labels). "step" holds each value until the next one, "last" only fills
+    # the calendar day each value was observed on (nan elsewhere)
+    calendar = to_days(calendar)
+    labels = list(series)
+    matrix = np.full((len(calendar), len(labels)), np.nan)
+    for j, label in enumerate(labels):
+        dates, values = series[label]
+        if how == "step":
+            matrix[:, j] = step_fill(dates, values, calendar)
+        else:
+            matrix[:, j] = asof_join(calendar, *_sorted_valid(dates, values), max_staleness=0)
+    return labels, matrix
@@ -0,0 +1,97 @@
+# resolution selection - long ranges are fetched at a coarser resolution from the
+# provider so we never download (and parse) more points than the chart can draw
+import datetime
+
+# coarsest last
+RESOLUTIONS = ["d", "w", "m", "q", "a"]
+DAYS_PER_BAR = {"d": 1, "w": 7, "m": 30.44, "q": 91.31, "a": 365.25}
+# markets only trade ~252 days a year, macro daily series are usually business days too
+TRADING_DAYS_PER_DAY = 252 / 365.25
+# bars a year of prices holds at each resolution, for annualising returns
+BARS_PER_YEAR = {"d": 252, "w": 52, "m": 12, "q": 4, "a": 1}
+
+# the chart is a 10in figure at 100dpi with the axes taking 77.5% of the width
+PLOT_WIDTH_FRACTION = 0.775
+DEFAULT_PIXEL_WIDTH = 775
+
+# what each provider can serve, mapped to its own parameter values
+EODHD_PERIODS = {"d": "d", "w": "w", "m": "m"}
+YFINANCE_INTERVALS = {"d": "1d", "w": "1wk", "m": "1mo", "q": "3mo"}
+FRED_FREQUENCIES = {"d": "d", "w": "w", "m": "m", "q": "q", "a": "a"}
+
+# fred can only aggregate down from a series' native frequency, never up
+FRED_NATIVE_FREQUENCY = {"GB": "m", "US": "m", "FR": "m", "DE": "q", "JP": "m"}
+
+
+def period_span_days(period, today=None):
+    today = today or datetime.date.today()
+    spans = {"1D": 1, "1M": 31, "3M": 92, "1Y": 366, "5Y": 1827, "10Y": 3653, "20Y": 7305, "30Y": 10958, "40Y": 14610, "Max": 36525}
+    if period == "YTD":
+        return max(1, (today - datetime.date(today.year, 1, 1)).days)
+    return spans.get(period, 31)
+
+
+def get_composite_period(period):
+    # yfinance period names for the composite
+    period_map = {"1M": "1mo", "3M": "3mo", "YTD": "ytd", "1Y": "1y", "5Y": "5y", "10Y": "10y", "Max": "max"}
+    return period_map.get(period, period)
+
+
+def get_date_range(period):
+    # (start, end) years of a macro series for the period
+    current_year = datetime.datetime.now().year
+    last_month = datetime.datetime.now().replace(day=1) - datetime.timedelta(days=1)
+    
+    if period == "5Y":
+        return str(current_year - 5), last_month.strftime('%Y-%m')
+    elif period == "10Y":
+        return str(current_year - 10), str(current_year)
+    elif period == "20Y":
+        return str(current_year - 20), str(current_year)
+    elif period == "30Y":
+        return str(current_year - 30), str(current_year)
+    elif period == "40Y":
+        return str(current_year - 40), str(current_year)
+    elif period == "Max":
+        return str(current_year - 100), str(current_year)
+    else:
+        return str(current_year - 5), str(current_year)  # default to  5Y
+
+
+def select_resolution(span_days, pixel_width=DEFAULT_PIXEL_WIDTH, points_per_pixel=1.0, native="d", supported=RESOLUTIONS):
+    # pick the finest resolution (no finer than the series' native one) that fits in the pixel budget
+    max_points = max(1, pixel_width * points_per_pixel)
+    candidates = [res for res in RESOLUTIONS[RESOLUTIONS.index(native):] if res in supported]
+    for res in candidates:
+        bars = span_days / DAYS_PER_BAR[res]
+        if res == "d":
+            bars *= TRADING_DAYS_PER_DAY
+        if bars <= max_points:
+            return res
+    return candidates[-1] if candidates else native
+
+
+def chart_pixel_width(widget, axes_fraction=PLOT_WIDTH_FRACTION):
+    # width the plot area will have once the chart frame is packed into the window
+    try:
+        width = widget.winfo_width()
+    except Exception:
+        width = 0
+    if width <= 1:  # not mapped yet
+        return DEFAULT_PIXEL_WIDTH
+    return max(200, int((width - 20) * axes_fraction))
+
+
+def eodhd_resolution(period, pixel_width=DEFAULT_PIXEL_WIDTH):
+    return EODHD_PERIODS[select_resolution(period_span_days(period), pixel_width, supported=EODHD_PERIODS)]
+
+
+def yfinance_interval(period, pixel_width=DEFAULT_PIXEL_WIDTH):
+    return YFINANCE_INTERVALS[select_resolution(period_span_days(period), pixel_width, supported=YFINANCE_INTERVALS)]
+
+
+def fred_frequency(country_code, period, pixel_width=DEFAULT_PIXEL_WIDTH):
+    # returns "" when the native frequency already fits, so fred isn't asked to aggregate
+    native = FRED_NATIVE_FREQUENCY.get(country_code, "m")
+    res = select_resolution(period_span_days(period), pixel_width, native=native, supported=FRED_FREQUENCIES)
+    return "" if res == native else FRED_FREQUENCIES[res]
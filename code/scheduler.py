@@ -0,0 +1,268 @@
+# central request scheduler used by every backend fetcher
+# - token bucket per provider so bursts of clicks don't trip rate limits
+# - per-request deadlines, passed down to curl as connect/transfer timeouts
+# - retries with exponential backoff and full jitter on retryable statuses
+# - optional hedged duplicate request when the first attempt is slow
+# - latency histograms per provider
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# 0 means the transfer itself failed (connection refused, timed out, reset)
+RETRYABLE_STATUS = {0, 408, 425, 429, 500, 502, 503, 504}
+# the attempt raised (a parse error, a bad symbol) - it would fail the same way again, so no retry
+ATTEMPT_ERROR = -1
+
+# rate is requests per second, burst is the bucket size, times are in seconds
+# hedge_after=None disables hedging (e.g. yfapi's free tier has a small daily quota)
+PROVIDER_POLICIES = {
+    "eodhd":     {"rate": 5.0, "burst": 10, "connect_timeout": 5, "timeout": 20, "deadline": 30, "retries": 3, "backoff": 0.5, "backoff_cap": 8, "hedge_after": 3.0},
+    "fred":      {"rate": 2.0, "burst": 5,  "connect_timeout": 5, "timeout": 20, "deadline": 30, "retries": 3, "backoff": 0.5, "backoff_cap": 8, "hedge_after": 4.0},
+    "imf":       {"rate": 1.0, "burst": 3,  "connect_timeout": 5, "timeout": 30, "deadline": 45, "retries": 2, "backoff": 1.0, "backoff_cap": 8, "hedge_after": 8.0},
+    "yfapi":     {"rate": 1.0, "burst": 3,  "connect_timeout": 3, "timeout": 8,  "deadline": 10, "retries": 1, "backoff": 0.5, "backoff_cap": 4, "hedge_after": None},
+    "yfinance":  {"rate": 2.0, "burst": 5,  "connect_timeout": 5, "timeout": 15, "deadline": 30, "retries": 2, "backoff": 0.5, "backoff_cap": 8, "hedge_after": 4.0},
+    "wikipedia": {"rate": 1.0, "burst": 5,  "connect_timeout": 5, "timeout": 20, "deadline": 30, "retries": 2, "backoff": 1.0, "backoff_cap": 8, "hedge_after": None},
+}
+DEFAULT_POLICY = {"rate": 1.0, "burst": 3, "connect_timeout": 5, "timeout": 20, "deadline": 30, "retries": 2, "backoff": 0.5, "backoff_cap": 8, "hedge_after": None}
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def available(self):
+        # tokens in the bucket right now, without taking one
+        with self.lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+    def acquire(self, deadline=None):
+        # block until a token is available, or give up at the deadline
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait_time = (1 - self.tokens) / self.rate
+            if deadline is not None and now + wait_time > deadline:
+                return False
+            time.sleep(wait_time)
+
+
+class LatencyHistogram:
+    # log spaced buckets from 5ms to ~2 minutes, good enough for p50/p95/p99
+    BOUNDS = [0.005 * 1.5 ** i for i in range(26)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        i = 0 if seconds <= self.BOUNDS[0] else min(len(self.BOUNDS), int(math.log(seconds / self.BOUNDS[0], 1.5)) + 1)
+        with self.lock:
+            self.counts[i] += 1
+            self.total += 1
+            self.sum += seconds
+            self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        with self.lock:
+            if not self.total:
+                return 0.0
+            target = p / 100 * self.total
+            seen = 0
+            for i, count in enumerate(self.counts):
+                seen += count
+                if seen >= target:
+                    return min(self.BOUNDS[i], self.max) if i < len(self.BOUNDS) else self.max
+            return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.total,
+            "mean": self.sum / self.total if self.total else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+def _release_late(future, release):
+    value, _ = future.result()
+    if value is not None:
+        release(value)
+
+
+class RequestScheduler:
+    def __init__(self, policies=None, max_workers=16):
+        self.policies = dict(PROVIDER_POLICIES if policies is None else policies)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gfv-fetch")
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.latency = {}
+        self.counters = {}
+
+    def policy(self, provider):
+        return self.policies.get(provider, DEFAULT_POLICY)
+
+    def _bucket(self, provider):
+        with self.lock:
+            if provider not in self.buckets:
+                policy = self.policy(provider)
+                self.buckets[provider] = TokenBucket(policy["rate"], policy["burst"])
+            return self.buckets[provider]
+
+    def headroom(self, provider):
+        # requests the provider's bucket could send immediately, and its burst size
+        return self._bucket(provider).available(), self.policy(provider)["burst"]
+
+    def _histogram(self, provider):
+        with self.lock:
+            return self.latency.setdefault(provider, LatencyHistogram())
+
+    def _count(self, provider, field):
+        with self.lock:
+            counts = self.counters.setdefault(provider, {"calls": 0, "attempts": 0, "retries": 0, "hedges": 0, "failures": 0, "deadline_exceeded": 0})
+            counts[field] += 1
+
+    def _timed(self, provider, attempt, connect_timeout, timeout):
+        self._count(provider, "attempts")
+        start = time.monotonic()
+        try:
+            return attempt(connect_timeout, timeout)
+        except ValueError as e:
+            # before OSError - requests' json errors are both
+            print(f"Error during {provider} request: {e}")
+            return None, ATTEMPT_ERROR
+        except OSError as e:
+            # a python level transfer failure (requests/socket timeout, connection reset) is a transport failure
+            print(f"Error during {provider} request: {e}")
+            return None, 0
+        except Exception as e:
+            print(f"Error during {provider} request: {e}")
+            return None, ATTEMPT_ERROR
+        finally:
+            self._histogram(provider).record(time.monotonic() - start)
+
+    def _run_hedged(self, provider, attempt, connect_timeout, timeout, release):
+        policy = self.policy(provider)
+        futures = [self.executor.submit(self._timed, provider, attempt, connect_timeout, timeout)]
+        hedge_after = policy["hedge_after"]
+        # allow a little slack over the transfer timeout before giving up on the worker
+        give_up = time.monotonic() + timeout + 1
+
+        if hedge_after is not None and hedge_after < timeout:
+            done, _ = wait(futures, timeout=hedge_after)
+            # only hedge if it doesn't cost a rate limit token we don't have
+            if not done and self._bucket(provider).try_acquire():
+                self._count(provider, "hedges")
+                remaining = max(0.1, give_up - 1 - time.monotonic())
+                futures.append(self.executor.submit(self._timed, provider, attempt, connect_timeout, remaining))
+
+        result, status = None, 0
+        pending = list(futures)
+        while pending:
+            done, not_done = wait(pending, timeout=max(0, give_up - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            pending = list(not_done)
+            for future in done:
+                value, code = future.result()
+                if value is not None and result is None:
+                    result, status = value, code
+                elif value is not None and release:
+                    release(value)  # lost the race - free the duplicate
+                elif result is None:
+                    status = code
+            if result is not None:
+                break
+
+        # whatever is still running belongs to the loser, release it when it finishes
+        if release:
+            for future in pending:
+                future.add_done_callback(lambda f: _release_late(f, release))
+        return result, status
+
+    def call(self, provider, attempt, deadline=None, release=None):
+        # attempt(connect_timeout, timeout) -> (result, status); result None means it failed
+        # returns the result, or None if every attempt failed or the deadline passed
+        policy = self.policy(provider)
+        self._count(provider, "calls")
+        start = time.monotonic()
+        deadline_at = start + (deadline if deadline is not None else policy["deadline"])
+        bucket = self._bucket(provider)
+
+        for retry in range(policy["retries"] + 1):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0 or not bucket.acquire(deadline_at):
+                self._count(provider, "deadline_exceeded")
+                print(f"Error: {provider} request deadline exceeded")
+                break
+
+            remaining = deadline_at - time.monotonic()
+            timeout = max(0.1, min(policy["timeout"], remaining))
+            connect_timeout = min(policy["connect_timeout"], timeout)
+            result, status = self._run_hedged(provider, attempt, connect_timeout, timeout, release)
+            if result is not None:
+                return result
+
+            if status not in RETRYABLE_STATUS or retry == policy["retries"]:
+                break
+            # exponential backoff with full jitter, never sleeping past the deadline
+            backoff = random.uniform(0, min(policy["backoff_cap"], policy["backoff"] * 2 ** retry))
+            if time.monotonic() + backoff >= deadline_at:
+                self._count(provider, "deadline_exceeded")
+                break
+            self._count(provider, "retries")
+            time.sleep(backoff)
+
+        self._count(provider, "failures")
+        return None
+
+    def report(self):
+        with self.lock:
+            providers = sorted(set(self.latency) | set(self.counters))
+        report = {}
+        for provider in providers:
+            entry = dict(self.counters.get(provider, {}))
+            entry["latency"] = self._histogram(provider).snapshot()
+            report[provider] = entry
+        return report
+
+
+scheduler = RequestScheduler()
+
+
+def format_latency_report():
+    lines = []
+    for provider, entry in scheduler.report().items():
+        latency = entry["latency"]
+        lines.append(
+            f"{provider}: {entry.get('calls', 0)} calls, {entry.get('retries', 0)} retries, {entry.get('hedges', 0)} hedges, "
+            f"{entry.get('failures', 0)} failed - p50 {latency['p50'] * 1000:.0f}ms p95 {latency['p95'] * 1000:.0f}ms p99 {latency['p99'] * 1000:.0f}ms"
+        )
+    return "\n".join(lines)
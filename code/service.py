@@ -0,0 +1,231 @@
+# local data service - one process owns the provider fetchers, the cache and request coalescing,
+# and any number of gui instances fetch through it over http/json instead of calling eodhd, fred,
+# imf, yfapi and wikipedia themselves, so ten people looking at AAPL cost one upstream fetch
+#   python service.py                          - serve on 127.0.0.1:8765
+#   python service.py 0.0.0.0:8765             - serve to the rest of the team
+#   GFV_SERVICE_URL=http://host:8765 python main.py   - gui fetches through the service
+# POST /call/<function> {"args": [...], "kwargs": {...}} -> {"result": ...}, GET /stats, GET /health
+import gzip
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_ADDRESS = ("127.0.0.1", 8765)
+# the backend functions a client may call - the cached fetchers plus live quotes
+SERVED = [
+    "fetch_stock_data", "fetch_currency_data", "fetch_index_columns", "fetch_window_data", "fetch_stock_name",
+    "get_price_index_data", "get_economic_data", "get_interest_rate_data", "scrape_constituents", "fetch_quotes",
+]
+# a quote fetched for one client is good enough for another asking within this many seconds
+QUOTE_TTL = 5.0
+# responses bigger than this are gzipped for clients that accept it
+GZIP_MIN_BYTES = 1024
+CLIENT_TIMEOUT = 60
+# after a failed connection the client fetches directly for this long before trying again
+RETRY_AFTER = 30
+# what a keep-alive connection the server already closed fails with - the only errors worth a retry
+STALE_CONNECTION = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+
+def _json_default(value):
+    # numpy scalars/arrays (index columns, quotes)
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+class ServiceClient:
+    # one keep-alive connection per calling thread (the gui thread, zoom and prefetch workers),
+    # so calls don't pay a tcp handshake each and threads never share a connection
+    def __init__(self, url, timeout=CLIENT_TIMEOUT):
+        parts = urlsplit(url if "://" in url else f"http://{url}")
+        self.host = parts.hostname or DEFAULT_ADDRESS[0]
+        self.port = parts.port or DEFAULT_ADDRESS[1]
+        self.url = f"http://{self.host}:{self.port}"
+        self.timeout = timeout
+        self.down_until = 0
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def available(self):
+        return time.time() >= self.down_until
+
+    def request(self, method, path, body=None):
+        # raises ConnectionError if the service can't be reached and RuntimeError if it answered with
+        # an error (callers fall back to fetching directly for both)
+        headers = {"Accept-Encoding": "gzip", "Content-Type": "application/json"}
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except STALE_CONNECTION as e:
+                # the server closes idle keep-alive connections, so a stale one gets one retry
+                self._drop_connection()
+                if attempt:
+                    self.down_until = time.time() + RETRY_AFTER
+                    raise ConnectionError(f"data service at {self.url} unavailable: {e}") from e
+            except (http.client.HTTPException, OSError) as e:
+                # refused, timed out (the request may still be running there) - retrying would only wait again
+                self._drop_connection()
+                self.down_until = time.time() + RETRY_AFTER
+                raise ConnectionError(f"data service at {self.url} unavailable: {e}") from e
+        try:
+            if response.getheader("Content-Encoding") == "gzip":
+                data = gzip.decompress(data)
+            payload = json.loads(data) if data else {}
+        except (OSError, ValueError) as e:
+            raise RuntimeError(f"data service returned {response.status} with an unreadable body: {e}") from e
+        if response.status != 200:
+            raise RuntimeError(payload.get("error", f"data service returned {response.status}") if isinstance(payload, dict) else f"data service returned {response.status}")
+        return payload
+
+    def call(self, name, args=(), kwargs=None):
+        body = json.dumps({"args": list(args), "kwargs": kwargs or {}}, default=_json_default).encode()
+        return self.request("POST", f"/call/{name}", body)["result"]
+
+    def stats(self):
+        return self.request("GET", "/stats")
+
+
+class QuoteBoard:
+    # latest quote per symbol across every client - only symbols nobody asked for in the
+    # last QUOTE_TTL seconds go upstream, in one batch
+    def __init__(self, fetch, ttl=QUOTE_TTL):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.quotes = {}
+        self._lock = threading.Lock()
+        # clients polling at the same moment wait for one batch rather than each sending their own
+        self._fetch_lock = threading.Lock()
+
+    def get(self, symbols):
+        with self._fetch_lock:
+            now = time.time()
+            with self._lock:
+                stale = [symbol for symbol in symbols if self.quotes.get(symbol, (None, 0))[1] < now - self.ttl]
+            if stale:
+                fresh = self.fetch(stale)
+                with self._lock:
+                    for symbol, price in fresh.items():
+                        self.quotes[symbol] = (price, now)
+        with self._lock:
+            return {symbol: self.quotes[symbol][0] for symbol in symbols if symbol in self.quotes}
+
+
+def make_handler(functions, started):
+    from http.server import BaseHTTPRequestHandler
+
+    import cache
+    from coalesce import single_flight
+
+    calls = {}
+    calls_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, payload):
+            data = json.dumps(payload, default=_json_default).encode()
+            gzipped = len(data) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", "")
+            if gzipped:
+                data = gzip.compress(data, compresslevel=5)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            if gzipped:
+                self.send_header("Content-Encoding", "gzip")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self.send_json(200, {"ok": True, "uptime": round(time.time() - started, 1)})
+            elif self.path == "/stats":
+                with calls_lock:
+                    by_function = dict(calls)
+                self.send_json(200, {
+                    "uptime": round(time.time() - started, 1), "calls": by_function, "coalescing": single_flight.stats(),
+                    "memory": {"entries": len(cache.series_cache.items()), "hits": cache.series_cache.hits, "misses": cache.series_cache.misses},
+                    "shared": cache.shared_cache.stats(),
+                })
+            else:
+                self.send_json(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self):
+            # the body is always read, or it would be taken for the next request on the connection
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            name = self.path[len("/call/"):] if self.path.startswith("/call/") else ""
+            fn = functions.get(name)
+            if fn is None:
+                self.send_json(404, {"error": f"unknown function {name!r}"})
+                return
+            try:
+                request = json.loads(body or b"{}")
+                args, kwargs = request.get("args", []), request.get("kwargs", {})
+            except ValueError as e:
+                self.send_json(400, {"error": f"bad request: {e}"})
+                return
+            with calls_lock:
+                calls[name] = calls.get(name, 0) + 1
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                print(f"Error in {name}{tuple(args)}: {e}")
+                self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+                return
+            self.send_json(200, {"result": result})
+
+    return Handler
+
+
+def serve(address=DEFAULT_ADDRESS):
+    from http.server import ThreadingHTTPServer
+
+    # the service fetches from the providers itself, never through another service
+    os.environ.pop("GFV_SERVICE_URL", None)
+    import cache
+    cache.use_service(None)
+    import backend
+
+    functions = {name: getattr(backend, name) for name in SERVED}
+    functions["fetch_quotes"] = QuoteBoard(backend.fetch_quotes).get
+    server = ThreadingHTTPServer(address, make_handler(functions, time.time()))
+    server.daemon_threads = True
+    print(f"Data service on http://{address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(":")
+    return (host or DEFAULT_ADDRESS[0], int(port or DEFAULT_ADDRESS[1]))
+
+
+if __name__ == "__main__":
+    serve(parse_address(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ADDRESS)
@@ -0,0 +1,68 @@
+# a chart session owns everything one chart allocates - the tk frame, figure, canvas,
+# matplotlib callbacks and any native buffers or streams - and releases all of it when the
+# chart is replaced, so nothing (including closures over the chart's data) outlives it
+class ChartSession:
+    def __init__(self, root):
+        self.root = root
+        self.frame = None
+        self.figure = None
+        self.canvas = None
+        self.toolbar = None
+        self.live = None
+        self._cids = []
+        self._releases = []
+        self.closed = False
+
+    def connect(self, event, handler):
+        self._cids.append(self.canvas.mpl_connect(event, handler))
+
+    def own(self, release, *args):
+        # release(*args) is called on close, most recent first
+        self._releases.append((release, args))
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        while self._releases:
+            release, args = self._releases.pop()
+            try:
+                release(*args)
+            except Exception as e:
+                print(f"Error releasing chart resource: {e}")
+
+        if self.canvas is not None:
+            for cid in self._cids:
+                self.canvas.mpl_disconnect(cid)
+            widget = self.canvas.get_tk_widget()
+            if widget.winfo_exists():
+                widget.destroy()
+        if self.figure is not None:
+            # drops every artist (and the data they hold) even if something still references the figure
+            self.figure.clear()
+        if self.frame is not None and self.frame.winfo_exists():
+            self.frame.destroy()
+        self._cids.clear()
+        self.frame = self.figure = self.canvas = self.toolbar = self.live = None
+
+
+current = None
+
+
+def begin(root):
+    # closes the previous chart's session before the next one allocates anything
+    global current
+    end()
+    current = ChartSession(root)
+    return current
+
+
+def end():
+    global current
+    if current is not None:
+        current.close()
+        current = None
+
+
+def active():
+    return current is not None and current.frame is not None and current.frame.winfo_exists()
@@ -0,0 +1,125 @@
+# startup timing - the window should be on screen before matplotlib, yfinance, lxml,
+# the shared library or the wikipedia scrape are touched. heavy modules are warmed in
+# a background thread after first paint instead
+#   GFV_STARTUP_REPORT=1 python main.py   - print timings and check the budget
+#   python startup.py                     - import-time report for the startup path
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# process start (main.py imports this first) to first paint of the main window
+STARTUP_BUDGET_MS = 750
+
+# modules that must not be imported before first paint
+HEAVY_MODULES = ["matplotlib", "matplotlib.pyplot", "numpy", "yfinance", "pandas", "lxml", "requests", "chart", "correlation", "export"]
+
+# warmed in the background once the window is up, roughly in the order they're needed
+WARM_MODULES = ["numpy", "matplotlib.pyplot", "matplotlib.backends.backend_tkagg", "chart", "requests", "lxml.html", "yfinance"]
+
+_start = time.perf_counter()
+_marks = []
+_lock = threading.Lock()
+
+
+def elapsed_ms():
+    return (time.perf_counter() - _start) * 1000
+
+
+def mark(label):
+    with _lock:
+        _marks.append((label, elapsed_ms(), threading.current_thread().name))
+
+
+def first_paint_ms():
+    for label, ms, _ in _marks:
+        if label == "first paint":
+            return ms
+    return None
+
+
+def report():
+    lines = ["startup timings (ms since process start):"]
+    with _lock:
+        marks = list(_marks)
+    for label, ms, thread in marks:
+        where = "" if thread == "MainThread" else f"  [{thread}]"
+        lines.append(f"  {ms:8.1f}  {label}{where}")
+
+    painted = first_paint_ms()
+    if painted is not None:
+        status = "ok" if painted <= STARTUP_BUDGET_MS else "OVER BUDGET"
+        lines.append(f"first paint {painted:.0f}ms / budget {STARTUP_BUDGET_MS}ms - {status}")
+    return "\n".join(lines)
+
+
+def check_budget():
+    # called right after first paint - anything heavy imported by now is a regression
+    early = [name for name in HEAVY_MODULES if name in sys.modules]
+    if early:
+        print(f"Warning: heavy modules imported before first paint: {', '.join(early)}")
+    painted = first_paint_ms()
+    if painted is not None and painted > STARTUP_BUDGET_MS:
+        print(f"Warning: first paint took {painted:.0f}ms, budget is {STARTUP_BUDGET_MS}ms")
+    if os.environ.get("GFV_STARTUP_REPORT"):
+        print(report())
+
+
+def warm_up():
+    for name in WARM_MODULES:
+        try:
+            importlib.import_module(name)
+            mark(f"warmed {name}")
+        except Exception as e:
+            print(f"Error warming module {name}: {e}")
+
+    # scrape the composite constituents so the stock dropdown is instant
+    import backend
+    backend.load_all_tickers()
+    mark("constituents loaded")
+    if os.environ.get("GFV_STARTUP_REPORT"):
+        print(report())
+
+
+def warm_up_in_background():
+    thread = threading.Thread(target=warm_up, name="gfv-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def import_time_report(module="gui", top=15):
+    # run a fresh interpreter with -X importtime and list the most expensive imports
+    code_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=code_dir, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            _, self_us, cumulative_us, name = line.replace("import time:", "|", 1).split("|")
+            rows.append((int(cumulative_us), int(self_us), name[1:].rstrip()))
+        except ValueError:
+            continue
+
+    # only top level entries, nested imports are already counted in their parent's cumulative time
+    top_level = [row for row in rows if not row[2].startswith(" ")]
+    total_ms = sum(row[0] for row in top_level) / 1000
+    lines = [f"import {module}: {total_ms:.1f}ms total"]
+    for cumulative_us, self_us, name in sorted(rows, key=lambda row: row[0], reverse=True)[:top]:
+        lines.append(f"  {cumulative_us / 1000:8.1f}ms  (self {self_us / 1000:6.1f}ms)  {name.strip()}")
+    if result.returncode != 0:
+        lines.append(result.stderr.strip().splitlines()[-1])
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # startup path first, then the modules that are deferred until a chart or scrape needs them
+    print(import_time_report("gui"))
+    for module in ["chart", "yfinance", "lxml.html"]:
+        print()
+        print(import_time_report(module, top=5))
@@ -0,0 +1,46 @@
+# correlation_matrix against np.corrcoef over each pair's overlapping days
+#   python -m pytest test_correlation.py
+import numpy as np
+import pytest
+
+pytest.importorskip("ttkbootstrap")
+from correlation import correlation_matrix
+
+
+def overlap_corrcoef(returns, i, j):
+    both = ~np.isnan(returns[:, i]) & ~np.isnan(returns[:, j])
+    return np.corrcoef(returns[both, i], returns[both, j])[0, 1]
+
+
+def ragged_returns(days=1250, series=7, seed=0):
+    # correlated returns, with later listings, a delisting and gaps, like an index's constituents
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 0.01, days)
+    returns = market[:, None] * rng.uniform(0.2, 1.5, series) + rng.normal(0, 0.01, (days, series))
+    returns[:days - 200, 1] = np.nan
+    returns[:600, 2] = np.nan
+    returns[1150:, 3] = np.nan
+    returns[rng.random(days) < 0.05, 4] = np.nan
+    # a regime change inside the short listing, so whole history standardisation would be off
+    returns[days - 200:, 1] += 0.05
+    return returns
+
+
+@pytest.mark.parametrize("block", [2, 3, 128])
+def test_matches_corrcoef_on_ragged_columns(block):
+    returns = ragged_returns()
+    corr = correlation_matrix(returns, block=block)
+    for i in range(returns.shape[1]):
+        for j in range(returns.shape[1]):
+            if i != j:
+                assert corr[i, j] == pytest.approx(overlap_corrcoef(returns, i, j), abs=1e-9)
+    assert np.allclose(corr, corr.T, equal_nan=True)
+
+
+def test_short_and_flat_overlaps_are_blank():
+    returns = ragged_returns()
+    returns[:-10, 0] = np.nan
+    returns[:, 5] = 0.0
+    corr = correlation_matrix(returns, min_overlap=20)
+    assert np.isnan(corr[0, 6]) and np.isnan(corr[5, 6])
+    assert (np.diag(corr) == 1.0).all()
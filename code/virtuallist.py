@@ -0,0 +1,98 @@
+# scrollable result list that only ever holds the rows on screen - the items stay a python
+# list and scrolling/filtering just swaps which slice the listbox shows, so a 500 name
+# composite (or filtering it on every keystroke) costs the same as a 10 name one
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualList(tk.Frame):
+    # on_select(index, item) is called whenever the selection changes
+    def __init__(self, master, rows=6, width=30, on_select=None):
+        super().__init__(master, bg='black')
+        self.items = []
+        self.rows = rows
+        self.offset = 0  # index of the first visible item
+        self.selected = -1
+        self.on_select = on_select
+        self.listbox = tk.Listbox(self, height=rows, width=width, bg='black', fg='white', selectbackground='#5cc4fc', selectforeground='black',
+                                  activestyle='none', exportselection=False, highlightthickness=0, borderwidth=1)
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.on_scrollbar)
+        self.listbox.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+
+        # the listbox's own bindings only know about the visible rows, so ours replace them
+        keys = {'<Up>': lambda: self.move(-1), '<Down>': lambda: self.move(1), '<Prior>': lambda: self.move(-rows), '<Next>': lambda: self.move(rows),
+                '<Home>': lambda: self.select(0), '<End>': lambda: self.select(len(self.items) - 1)}
+        for key, action in keys.items():
+            self.listbox.bind(key, lambda event, action=action: (action(), 'break')[1])
+        self.listbox.bind('<Button-1>', self.on_click)
+        self.listbox.bind('<B1-Motion>', lambda event: 'break')
+        self.listbox.bind('<MouseWheel>', lambda event: self.scroll(-1 if event.delta > 0 else 1))
+        self.listbox.bind('<Button-4>', lambda event: self.scroll(-1))
+        self.listbox.bind('<Button-5>', lambda event: self.scroll(1))
+
+    def set_items(self, items, select=0):
+        # the list is kept by reference, nothing is copied into tk
+        self.items = items
+        self.offset = 0
+        self.selected = -1
+        if items and select is not None:
+            self.select(select)
+        else:
+            self.render()
+
+    def get(self):
+        return self.items[self.selected] if 0 <= self.selected < len(self.items) else ""
+
+    def render(self):
+        self.listbox.delete(0, 'end')
+        visible = self.items[self.offset:self.offset + self.rows]
+        if visible:
+            self.listbox.insert('end', *visible)
+        if self.offset <= self.selected < self.offset + self.rows:
+            self.listbox.selection_set(self.selected - self.offset)
+        count = len(self.items)
+        if count > self.rows:
+            self.scrollbar.set(self.offset / count, (self.offset + self.rows) / count)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, len(self.items) - self.rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def scroll(self, rows):
+        self.scroll_to(self.offset + rows)
+        return 'break'
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.scroll_to(int(round(float(amount) * len(self.items))))
+        elif action == 'scroll':
+            self.scroll(int(amount) * (self.rows if unit == 'pages' else 1))
+
+    def select(self, index, notify=True):
+        if not self.items:
+            return
+        index = max(0, min(index, len(self.items) - 1))
+        self.selected = index
+        # keep the selection on screen
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + self.rows:
+            self.offset = index - self.rows + 1
+        self.render()
+        if notify and self.on_select:
+            self.on_select(index, self.items[index])
+
+    def move(self, step):
+        self.select(self.selected + step if self.selected >= 0 else 0)
+
+    def on_click(self, event):
+        self.listbox.focus_set()
+        row = self.listbox.nearest(event.y)
+        if row >= 0 and self.offset + row < len(self.items):
+            self.select(self.offset + row)
+        return 'break'
@@ -0,0 +1,210 @@
+# ui stall monitor - a tk after() heartbeat on the main loop and a thread that watches it. when
+# the heartbeat is late by more than the threshold the main thread's stack is sampled until it
+# comes back, and the stall's duration is charged to the callback that was running (the
+# outermost frame of ours on the stack - e.g. gui.update_result, chart.on_mouse_move)
+#   GFV_WATCHDOG=1 python main.py       - monitor, print the ranking on exit and append it to the report file
+#   GFV_WATCHDOG_MS=200                 - stall threshold
+#   GFV_WATCHDOG_REPORT=path.jsonl      - report file, one json line per session
+#   python watchdog.py a.jsonl b.jsonl  - rank handlers over reports collected from several machines
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+ENABLED = os.environ.get("GFV_WATCHDOG", "0") == "1"
+STALL_MS = float(os.environ.get("GFV_WATCHDOG_MS", "200"))
+HEARTBEAT_MS = 50
+SAMPLE_MS = 50
+MAX_SAMPLES = 100
+MAX_RECENT = 50
+REPORT_PATH = os.environ.get("GFV_WATCHDOG_REPORT", os.path.join(os.path.expanduser("~"), ".cache", "gfv", "stalls.jsonl"))
+
+_code_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def app_frames(stack):
+    # (module.function, line) for the frames in this repo's modules, outermost first
+    frames = []
+    for frame in stack:
+        path = os.path.abspath(frame.filename)
+        if os.path.dirname(path) == _code_dir and path != os.path.abspath(__file__):
+            frames.append((f"{os.path.splitext(os.path.basename(path))[0]}.{frame.name}", frame.lineno))
+    return frames
+
+
+def attribute(stack):
+    # the callback tk (or matplotlib) was running and the innermost frame of ours under it
+    frames = app_frames(stack)
+    # mainloop itself is on every stack, the handler is the frame after it
+    frames = [frame for frame in frames if not frame[0].endswith(("run_gui", "main.<module>"))] or frames
+    if not frames:
+        return "tk/library", "tk/library"
+    handler = frames[0][0]
+    leaf = f"{frames[-1][0]}:{frames[-1][1]}"
+    return handler, leaf
+
+
+class Watchdog:
+    def __init__(self, root, stall_ms=STALL_MS, heartbeat_ms=HEARTBEAT_MS, sample_ms=SAMPLE_MS):
+        self.root = root
+        self.stall_ms = stall_ms
+        self.heartbeat_ms = heartbeat_ms
+        self.sample_ms = sample_ms
+        self.main_id = threading.main_thread().ident
+        self.handlers = {}
+        self.recent = []
+        self.stalls = 0
+        self.stall_total_ms = 0.0
+        self.started = time.time()
+        self._samples = []
+        self._last_beat = time.perf_counter()
+        self._lock = threading.Lock()
+        self._running = False
+        self._job = None
+
+    def start(self):
+        self._running = True
+        self._last_beat = time.perf_counter()
+        self._job = self.root.after(self.heartbeat_ms, self._beat)
+        threading.Thread(target=self._watch, name="gfv-watchdog", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._job is not None:
+            try:
+                self.root.after_cancel(self._job)
+            except Exception:
+                pass
+            self._job = None
+
+    def _beat(self):
+        now = time.perf_counter()
+        with self._lock:
+            late_ms = (now - self._last_beat) * 1000 - self.heartbeat_ms
+            samples, self._samples = self._samples, []
+            self._last_beat = now
+        if late_ms > self.stall_ms:
+            self._record(late_ms, samples)
+        if self._running:
+            self._job = self.root.after(self.heartbeat_ms, self._beat)
+
+    def _watch(self):
+        # samples the main thread only while the heartbeat is overdue
+        while self._running:
+            time.sleep(self.sample_ms / 1000)
+            with self._lock:
+                late_ms = (time.perf_counter() - self._last_beat) * 1000 - self.heartbeat_ms
+                if late_ms <= self.stall_ms or len(self._samples) >= MAX_SAMPLES:
+                    continue
+            frame = sys._current_frames().get(self.main_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            with self._lock:
+                self._samples.append(stack)
+
+    def _record(self, duration_ms, samples):
+        # the stall's time is split across the handlers seen in its samples
+        attributed = [attribute(stack) for stack in samples] or [("unsampled", "unsampled")]
+        share = duration_ms / len(attributed)
+        with self._lock:
+            self.stalls += 1
+            self.stall_total_ms += duration_ms
+            for handler in set(h for h, _ in attributed):
+                entry = self.handlers.setdefault(handler, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "hot": Counter()})
+                entry["count"] += 1
+                entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            for handler, leaf in attributed:
+                self.handlers[handler]["total_ms"] += share
+                self.handlers[handler]["hot"][leaf] += share
+            stack = [f"{name}:{line}" for name, line in app_frames(samples[-1])] if samples else []
+            self.recent.append({"at": time.time(), "ms": round(duration_ms, 1), "handler": attributed[0][0], "stack": stack})
+            del self.recent[:-MAX_RECENT]
+
+    def report(self):
+        with self._lock:
+            return {
+                "started": self.started, "seconds": round(time.time() - self.started, 1), "threshold_ms": self.stall_ms,
+                "stalls": self.stalls, "stall_ms": round(self.stall_total_ms, 1),
+                "handlers": {handler: {"count": entry["count"], "total_ms": round(entry["total_ms"], 1), "max_ms": round(entry["max_ms"], 1),
+                                       "hot": {leaf: round(ms, 1) for leaf, ms in entry["hot"].most_common(5)}}
+                             for handler, entry in self.handlers.items()},
+                "recent": list(self.recent),
+            }
+
+
+def format_report(report, top=10):
+    if not report.get("stalls"):
+        return ""
+    lines = [f"ui stalls over {report['threshold_ms']:.0f}ms: {report['stalls']} ({report['stall_ms'] / 1000:.1f}s blocked)"]
+    ranked = sorted(report["handlers"].items(), key=lambda item: item[1]["total_ms"], reverse=True)
+    for handler, entry in ranked[:top]:
+        hot = ", ".join(list(entry["hot"])[:2])
+        lines.append(f"  {handler}: {entry['total_ms'] / 1000:.2f}s in {entry['count']} stalls, worst {entry['max_ms']:.0f}ms - {hot}")
+    return "\n".join(lines)
+
+
+def save_report(report, path=REPORT_PATH):
+    if not report.get("stalls"):
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a") as f:
+            f.write(json.dumps(report) + "\n")
+    except OSError as e:
+        print(f"Error saving stall report: {e}")
+
+
+def merge_reports(reports):
+    # sums per handler over sessions (and machines), in the same shape as one report
+    merged = {"threshold_ms": 0, "stalls": 0, "stall_ms": 0.0, "handlers": {}}
+    for report in reports:
+        merged["threshold_ms"] = max(merged["threshold_ms"], report.get("threshold_ms", 0))
+        merged["stalls"] += report.get("stalls", 0)
+        merged["stall_ms"] += report.get("stall_ms", 0.0)
+        for handler, entry in report.get("handlers", {}).items():
+            total = merged["handlers"].setdefault(handler, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "hot": Counter()})
+            total["count"] += entry["count"]
+            total["total_ms"] += entry["total_ms"]
+            total["max_ms"] = max(total["max_ms"], entry["max_ms"])
+            total["hot"].update(entry.get("hot", {}))
+    for entry in merged["handlers"].values():
+        entry["hot"] = dict(entry["hot"].most_common(5))
+    return merged
+
+
+current = None
+
+
+def start(root):
+    global current
+    if current is None:
+        current = Watchdog(root).start()
+    return current
+
+
+def stop():
+    # stops monitoring, returns the session's report (None if it wasn't running)
+    global current
+    if current is None:
+        return None
+    current.stop()
+    report = current.report()
+    current = None
+    return report
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or [REPORT_PATH]
+    reports = []
+    for path in paths:
+        try:
+            with open(path) as f:
+                reports.extend(json.loads(line) for line in f if line.strip())
+        except (OSError, ValueError) as e:
+            print(f"Error reading {path}: {e}")
+    print(format_report(merge_reports(reports), top=25) or "no stalls recorded")
@@ -0,0 +1,179 @@
+# finer data for a zoomed in window - the toolbar zooms/pans the main axis, and once fewer than
+# DENSITY_POINTS of the line's own bars are visible the window is fetched at an intraday (or
+# daily) interval in a background thread and spliced into the line. windows are snapped to
+# aligned blocks and the fetch is cached per window, so panning around a zoom or zooming back
+# into it doesn't download it again - and nothing finer than daily is ever fetched for the full range
+import datetime
+import math
+import threading
+
+import numpy as np
+import matplotlib.dates as mdates
+from matplotlib.dates import DateFormatter
+
+from backend import fetch_window_data
+from resolution import DEFAULT_PIXEL_WIDTH, TRADING_DAYS_PER_DAY
+
+DENSITY_POINTS = 60
+DEBOUNCE_MS = 300
+POLL_MS = 100
+
+# (yfinance interval, minutes per bar, how many days back yfinance serves it), finest first
+DETAIL_INTERVALS = [("5m", 5, 59), ("15m", 15, 59), ("60m", 60, 729), ("1d", 1440, None)]
+# minutes of trading in a day - stock exchanges vs fx, which trades around the clock
+STOCK_MINUTES = 390
+FX_MINUTES = 1440
+
+
+def detail_interval(span_days, age_days, base_minutes, minutes_per_day=STOCK_MINUTES, pixel_width=DEFAULT_PIXEL_WIDTH):
+    # the finest interval yfinance still serves that far back, finer than the line already is
+    # and with no more bars over the window than the plot area can show
+    for interval, minutes, lookback in DETAIL_INTERVALS:
+        if minutes >= base_minutes:
+            break
+        if lookback is not None and age_days > lookback:
+            continue
+        bars = span_days * TRADING_DAYS_PER_DAY * (minutes_per_day / minutes if minutes < 1440 else 1)
+        if bars <= pixel_width:
+            return interval
+    return None
+
+
+def snap_window(x_min, x_max):
+    # aligned block of a power of two days, twice the visible span - any view inside it
+    # maps to the same window (and cache key)
+    block = 2 ** max(0, math.ceil(math.log2(max(x_max - x_min, 1))))
+    start = math.floor(x_min / block) * block
+    return start, start + 2 * block
+
+
+def window_series(records):
+    x = mdates.date2num(np.array([r["date"] for r in records], dtype="datetime64[m]"))
+    y = np.array([r["close"] for r in records], dtype=float)
+    valid = np.isfinite(y)
+    return x[valid], y[valid]
+
+
+class WindowDetail:
+    # keeps one line sharp under zoom, owned by the chart session
+    def __init__(self, chart_session, ax, line, symbol, dates, values, minutes_per_day=STOCK_MINUTES, pixel_width=DEFAULT_PIXEL_WIDTH):
+        self.root = chart_session.root
+        self.canvas = chart_session.canvas
+        self.ax = ax
+        self.line = line
+        self.symbol = symbol
+        self.minutes_per_day = minutes_per_day
+        self.pixel_width = pixel_width
+        self.base_x = mdates.date2num(list(dates))
+        self.base_y = np.asarray(values, dtype=float)
+        # bar size of the line as drawn (weekends make daily bars look longer on average)
+        self.base_minutes = float(np.median(np.diff(self.base_x))) * 1440 if len(self.base_x) > 1 else 1440
+        self.base_formatter = ax.xaxis.get_major_formatter()
+        self.shown = None
+        self.requested = None
+        self._result = None
+        self._lock = threading.Lock()
+        self._job = None
+        self._poll_job = None
+        self.closed = False
+        self._cid = ax.callbacks.connect('xlim_changed', self.on_xlim_changed)
+        chart_session.own(self.close)
+
+    def set_pixel_width(self, pixel_width):
+        # a resized plot area may call for a different interval for the window on screen
+        self.pixel_width = pixel_width
+        if self.shown is not None:
+            self.check()
+
+    def on_xlim_changed(self, ax):
+        # zoom and pan fire this on every mouse move, so only act once the view settles
+        if self.closed:
+            return
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+        self._job = self.root.after(DEBOUNCE_MS, self.check)
+
+    def check(self):
+        self._job = None
+        if self.closed:
+            return
+        x_min, x_max = self.ax.get_xlim()
+        visible = np.searchsorted(self.base_x, x_max, side="right") - np.searchsorted(self.base_x, x_min, side="left")
+        if visible >= DENSITY_POINTS:
+            self.restore()
+            return
+        start, end = snap_window(x_min, x_max)
+        today = datetime.date.today()
+        age = (today - mdates.num2date(start).date()).days
+        interval = detail_interval(end - start, age, self.base_minutes, self.minutes_per_day, self.pixel_width * 2)
+        if interval is None:
+            return
+        # yfinance's end date is exclusive and can't be in the future
+        end_date = min(mdates.num2date(end).date(), today + datetime.timedelta(days=1))
+        key = (mdates.num2date(start).date().isoformat(), end_date.isoformat(), interval)
+        if key in (self.shown, self.requested):
+            return
+        self.requested = key
+        threading.Thread(target=self.fetch, args=(key,), name="gfv-zoom", daemon=True).start()
+        if self._poll_job is None:
+            self._poll_job = self.root.after(POLL_MS, self.poll)
+
+    def fetch(self, key):
+        try:
+            records = fetch_window_data(self.symbol, *key)
+        except Exception as e:
+            print(f"Error fetching zoomed data for {self.symbol}: {e}")
+            records = []
+        with self._lock:
+            self._result = (key, records)
+
+    def poll(self):
+        # results are applied on the tk thread - a fetch superseded by a later zoom is dropped
+        self._poll_job = None
+        if self.closed:
+            return
+        with self._lock:
+            result, self._result = self._result, None
+        if result is not None and result[0] == self.requested:
+            self.requested = None
+            self.apply(*result)
+        if self.requested is not None:
+            self._poll_job = self.root.after(POLL_MS, self.poll)
+
+    def apply(self, key, records):
+        if not records:
+            return
+        x, y = window_series(records)
+        if not len(x):
+            return
+        # finer bars replace the line's own inside the window, the rest of the range is unchanged
+        before = self.base_x < x[0]
+        after = self.base_x > x[-1]
+        self.line.set_data(np.concatenate((self.base_x[before], x, self.base_x[after])),
+                           np.concatenate((self.base_y[before], y, self.base_y[after])))
+        if key[2] != "1d":
+            self.ax.xaxis.set_major_formatter(DateFormatter("%d %b %H:%M"))
+        self.shown = key
+        self.canvas.draw_idle()
+
+    def restore(self):
+        self.requested = None
+        if self.shown is None:
+            return
+        self.line.set_data(self.base_x, self.base_y)
+        self.ax.xaxis.set_major_formatter(self.base_formatter)
+        self.shown = None
+        self.canvas.draw_idle()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.ax.callbacks.disconnect(self._cid)
+        for job in (self._job, self._poll_job):
+            if job is not None:
+                try:
+                    self.root.after_cancel(job)
+                except Exception:
+                    pass
+        self._job = self._poll_job = None